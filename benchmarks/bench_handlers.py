@@ -0,0 +1,348 @@
+"""
+Микробенчмарки обработчиков и их составных частей.
+Обработчики вызываются напрямую с легкими заменами Update / CallbackQuery / Bot,
+как FakeQuery в cancel_command. Отложенные переходы, которые ставят обработчики, не выполняются:
+замеряется только сам обработчик.
+
+Для каждого бенчмарка: операций в секунду, пик выделенной памяти за вызов
+и память, оставшаяся занятой после вызова (по tracemalloc).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_handlers --save baseline.json
+    python -m benchmarks.bench_handlers --compare baseline.json --tolerance 0.25
+
+С --compare код возврата 1, если какой-то бенчмарк стал медленнее
+или выделяет больше памяти, чем допускает tolerance.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+
+class FakeUser:
+    def __init__(self, user_id: int):
+        self.id = user_id
+        self.username = f"user{user_id}"
+        self.first_name = f"User{user_id}"
+
+
+class FakeMessage:
+    """Сообщение в чате: reply_text отправляет новое, edit_text меняет это"""
+
+    def __init__(self, bot: 'FakeBot', chat_id: int, message_id: int, text: str = '', from_user=None):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.text = text
+        self.from_user = from_user
+
+    async def reply_text(self, text, reply_markup=None, **kwargs):
+        return await self.bot.send_message(self.chat_id, text, reply_markup=reply_markup)
+
+    async def edit_text(self, text, reply_markup=None, **kwargs):
+        self.text = text
+        return self
+
+
+class FakeQuery:
+    """Нажатие inline-кнопки"""
+
+    def __init__(self, message: FakeMessage, from_user: FakeUser, data: str = ''):
+        self.message = message
+        self.from_user = from_user
+        self.data = data
+
+    async def answer(self, *args, **kwargs):
+        return True
+
+    async def edit_message_text(self, text, reply_markup=None, **kwargs):
+        return await self.message.edit_text(text, reply_markup=reply_markup)
+
+
+class FakeUpdate:
+    def __init__(self, message: Optional[FakeMessage] = None, callback_query: Optional[FakeQuery] = None):
+        self.message = message
+        self.callback_query = callback_query
+
+
+class FakeBot:
+    """Bot API без сети: отвечает сразу"""
+
+    def __init__(self):
+        self._message_ids = itertools.count(1)
+
+    async def send_message(self, chat_id, text, reply_markup=None, **kwargs):
+        return FakeMessage(self, chat_id, next(self._message_ids), text)
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        return FakeMessage(self, chat_id, message_id, text)
+
+    async def delete_message(self, chat_id, message_id, **kwargs):
+        return True
+
+    async def delete_messages(self, chat_id, message_ids, **kwargs):
+        return True
+
+
+class FakeApplication:
+    """create_task не запускает фоновую работу: ее корутина сразу закрывается"""
+
+    def create_task(self, coroutine, name=None, **kwargs):
+        coroutine.close()
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(None)
+        return future
+
+    def mark_data_for_update_persistence(self, **kwargs):
+        pass
+
+
+class FakeContext:
+    def __init__(self, bot: FakeBot):
+        self.bot = bot
+        self.application = FakeApplication()
+        self.user_data: Dict[str, Any] = {}
+
+
+Benchmark = Callable[[], Union[Any, Awaitable[Any]]]
+
+
+def build_benchmarks(tmp: str, cleanup: List[Callable[[], Any]]) -> Dict[str, Tuple[Benchmark, bool]]:
+    """Имя -> (функция без аргументов, асинхронная ли). В cleanup - что закрыть после прогона"""
+    # Импорт после DB_PATH: обработчики работают с глобальным хранилищем во временной БД
+    from core.handlers.callbacks import handle_button_click, process_answer, main_menu, show_question
+    from core.handlers.commands import start_command
+    from core.services.quiz import QuizService
+    from data.database import load_questions, get_questions_by_topic
+    from data.models import AnswerEvent, User
+    from data.question_bank import question_bank, parse_questions, QUESTIONS_PATH
+    from data.storage import Storage
+    from utils.callback_data import AnswerPayload, encode_answer
+    from utils.keyboards import create_quiz_keyboard
+
+    bot = FakeBot()
+    user = FakeUser(1000)
+    context = FakeContext(bot)
+    message = FakeMessage(bot, user.id, 1, 'menu', from_user=user)
+    snapshot = question_bank.snapshot
+    QuizService.start_quiz(context, snapshot, level='junior')
+    total = QuizService.get_total_questions(context)
+    nonce = context.user_data['nonce']
+    counter = itertools.count()
+
+    def session_question(i: int):
+        """
+        Ставит сессию на вопрос i и возвращает номер варианта ответа.
+        Последний вопрос пропускается: ответ на него завершает тест и очищает сессию
+        """
+        index = i % (total - 1)
+        context.user_data['current_question'] = index
+        return index, i % 2
+
+    async def bench_handle_button_click():
+        index, option = session_question(next(counter))
+        query = FakeQuery(message, user, encode_answer(nonce, index, option))
+        await handle_button_click(FakeUpdate(callback_query=query), context)
+
+    async def bench_process_answer():
+        index, option = session_question(next(counter))
+        await process_answer(FakeQuery(message, user), context, AnswerPayload(nonce, index, option))
+
+    async def bench_show_question():
+        session_question(next(counter))
+        await show_question(FakeQuery(message, user), context)
+
+    async def bench_main_menu():
+        await main_menu(FakeQuery(message, user, 'main_menu'), context)
+
+    async def bench_start_command():
+        await start_command(FakeUpdate(message=message), context)
+
+    question = snapshot.questions[0]
+    options, _ = QuizService.shuffle_options(question, context.user_data['seed'])
+    with open(QUESTIONS_PATH, 'rb') as f:
+        raw_questions = f.read()
+
+    # Методы Storage - на отдельной временной БД
+    storage = Storage(os.path.join(tmp, 'storage.db'), flush_interval=0.01)
+    cleanup.append(storage.close)
+    now = datetime.now().isoformat()
+    users = 1000
+
+    def storage_save_user():
+        user_id = next(counter) % users
+        storage.save_user(User(user_id, f"user{user_id}", f"Name{user_id}", now))
+
+    def storage_save_test_result():
+        i = next(counter)
+        storage.save_test_result_with_level(i % users, i % 100, 100, 'junior' if i % 2 else 'middle')
+
+    def storage_reset_stats():
+        storage.reset_user_stats(next(counter) % users)
+
+    def storage_track_message():
+        i = next(counter)
+        storage.track_message(i % users, i)
+
+    def answer_event(i: int) -> AnswerEvent:
+        return AnswerEvent(int(time.time()), i % users, i % 4096, snapshot.ids[i % len(snapshot)],
+                           i % 4, i % 3 == 0, 1000 + i % 30000, 'junior')
+
+    def storage_record_answer():
+        storage.record_answer(answer_event(next(counter)))
+
+    # Запись пачки журнала ответов со сводками, как ее делает фоновый поток
+    answer_batch = [answer_event(i) for i in range(1000)]
+
+    benchmarks = {
+        'handle_button_click': (bench_handle_button_click, True),
+        'process_answer': (bench_process_answer, True),
+        'show_question': (bench_show_question, True),
+        'main_menu': (bench_main_menu, True),
+        'start_command': (bench_start_command, True),
+        'shuffle_questions': (lambda: QuizService.shuffle_questions(snapshot.questions), False),
+        'shuffle_options': (lambda: QuizService.shuffle_options(question, next(counter)), False),
+        'create_quiz_keyboard': (lambda: create_quiz_keyboard(question, 0, options, nonce=nonce), False),
+        'start_quiz': (lambda: QuizService.start_quiz(FakeContext(bot), snapshot), False),
+        'start_quiz.topic': (lambda: QuizService.start_quiz(FakeContext(bot), snapshot, topic=snapshot.topics[0]), False),
+        'load_questions': (load_questions, False),
+        'get_questions_by_topic': (lambda: get_questions_by_topic(snapshot.topics[-1]), False),
+        'parse_questions': (lambda: parse_questions(raw_questions), False),
+        'storage.save_user': (storage_save_user, False),
+        'storage.get_user_stats': (lambda: storage.get_user_stats(next(counter) % users), False),
+        'storage.load_user_stats': (lambda: storage.load_user_stats(next(counter) % users), False),
+        'storage.get_user_achievements': (lambda: storage.get_user_achievements(next(counter) % users), False),
+        'storage.save_test_result': (storage_save_test_result, False),
+        'storage.reset_user_stats': (storage_reset_stats, False),
+        'storage.track_message': (storage_track_message, False),
+        'storage.get_user_messages': (lambda: storage.get_user_messages(next(counter) % users), False),
+        'storage.record_answer': (storage_record_answer, False),
+        'storage.get_weakest_questions': (lambda: storage.get_weakest_questions(20, 1), False),
+        'answer_log.write_1000': (lambda: storage.answers._write_events(answer_batch), False),
+    }
+    return benchmarks
+
+
+async def call(func: Benchmark, is_async: bool):
+    if is_async:
+        await func()
+        # Отдаем управление циклу: prefetch и другие call_soon выполняются как в боте
+        await asyncio.sleep(0)
+    else:
+        func()
+
+
+async def measure(func: Benchmark, is_async: bool, min_time: float, memory_calls: int) -> Dict[str, float]:
+    """ops/s за не меньше чем min_time и память по memory_calls отдельным вызовам"""
+    for _ in range(10):
+        await call(func, is_async)
+
+    calls = 0
+    started = time.perf_counter()
+    deadline = started + min_time
+    while True:
+        await call(func, is_async)
+        calls += 1
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+    ops_per_s = calls / (now - started)
+
+    peak_total = 0
+    retained_total = 0
+    tracemalloc.start()
+    try:
+        for _ in range(memory_calls):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await call(func, is_async)
+            current, peak = tracemalloc.get_traced_memory()
+            peak_total += peak - before
+            retained_total += current - before
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'ops_per_s': round(ops_per_s, 1),
+        'us_per_op': round(1e6 / ops_per_s, 2),
+        'peak_bytes': round(peak_total / memory_calls),
+        'retained_bytes': round(retained_total / memory_calls),
+    }
+
+
+async def run(args) -> Dict[str, Dict[str, float]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_PATH'] = os.path.join(tmp, 'handlers.db')
+        cleanup = []
+        benchmarks = build_benchmarks(tmp, cleanup)
+        selected = [name for name in benchmarks if not args.only or any(part in name for part in args.only)]
+
+        results = {}
+        print(f"{'benchmark':<30} {'ops/s':>12} {'us/op':>10} {'peak KB':>9} {'retained B':>11}")
+        for name in selected:
+            func, is_async = benchmarks[name]
+            result = results[name] = await measure(func, is_async, args.min_time, args.memory_calls)
+            print(f"{name:<30} {result['ops_per_s']:>12.0f} {result['us_per_op']:>10.2f}"
+                  f" {result['peak_bytes'] / 1024:>9.1f} {result['retained_bytes']:>11}")
+
+        from data.storage import storage
+        cleanup.append(storage.close)
+        for close in cleanup:
+            close()
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float) -> List[str]:
+    """Список регрессий относительно baseline"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if result['ops_per_s'] < base['ops_per_s'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['ops_per_s']:.0f} ops/s, было {base['ops_per_s']:.0f}")
+        # Мелкие колебания в несколько сотен байт не считаем
+        if result['peak_bytes'] > base['peak_bytes'] * (1 + tolerance) + 512:
+            regressions.append(f"{name}: пик {result['peak_bytes']} B за вызов, было {base['peak_bytes']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--min-time', type=float, default=0.5, help='сколько секунд крутить каждый бенчмарк')
+    parser.add_argument('--memory-calls', type=int, default=200, help='вызовов под tracemalloc')
+    parser.add_argument('--only', nargs='*', help='запустить только бенчмарки, в имени которых есть подстрока')
+    parser.add_argument('--save', help='сохранить результаты как baseline (JSON)')
+    parser.add_argument('--compare', help='сравнить с baseline (JSON)')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='допустимое ухудшение, доля')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    results = asyncio.run(run(args))
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"❌ {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"✅ Регрессий нет (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
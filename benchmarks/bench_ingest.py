@@ -0,0 +1,170 @@
+"""
+Пропускная способность приема обновлений: polling против webhook.
+Бот работает против локальной замены Bot API и отвечает эхом на каждое сообщение.
+Задержка - от выдачи обновления (getUpdates или POST на webhook) до получения sendMessage с ответом.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_ingest --updates 2000 --chats 50
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List
+
+from telegram.ext import Application, MessageHandler, filters
+
+from benchmarks.fake_bot_api import FakeBotAPI, make_message_update
+from core.concurrency import KeyedLocks, PerChatUpdateProcessor
+from core.webhook import WebhookConfig, WebhookServer
+
+
+SECRET = 'bench-secret'
+
+
+async def echo(update, context):
+    await update.message.reply_text(update.message.text)
+
+
+class LatencyProbe:
+    """Связывает выданные обновления с ответами бота"""
+
+    def __init__(self, expected: int):
+        self.expected = expected
+        self.sent_at: Dict[str, float] = {}
+        self.latencies: List[float] = []
+        self.done = asyncio.Event()
+
+    def mark_sent(self, update_id: int):
+        self.sent_at[str(update_id)] = time.perf_counter()
+
+    def on_call(self, method: str, params: Dict[str, str]):
+        if method != 'sendMessage':
+            return
+        sent_at = self.sent_at.pop(params.get('text', ''), None)
+        if sent_at is None:
+            return
+        self.latencies.append((time.perf_counter() - sent_at) * 1000)
+        if len(self.latencies) >= self.expected:
+            self.done.set()
+
+
+def build_application(api: FakeBotAPI, queue_size: int) -> Application:
+    application = (
+        Application.builder()
+        .token('1:bench')
+        .base_url(api.base_url)
+        # Синтетическая нагрузка шлет пачки в один чат, поэтому очередь чата не ограничиваем
+        .concurrent_updates(PerChatUpdateProcessor(256, max_pending_per_chat=queue_size, locks=KeyedLocks()))
+        .update_queue(asyncio.Queue(maxsize=queue_size))
+        .build()
+    )
+    application.add_handler(MessageHandler(filters.TEXT, echo))
+    return application
+
+
+async def run_polling(args, probe: LatencyProbe, api: FakeBotAPI) -> float:
+    application = build_application(api, args.queue_size)
+    await application.initialize()
+    await application.updater.start_polling(poll_interval=0, timeout=1)
+    await application.start()
+
+    started = time.perf_counter()
+    for update_id in range(1, args.updates + 1):
+        probe.mark_sent(update_id)
+        api.push_update(make_message_update(update_id, update_id % args.chats, str(update_id)))
+    await asyncio.wait_for(probe.done.wait(), args.deadline)
+    elapsed = time.perf_counter() - started
+
+    await application.updater.stop()
+    await application.stop()
+    await application.shutdown()
+    return elapsed
+
+
+async def post_updates(port: int, update_ids: List[int], chats: int, probe: LatencyProbe):
+    """Один клиент с keep-alive соединением, как у Telegram"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        for update_id in update_ids:
+            body = json.dumps(make_message_update(update_id, update_id % chats, str(update_id))).encode()
+            writer.write(
+                b"POST /webhook HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+                + f"X-Telegram-Bot-Api-Secret-Token: {SECRET}\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+                + body
+            )
+            probe.mark_sent(update_id)
+            await writer.drain()
+            status_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b''):
+                pass
+            if not status_line.startswith(b'HTTP/1.1 200'):
+                raise RuntimeError(f"webhook ответил {status_line!r}")
+    finally:
+        writer.close()
+
+
+async def run_webhook(args, probe: LatencyProbe, api: FakeBotAPI) -> float:
+    application = build_application(api, args.queue_size)
+    server = WebhookServer(application, WebhookConfig(host='127.0.0.1', port=0, secret_token=SECRET))
+    await application.initialize()
+    await server.start()
+    await application.start()
+
+    started = time.perf_counter()
+    # Telegram держит до max_connections параллельных соединений
+    ids = list(range(1, args.updates + 1))
+    await asyncio.gather(*(
+        post_updates(server.port, ids[i::args.connections], args.chats, probe)
+        for i in range(args.connections)
+    ))
+    await asyncio.wait_for(probe.done.wait(), args.deadline)
+    elapsed = time.perf_counter() - started
+
+    await server.stop()
+    await application.stop()
+    await application.shutdown()
+    return elapsed
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def bench(mode: str, args):
+    probe = LatencyProbe(args.updates)
+    api = FakeBotAPI(on_call=probe.on_call)
+    await api.start()
+    try:
+        runner = run_polling if mode == 'polling' else run_webhook
+        elapsed = await runner(args, probe, api)
+    finally:
+        await api.stop()
+
+    latencies = probe.latencies
+    print(f"{mode:<8} {args.updates / elapsed:>10.0f} upd/s"
+          f" {percentile(latencies, 0.5):>9.2f} {percentile(latencies, 0.95):>9.2f} {max(latencies):>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=2000, help='сколько обновлений отправить')
+    parser.add_argument('--chats', type=int, default=50, help='по скольким чатам распределить обновления')
+    parser.add_argument('--connections', type=int, default=40, help='параллельных соединений webhook')
+    parser.add_argument('--queue-size', type=int, default=1000, help='размер update_queue')
+    parser.add_argument('--deadline', type=float, default=120, help='таймаут прогона, сек')
+    parser.add_argument('--mode', choices=('polling', 'webhook', 'both'), default='both')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    print(f"{args.updates} обновлений, {args.chats} чатов")
+    print(f"{'mode':<8} {'throughput':>15} {'p50, ms':>9} {'p95, ms':>9} {'max, ms':>9}")
+    modes = ('polling', 'webhook') if args.mode == 'both' else (args.mode,)
+    for mode in modes:
+        asyncio.run(bench(mode, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+Нагрузочный тест бота целиком: настоящие обработчики create_application()
+против локальной замены Bot API с сетевой задержкой и ответами 429.
+Синтетические пользователи проходят сценарий: /start, выбор уровня, ответы на вопросы
+с паузой на размышление, иногда отменяют тест или сбрасывают статистику.
+Замена Bot API и пользователи работают в отдельном процессе, бот - в основном.
+
+Отчет: обновлений в секунду, p50/p95/p99 времени обработчиков, исходящих запросов
+на пройденный тест, транзакций записи в БД в секунду и пиковый RSS.
+Это базовая точка для сравнения любых изменений производительности.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_load --users 200 --latency-ms 30 --flood-rate 0.001
+    python -m benchmarks.bench_load --users 1000 --output baseline.json
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.bench_ingest import percentile
+from benchmarks.fake_bot_api import FakeBotAPI, make_callback_update, make_message_update
+
+
+# Запросы бота, которые не относятся к обработке пользователей
+SERVICE_METHODS = ('getUpdates', 'getMe', 'deleteWebhook')
+
+# id пользователей не пересекаются с id самого бота
+FIRST_USER_ID = 1000
+
+
+def callback_buttons(params: Dict[str, str]) -> Tuple[str, ...]:
+    """callback_data всех inline-кнопок из параметров sendMessage / editMessageText"""
+    markup = params.get('reply_markup')
+    if not markup:
+        return ()
+    return tuple(
+        button['callback_data']
+        for row in json.loads(markup).get('inline_keyboard', ())
+        for button in row if 'callback_data' in button
+    )
+
+
+def is_answer(data: str) -> bool:
+    return data.startswith('a1:')
+
+
+class LoadStats:
+    """Результаты прогона со стороны пользователей"""
+
+    def __init__(self):
+        self.updates = 0
+        self.answers = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.resets = 0
+        self.stalled = 0
+
+
+class SyntheticUser:
+    """Пользователь бота: ждет нужную клавиатуру и нажимает кнопки с паузой на размышление"""
+
+    def __init__(self, harness: 'TelegramSide', user_id: int, rng: random.Random):
+        self.harness = harness
+        self.user_id = user_id
+        self.rng = rng
+        # Экраны с кнопками в порядке отправки ботом: (message_id, callback_data кнопок)
+        self.screens: asyncio.Queue = asyncio.Queue()
+
+    async def think(self):
+        await asyncio.sleep(self.harness.args.think_ms / 1000 * self.rng.uniform(0.5, 1.5))
+
+    async def wait_for(self, predicate: Callable[[Tuple[str, ...]], bool]) -> Tuple[int, Tuple[str, ...]]:
+        """Пропускает экраны, пока не придет подходящий"""
+        deadline = time.monotonic() + self.harness.args.wait_timeout
+        while True:
+            message_id, buttons = await asyncio.wait_for(self.screens.get(), deadline - time.monotonic())
+            if predicate(buttons):
+                return message_id, buttons
+
+    def press(self, message_id: int, data: str):
+        self.harness.push(make_callback_update(self.harness.next_update_id(), self.user_id, message_id, data))
+
+    async def run(self):
+        args = self.harness.args
+        stats = self.harness.stats
+        self.harness.push(make_message_update(self.harness.next_update_id(), self.user_id, '/start'))
+
+        completed = 0
+        while completed < args.quizzes:
+            message_id, _ = await self.wait_for(lambda buttons: 'start_test_from_menu' in buttons)
+            await self.think()
+
+            if self.rng.random() < args.reset_rate:
+                self.press(message_id, 'reset_stats_confirm')
+                message_id, _ = await self.wait_for(lambda buttons: 'reset_stats_yes' in buttons)
+                await self.think()
+                self.press(message_id, 'reset_stats_yes')
+                stats.resets += 1
+                # После сброса бот сам возвращается в главное меню
+                continue
+
+            self.press(message_id, 'start_test_from_menu')
+            message_id, _ = await self.wait_for(lambda buttons: 'level_junior' in buttons)
+            await self.think()
+            level = args.level if args.level != 'mixed' else self.rng.choice(('junior', 'middle'))
+            self.press(message_id, f'level_{level}')
+
+            cancel_at = self.rng.randrange(1, 20) if self.rng.random() < args.cancel_rate else -1
+            answered = 0
+            previous = None
+            while True:
+                message_id, buttons = await self.wait_for(
+                    lambda buttons: 'restart_test' in buttons or any(map(is_answer, buttons))
+                )
+                if 'restart_test' in buttons:
+                    completed += 1
+                    stats.completed += 1
+                    if completed < args.quizzes:
+                        self.press(message_id, 'main_menu')
+                    break
+                if buttons == previous:
+                    continue
+                previous = buttons
+
+                await self.think()
+                if answered == cancel_at:
+                    self.press(message_id, 'cancel_test')
+                    stats.cancelled += 1
+                    break
+                self.press(message_id, self.rng.choice([data for data in buttons if is_answer(data)]))
+                answered += 1
+                stats.answers += 1
+
+
+class TelegramSide:
+    """
+    Сторона Telegram: замена Bot API и синтетические пользователи.
+    Работает в отдельном процессе, чтобы не делить с ботом цикл событий, процессор и память
+    """
+
+    def __init__(self, args, conn):
+        self.args = args
+        self.conn = conn
+        self.stats = LoadStats()
+        self.users: Dict[int, SyntheticUser] = {}
+        self._update_ids = itertools.count(1)
+        self.api = FakeBotAPI(
+            on_result=self.on_result,
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            flood_rate=args.flood_rate,
+            retry_after=args.retry_after
+        )
+
+    def next_update_id(self) -> int:
+        return next(self._update_ids)
+
+    def push(self, update: Dict[str, Any]):
+        self.stats.updates += 1
+        self.api.push_update(update)
+
+    def on_result(self, method: str, params: Dict[str, str], result: Any):
+        if method not in ('sendMessage', 'editMessageText'):
+            return
+        buttons = callback_buttons(params)
+        user = self.users.get(int(params.get('chat_id', 0)))
+        if buttons and user is not None:
+            user.screens.put_nowait((result['message_id'], buttons))
+
+    async def run_user(self, index: int, user: SyntheticUser):
+        await asyncio.sleep(self.args.ramp * index / self.args.users)
+        try:
+            await user.run()
+        except asyncio.TimeoutError:
+            self.stats.stalled += 1
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        await self.api.start()
+        self.conn.send(self.api.base_url)
+
+        rng = random.Random(self.args.seed)
+        for user_id in range(FIRST_USER_ID, FIRST_USER_ID + self.args.users):
+            self.users[user_id] = SyntheticUser(self, user_id, random.Random(rng.random()))
+
+        # Пользователи начинают, когда бот запущен
+        await loop.run_in_executor(None, self.conn.recv)
+        started = time.perf_counter()
+        await asyncio.gather(*(self.run_user(i, user) for i, user in enumerate(self.users.values())))
+        elapsed = time.perf_counter() - started
+
+        self.conn.send({
+            'elapsed': elapsed,
+            'stats': vars(self.stats),
+            'calls': self.api.calls,
+            'flood_errors': self.api.flood_errors,
+        })
+        # Bot API нужен боту до конца остановки
+        await loop.run_in_executor(None, self.conn.recv)
+        await self.api.stop()
+
+
+def run_telegram_side(args, conn):
+    """Точка входа процесса стороны Telegram"""
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(TelegramSide(args, conn).run())
+
+
+class BotSide:
+    """Бот из create_application() с замерами каждого обновления"""
+
+    def __init__(self, args):
+        self.args = args
+        # Время выполнения обработчика и полное время обновления с ожиданием очереди чата
+        self.handler_ms: List[float] = []
+        self.update_ms: List[float] = []
+
+    def instrument(self, application):
+        """Замеряет каждое обновление на входе в процессор обновлений"""
+        processor = application.update_processor
+        process = processor.do_process_update
+        handler_ms = self.handler_ms
+        update_ms = self.update_ms
+
+        async def timed_handler(coroutine):
+            started = time.perf_counter()
+            try:
+                return await coroutine
+            finally:
+                handler_ms.append((time.perf_counter() - started) * 1000)
+
+        async def do_process_update(update, coroutine):
+            started = time.perf_counter()
+            try:
+                await process(update, timed_handler(coroutine))
+            finally:
+                update_ms.append((time.perf_counter() - started) * 1000)
+
+        processor.do_process_update = do_process_update
+
+    async def run(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        conn, child_conn = multiprocessing.Pipe()
+        telegram = multiprocessing.get_context('spawn').Process(
+            target=run_telegram_side, args=(self.args, child_conn), name='telegram-side'
+        )
+        telegram.start()
+        os.environ['BOT_API_BASE_URL'] = await loop.run_in_executor(None, conn.recv)
+
+        # Импорт после настройки окружения: глобальное хранилище открывает DB_PATH
+        from core.application import create_application
+        from core.services.transitions import transitions
+        from utils.instrumentation import metrics
+
+        transitions.delay_scale = self.args.delay_scale
+        application = create_application()
+        self.instrument(application)
+        await application.initialize()
+        await application.post_init(application)
+        await application.updater.start_polling(poll_interval=0, timeout=1)
+        await application.start()
+
+        conn.send('start')
+        result = await loop.run_in_executor(None, conn.recv)
+
+        await application.updater.stop()
+        await application.stop()
+        await application.shutdown()
+        await application.post_shutdown(application)
+        conn.send('stop')
+        await loop.run_in_executor(None, telegram.join)
+
+        return self.report(result, metrics.snapshot())
+
+    def report(self, result: Dict[str, Any], snapshot: Dict[str, Any]) -> Dict[str, Any]:
+        stats = result['stats']
+        elapsed = result['elapsed']
+        calls = {method: count for method, count in result['calls'].items() if method not in SERVICE_METHODS}
+        outbound = sum(calls.values())
+        db_writes = snapshot.get('db.write_transactions', 0)
+        return {
+            'users': self.args.users,
+            'elapsed_s': round(elapsed, 2),
+            'updates': stats['updates'],
+            'updates_per_s': round(stats['updates'] / elapsed, 1),
+            'answers': stats['answers'],
+            'quizzes_completed': stats['completed'],
+            'quizzes_cancelled': stats['cancelled'],
+            'resets': stats['resets'],
+            'stalled_users': stats['stalled'],
+            'handler_ms': {
+                f'p{int(q * 100)}': round(percentile(self.handler_ms, q), 2) for q in (0.5, 0.95, 0.99)
+            },
+            'update_ms': {
+                f'p{int(q * 100)}': round(percentile(self.update_ms, q), 2) for q in (0.5, 0.95, 0.99)
+            },
+            'outbound_calls': outbound,
+            'calls_per_quiz': round(outbound / stats['completed'], 1) if stats['completed'] else None,
+            'calls_by_method': dict(sorted(calls.items(), key=lambda item: -item[1])),
+            'flood_errors': result['flood_errors'],
+            'flood_retries': snapshot.get('ratelimit.retry_after', 0),
+            'updates_dropped': snapshot.get('updates.dropped', 0),
+            'db_write_transactions': db_writes,
+            'db_writes_per_s': round(db_writes / elapsed, 1),
+            # Только процесс бота. На Linux ru_maxrss в килобайтах
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"{report['users']} пользователей за {report['elapsed_s']} с")
+    print(f"обновлений:        {report['updates']} ({report['updates_per_s']} в секунду)")
+    print(f"тестов:            {report['quizzes_completed']} пройдено, {report['quizzes_cancelled']} отменено,"
+          f" {report['resets']} сбросов, {report['answers']} ответов")
+    print(f"зависших:          {report['stalled_users']}, отброшено обновлений: {report['updates_dropped']}")
+    print("обработчик, ms:    " + "  ".join(f"{k} {v}" for k, v in report['handler_ms'].items()))
+    print("обновление, ms:    " + "  ".join(f"{k} {v}" for k, v in report['update_ms'].items()))
+    print(f"исходящих:         {report['outbound_calls']} ({report['calls_per_quiz']} на пройденный тест)")
+    print("                   " + ", ".join(f"{k} {v}" for k, v in report['calls_by_method'].items()))
+    print(f"429:               {report['flood_errors']} получено, {report['flood_retries']} повторов")
+    print(f"БД:                {report['db_write_transactions']} транзакций записи"
+          f" ({report['db_writes_per_s']} в секунду)")
+    print(f"пиковый RSS:       {report['peak_rss_mb']} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200, help='сколько пользователей')
+    parser.add_argument('--quizzes', type=int, default=1, help='сколько тестов проходит каждый пользователь')
+    parser.add_argument('--level', choices=('junior', 'middle', 'mixed'), default='mixed')
+    parser.add_argument('--think-ms', type=float, default=200, help='средняя пауза перед нажатием, мс')
+    parser.add_argument('--ramp', type=float, default=5, help='за сколько секунд подключаются все пользователи')
+    parser.add_argument('--cancel-rate', type=float, default=0.05, help='доля тестов, которые отменяют')
+    parser.add_argument('--reset-rate', type=float, default=0.02, help='вероятность сбросить статистику')
+    parser.add_argument('--delay-scale', type=float, default=0.05, help='множитель задержек переходов бота')
+    parser.add_argument('--latency-ms', type=float, default=20, help='задержка ответа Bot API, мс')
+    parser.add_argument('--jitter-ms', type=float, default=10, help='разброс задержки, мс')
+    parser.add_argument('--flood-rate', type=float, default=0, help='доля запросов, получающих 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='retry_after в ответах 429, сек')
+    parser.add_argument('--overall-rate', type=float, default=1000,
+                        help='лимит исходящих сообщений бота в секунду (у Telegram 30)')
+    parser.add_argument('--chat-rate', type=float, default=20,
+                        help='лимит сообщений в один чат в секунду (у Telegram 1)')
+    parser.add_argument('--wait-timeout', type=float, default=60, help='сколько пользователь ждет ответа, сек')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='сохранить отчет в JSON')
+    args = parser.parse_args()
+
+    # Окружение бота настраивается до импорта core.application
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ['BOT_TOKEN'] = '1:load'
+    os.environ['RATE_LIMIT_OVERALL'] = str(args.overall_rate)
+    os.environ['RATE_LIMIT_CHAT'] = str(args.chat_rate)
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DB_PATH'] = os.path.join(tmp, 'load.db')
+        report = asyncio.run(BotSide(args).run())
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Загрузка банка вопросов: JSON против скомпилированного файла (data/compiled_bank.py).
+Для каждого размера банка генерируется синтетический questions.json,
+каждая загрузка идет в отдельном процессе, чтобы RSS не смешивался.
+
+Замеряется: время компиляции, время загрузки QuestionBank, прирост RSS после загрузки
+и время получения вопроса по id.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_question_bank --sizes 100 10000 100000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+
+
+TOPICS = ('модели_разработки', 'процессы_тестирования', 'тест_дизайн', 'api', 'sql', 'git', 'linux', 'http')
+DIFFICULTIES = ('легкий', 'средний', 'сложный')
+WORDS = ('тестирование', 'дефект', 'требование', 'регрессия', 'проверка', 'сценарий',
+         'release', 'build', 'смоук', 'приемка', 'coverage', 'окружение', 'интеграция')
+
+
+def make_bank(count: int, seed: int = 1) -> Dict:
+    """Синтетический банк того же вида, что data/questions.json"""
+    rng = random.Random(seed)
+
+    def sentence(words: int) -> str:
+        return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+    # Варианты ответов в настоящем банке часто повторяются
+    common_options = [sentence(3) for _ in range(200)]
+    questions = []
+    for question_id in range(1, count + 1):
+        options = [rng.choice(common_options) if rng.random() < 0.3 else sentence(rng.randint(2, 6))
+                   for _ in range(4)]
+        questions.append({
+            'id': question_id,
+            'question': sentence(rng.randint(8, 20)) + '?',
+            'options': options,
+            'correct_answer': rng.randrange(4),
+            'explanation': sentence(rng.randint(10, 30)) + '.',
+            'topic': rng.choice(TOPICS),
+            'difficulty': rng.choice(DIFFICULTIES),
+        })
+    return {'questions': questions}
+
+
+def current_rss() -> int:
+    """Текущий RSS процесса в байтах"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Не Linux: только пиковое значение
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def measure_load(source: str, compiled: Optional[str], lookups: int) -> Dict[str, float]:
+    """Выполняется в отдельном процессе"""
+    from data.question_bank import QuestionBank
+
+    rss_before = current_rss()
+    started = time.perf_counter()
+    bank = QuestionBank(source, compiled)
+    load_s = time.perf_counter() - started
+    rss_after = current_rss()
+
+    snapshot = bank.snapshot
+    rng = random.Random(2)
+    ids = [rng.choice(snapshot.ids) for _ in range(lookups)]
+    started = time.perf_counter()
+    for question_id in ids:
+        snapshot.get(question_id)
+    lookup_us = (time.perf_counter() - started) / lookups * 1e6
+
+    return {
+        'kind': type(snapshot).__name__,
+        'load_ms': load_s * 1000,
+        'rss_mb': (rss_after - rss_before) / 2 ** 20,
+        'lookup_us': lookup_us,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10_000, 100_000])
+    parser.add_argument('--lookups', type=int, default=10_000, help='сколько вопросов получить по id')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    from data.compiled_bank import compile_file
+
+    print(f"{'questions':>9} {'mode':<9} {'file, MB':>9} {'compile, ms':>12} {'load, ms':>9}"
+          f" {'RSS, MB':>8} {'get, us':>8}")
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            source = os.path.join(tmp, f'questions_{size}.json')
+            compiled = os.path.join(tmp, f'questions_{size}.bin')
+            with open(source, 'w', encoding='utf-8') as file:
+                json.dump(make_bank(size), file, ensure_ascii=False, indent=2)
+
+            started = time.perf_counter()
+            compile_file(source, compiled)
+            compile_ms = (time.perf_counter() - started) * 1000
+
+            for mode, path, compiled_path in (('json', source, None), ('compiled', source, compiled)):
+                # Новый процесс на каждую загрузку: RSS не учитывает предыдущие
+                with ProcessPoolExecutor(1, mp_context=context) as executor:
+                    result = executor.submit(measure_load, path, compiled_path, args.lookups).result()
+                expected = 'CompiledSnapshot' if compiled_path else 'QuestionBankSnapshot'
+                if result['kind'] != expected:
+                    raise RuntimeError(f"{mode}: загружен {result['kind']}, ожидался {expected}")
+                file_mb = os.path.getsize(compiled_path or path) / 2 ** 20
+                print(f"{size:>9} {mode:<9} {file_mb:>9.1f}"
+                      f" {compile_ms if compiled_path else 0:>12.0f} {result['load_ms']:>9.1f}"
+                      f" {result['rss_mb']:>8.1f} {result['lookup_us']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
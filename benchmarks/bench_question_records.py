@@ -0,0 +1,111 @@
+"""
+Память и аллокации записей вопросов: прежние словари (MappingProxyType, список вариантов)
+против неизменяемых Question со __slots__ и кортежем вариантов.
+
+Замеряется через tracemalloc:
+    - сколько памяти занимает загруженный банк из N вопросов;
+    - пик памяти на один ответ: варианты перемешиваются при показе вопроса и при проверке ответа.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_question_records --sizes 100 10000 100000
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import time
+import tracemalloc
+from types import MappingProxyType
+from typing import Callable, Dict, Tuple
+
+from benchmarks.bench_question_bank import make_bank
+
+
+def parse_as_dicts(raw: bytes):
+    """Прежний разбор: словарь на вопрос"""
+    return tuple(
+        MappingProxyType({
+            'id': item['id'],
+            'question': item['question'],
+            'options': list(item['options']),
+            'correct_answer': item['correct_answer'],
+            'explanation': item.get('explanation', ''),
+            'topic': item.get('topic', 'general'),
+            'difficulty': item.get('difficulty', 'easy'),
+        })
+        for item in json.loads(raw)['questions']
+    )
+
+
+def shuffle_dict_options(question, seed):
+    """Прежний shuffle_options: новый Random и список на каждый вызов"""
+    order = list(range(len(question['options'])))
+    random.Random((seed << 32) | question['id']).shuffle(order)
+    options = [question['options'][i] for i in order]
+    return options, order.index(question['correct_answer'])
+
+
+def retained_bytes(build: Callable[[], object]) -> Tuple[int, object]:
+    """Сколько памяти остается занято результатом build()"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return retained, result
+
+
+def answer_cost(questions, shuffle, answers: int) -> Dict[str, float]:
+    """Время и пик памяти на ответ: два перемешивания вариантов, как при показе и проверке"""
+    rng = random.Random(3)
+    picks = [(rng.choice(questions), rng.randrange(2 ** 32)) for _ in range(answers)]
+
+    started = time.perf_counter()
+    for question, seed in picks:
+        shuffle(question, seed)
+        shuffle(question, seed)
+    elapsed = time.perf_counter() - started
+
+    peaks = []
+    tracemalloc.start()
+    for question, seed in picks[:1000]:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        shuffle(question, seed)
+        shuffle(question, seed)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+
+    return {'us': elapsed / answers * 1e6, 'peak_b': sum(peaks) / len(peaks)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10_000, 100_000])
+    parser.add_argument('--answers', type=int, default=20_000, help='сколько ответов смоделировать')
+    args = parser.parse_args()
+
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    from core.services.quiz import QuizService
+    from data.question_bank import parse_questions
+
+    print(f"{'questions':>9} {'records':<9} {'bank, MB':>9} {'B/question':>11}"
+          f" {'answer, us':>11} {'peak B/answer':>14}")
+    for size in args.sizes:
+        raw = json.dumps(make_bank(size), ensure_ascii=False).encode('utf-8')
+        for name, parse, shuffle in (
+            ('dict', parse_as_dicts, shuffle_dict_options),
+            ('slots', parse_questions, QuizService.shuffle_options),
+        ):
+            retained, questions = retained_bytes(lambda: parse(raw))
+            cost = answer_cost(questions, shuffle, args.answers)
+            print(f"{size:>9} {name:<9} {retained / 2 ** 20:>9.2f} {retained / size:>11.0f}"
+                  f" {cost['us']:>11.2f} {cost['peak_b']:>14.0f}")
+            del questions
+
+
+if __name__ == "__main__":
+    main()
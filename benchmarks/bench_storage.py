@@ -0,0 +1,116 @@
+"""
+Сравнение пропускной способности Storage:
+постоянные соединения (WAL, synchronous=NORMAL) против подключения на каждый вызов.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_storage --ops 2000
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from data.models import User
+from data.storage import Storage
+
+
+class PerCallConnections:
+    """Прежнее поведение Storage: новое соединение на каждый вызов"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    @contextmanager
+    def write(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    read = write
+
+    def close(self):
+        pass
+
+
+def make_operations(storage: Storage, users: int):
+    """Набор типичных операций бота над хранилищем"""
+    now = datetime.now().isoformat()
+
+    def save_user(i):
+        # Новый username на каждый вызов: всегда запись в БД
+        user_id = i % users
+        storage.save_user(User(user_id, f"user{user_id}_{i}", f"Name{user_id}", now))
+
+    def save_user_unchanged(i):
+        # Те же данные, что уже сохранены: запись пропускается по known_users
+        user_id = i % users
+        username, first_name = storage.known_users[user_id]
+        storage.save_user(User(user_id, username, first_name, now))
+
+    def get_user_stats(i):
+        # Мимо кэша: каждый вызов читает БД
+        storage.load_user_stats(i % users)
+
+    def get_user_stats_cached(i):
+        # После get_user_stats кэш заполнен: замеряется попадание в LRU
+        storage.get_user_stats(i % users)
+
+    def save_test_result(i):
+        level = "junior" if i % 2 else "middle"
+        storage.save_test_result_with_level(i % users, i % 100, 100, level)
+
+    return {
+        'save_user': save_user,
+        'save_user (unchanged)': save_user_unchanged,
+        'get_user_stats': get_user_stats,
+        'get_user_stats (cached)': get_user_stats_cached,
+        'save_test_result_with_level': save_test_result,
+    }
+
+
+def run(mode: str, ops: int, users: int):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        # Отладочный вывод Storage не должен попадать в замер
+        with contextlib.redirect_stdout(io.StringIO()):
+            connections = PerCallConnections(db_path) if mode == 'per-call' else None
+            storage = Storage(db_path, connections=connections)
+            for name, operation in make_operations(storage, users).items():
+                started = time.perf_counter()
+                for i in range(ops):
+                    operation(i)
+                # Результаты тестов пишутся в фоне: замер включает запись очереди в БД
+                storage.results.flush()
+                results[name] = ops / (time.perf_counter() - started)
+            storage.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ops', type=int, default=2000, help="операций каждого типа")
+    parser.add_argument('--users', type=int, default=200, help="количество разных пользователей")
+    args = parser.parse_args()
+    if args.ops < args.users:
+        # save_user (unchanged) повторяет уже сохраненных пользователей
+        parser.error("--ops должно быть не меньше --users")
+
+    per_call = run('per-call', args.ops, args.users)
+    pooled = run('pooled', args.ops, args.users)
+
+    print(f"{'operation':<30}{'per-call ops/s':>16}{'pooled ops/s':>16}{'speedup':>10}")
+    for name in per_call:
+        print(f"{name:<30}{per_call[name]:>16.0f}{pooled[name]:>16.0f}{pooled[name] / per_call[name]:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
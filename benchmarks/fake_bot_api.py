@@ -0,0 +1,178 @@
+"""
+Локальная замена Telegram Bot API для нагрузочных тестов.
+Отвечает на методы бота минимально правдоподобными объектами
+и раздает синтетические обновления через getUpdates.
+Умеет добавлять сетевую задержку и отвечать 429 Too Many Requests
+"""
+import asyncio
+import itertools
+import json
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+from core.webhook import serve_http
+
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+
+
+def make_message_update(update_id: int, chat_id: int, text: str) -> Dict[str, Any]:
+    """Синтетическое обновление с текстовым сообщением (/команда размечается как команда)"""
+    message = {
+        'message_id': update_id,
+        'date': int(time.time()),
+        'chat': {'id': chat_id, 'type': 'private'},
+        'from': {'id': chat_id, 'is_bot': False, 'first_name': f'User{chat_id}'},
+        'text': text,
+    }
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'update_id': update_id, 'message': message}
+
+
+def make_callback_update(update_id: int, chat_id: int, message_id: int, data: str) -> Dict[str, Any]:
+    """Синтетическое обновление с нажатием inline-кнопки"""
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'chat_instance': str(chat_id),
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': f'User{chat_id}'},
+            'data': data,
+            'message': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': '...',
+            },
+        },
+    }
+
+
+# Методы, на которые Telegram отвечает flood control
+FLOOD_METHODS = frozenset({
+    'sendMessage', 'editMessageText', 'editMessageReplyMarkup', 'deleteMessage', 'deleteMessages',
+})
+
+
+class FakeBotAPI:
+    """
+    HTTP-сервер с путями вида /bot<token>/<method>.
+    on_call(method, params) вызывается на каждый запрос бота до ответа,
+    on_result(method, params, result) - после успешного ответа.
+    Кроме getUpdates и getMe, каждый ответ задерживается на latency_ms ± jitter_ms,
+    а доля flood_rate запросов из FLOOD_METHODS получает 429 с retry_after
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 on_call: Optional[Callable[[str, Dict[str, str]], None]] = None,
+                 on_result: Optional[Callable[[str, Dict[str, str], Any], None]] = None,
+                 latency_ms: float = 0, jitter_ms: float = 0,
+                 flood_rate: float = 0, retry_after: int = 1):
+        self.host = host
+        self.port = port
+        self.on_call = on_call
+        self.on_result = on_result
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.flood_rate = flood_rate
+        self.retry_after = retry_after
+        self.calls: Dict[str, int] = {}
+        self.flood_errors = 0
+        self._updates: List[Dict[str, Any]] = []
+        self._new_updates = asyncio.Event()
+        self._message_ids = itertools.count(1_000_000)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def base_url(self) -> str:
+        """Значение для ApplicationBuilder.base_url / BOT_API_BASE_URL"""
+        return f"http://{self.host}:{self.port}/bot"
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            lambda reader, writer: serve_http(reader, writer, self.handle),
+            self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def push_update(self, update: Dict[str, Any]):
+        """Кладет обновление в очередь getUpdates"""
+        self._updates.append(update)
+        self._new_updates.set()
+
+    async def handle(self, http_method, path, headers, body):
+        method = path.rsplit('/', 1)[-1]
+        params = self._parse_params(headers, body)
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.on_call is not None:
+            self.on_call(method, params)
+
+        if method not in ('getUpdates', 'getMe'):
+            delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+            if method in FLOOD_METHODS and self.flood_rate and random.random() < self.flood_rate:
+                self.flood_errors += 1
+                return 429, json.dumps({
+                    'ok': False,
+                    'error_code': 429,
+                    'description': f"Too Many Requests: retry after {self.retry_after}",
+                    'parameters': {'retry_after': self.retry_after},
+                }).encode()
+
+        result = await self.call(method, params)
+        if self.on_result is not None:
+            self.on_result(method, params, result)
+        return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    async def call(self, method: str, params: Dict[str, str]) -> Any:
+        if method == 'getMe':
+            return BOT_USER
+        if method == 'getUpdates':
+            return await self._get_updates(params)
+        if method in ('sendMessage', 'editMessageText'):
+            chat_id = int(params.get('chat_id', 0))
+            message_id = int(params['message_id']) if 'message_id' in params else next(self._message_ids)
+            return {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'from': BOT_USER,
+                'text': params.get('text', ''),
+            }
+        # setWebhook, deleteWebhook, answerCallbackQuery, deleteMessage(s) и прочее
+        return True
+
+    async def _get_updates(self, params: Dict[str, str]) -> List[Dict[str, Any]]:
+        offset = int(params.get('offset', 0))
+        limit = int(params.get('limit', 100))
+        timeout = float(params.get('timeout', 0))
+
+        # Подтвержденные обновления больше не нужны
+        self._updates = [update for update in self._updates if update['update_id'] >= offset]
+        if not self._updates and timeout > 0:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._updates[:limit]
+
+    @staticmethod
+    def _parse_params(headers: Dict[str, str], body: bytes) -> Dict[str, str]:
+        if not body:
+            return {}
+        if headers.get('content-type', '').startswith('application/json'):
+            return {key: value if isinstance(value, str) else json.dumps(value)
+                    for key, value in json.loads(body).items()}
+        return dict(parse_qsl(body.decode()))
@@ -1,19 +1,29 @@
+import asyncio
+import logging
+import os
 from core.application import create_application
 
 
+logger = logging.getLogger(__name__)
+
+
 def main():
     """
     Основная функция запуска бота
     """
-    print("🚀 Запускаю QA Testing Bot...")
+    logger.info("🚀 Запускаю QA Testing Bot...")
 
     # Создаем приложение бота
     application = create_application()
 
-    print("✅ Бот запущен и готов к работе!")
+    logger.info("✅ Бот запущен и готов к работе!")
 
-    # Запускаем бота в режиме опроса (polling)
-    application.run_polling()
+    # BOT_MODE=webhook - обновления приходят на HTTP-эндпоинт, по умолчанию polling
+    if os.environ.get('BOT_MODE', 'polling').lower() == 'webhook':
+        from core.webhook import WebhookConfig, serve_webhook
+        asyncio.run(serve_webhook(application, WebhookConfig.from_env()))
+    else:
+        application.run_polling()
 
 
 if __name__ == "__main__":
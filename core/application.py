@@ -1,3 +1,4 @@
+import asyncio
 import os
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler
 
@@ -19,9 +20,55 @@ def setup_environment():
 # Вызываем настройку окружения
 setup_environment()
 
+from utils.instrumentation import setup_logging, metrics
+
+# Логирование настраивается после .env, чтобы учесть LOG_LEVEL и LOG_FORMAT
+setup_logging()
+
 
 from core.handlers.commands import start_command, restart_command, cancel_command
 from core.handlers.callbacks import handle_button_click
+from core.router import router
+from core.services.transitions import transitions
+from core.concurrency import PerChatUpdateProcessor
+from core.rate_limiter import FloodControlRateLimiter
+from data.question_bank import question_bank
+from data.async_storage import async_storage
+from data.storage import storage
+from data.persistence import SQLitePersistence
+
+
+async def post_init(application: Application):
+    """Запускает фоновые службы после инициализации бота"""
+    # Следим за изменениями questions.json без перезапуска
+    question_bank.start_watching()
+
+
+async def post_shutdown(application: Application):
+    """Останавливает фоновые службы при завершении работы"""
+    question_bank.stop_watching()
+    # Очередь user_data дописывается до закрытия соединений с БД
+    application.persistence.close()
+    async_storage.shutdown()
+    storage.close()
+    metrics.log_snapshot()
+
+
+# Команды, которые сами отменяют переход чата
+PREEMPTING_COMMANDS = ('/restart', '/cancel')
+
+
+def preempt_transition(update, key):
+    """
+    Отменяет переход чата до того, как обновление встанет в очередь чата.
+    Иначе нажатие ждало бы окончания идущего перехода вместо того, чтобы прервать его
+    """
+    if update.callback_query is not None:
+        if router.cancels_transitions(update.callback_query.data):
+            transitions.cancel(key)
+    elif update.message is not None and update.message.text:
+        if update.message.text.split('@', 1)[0].split(' ', 1)[0] in PREEMPTING_COMMANDS:
+            transitions.cancel(key)
 
 
 def create_application():
@@ -35,7 +82,35 @@ def create_application():
         raise ValueError("❌ BOT_TOKEN not found in environment variables. "
                          "Please set BOT_TOKEN in Railway variables.")
 
-    application = Application.builder().token(BOT_TOKEN).build()
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        # Разные чаты обрабатываются параллельно, обновления одного чата - по очереди
+        .concurrent_updates(PerChatUpdateProcessor(
+            max_concurrent_updates=int(os.environ.get('MAX_CONCURRENT_UPDATES', 256)),
+            preempt=preempt_transition
+        ))
+        # Ограниченная очередь: при перегрузке polling и webhook ждут, а не копят обновления в памяти
+        .update_queue(asyncio.Queue(maxsize=int(os.environ.get('UPDATE_QUEUE_SIZE', 1000))))
+        # Исходящие запросы проходят через лимиты Telegram с приоритетом ответов пользователю.
+        # RATE_LIMIT_OVERALL и RATE_LIMIT_CHAT (сообщений в секунду) поднимают лимиты для нагрузочных тестов
+        .rate_limiter(FloodControlRateLimiter(
+            overall_rate=float(os.environ.get('RATE_LIMIT_OVERALL', 30)),
+            overall_burst=float(os.environ.get('RATE_LIMIT_OVERALL', 30)),
+            chat_rate=float(os.environ.get('RATE_LIMIT_CHAT', 1))
+        ))
+        # user_data хранится в той же БД: тест можно продолжить после перезапуска
+        .persistence(SQLitePersistence(storage.db, executor=async_storage.read_executor))
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+
+    # Локальная замена Bot API для нагрузочных тестов
+    base_url = os.environ.get('BOT_API_BASE_URL')
+    if base_url:
+        builder = builder.base_url(base_url)
+
+    application = builder.build()
 
     # Регистрируем обработчики команд
     application.add_handler(CommandHandler("start", start_command))
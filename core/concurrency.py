@@ -0,0 +1,124 @@
+import logging
+import time
+from asyncio import Lock, Semaphore
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from utils.instrumentation import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class KeyedLocks:
+    """
+    Асинхронные блокировки по ключу (id чата).
+    Блокировка существует, пока ее кто-то держит или ждет
+    """
+
+    def __init__(self):
+        # ключ -> [блокировка, сколько держат и ждут]
+        self._locks: Dict[Hashable, List[Any]] = {}
+
+    def depth(self, key: Hashable) -> int:
+        """Сколько задач держат или ждут блокировку ключа"""
+        entry = self._locks.get(key)
+        return entry[1] if entry else 0
+
+    @property
+    def waiting(self) -> int:
+        """Сколько задач сейчас ждут своей очереди по всем ключам"""
+        return sum(entry[1] - 1 for entry in self._locks.values())
+
+    def __len__(self):
+        return len(self._locks)
+
+    @asynccontextmanager
+    async def hold(self, key: Hashable):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+
+
+# Блокировки чатов: обработчики и отложенные переходы одного чата выполняются по очереди
+chat_locks = KeyedLocks()
+
+
+def update_key(update: object) -> Optional[Hashable]:
+    """Ключ упорядочивания обновления: id чата, а если его нет - id пользователя"""
+    if not isinstance(update, Update):
+        return None
+    if update.effective_chat is not None:
+        return update.effective_chat.id
+    if update.effective_user is not None:
+        return update.effective_user.id
+    return None
+
+
+class PerChatUpdateProcessor(BaseUpdateProcessor):
+    """
+    Параллельная обработка обновлений разных чатов.
+    Обновления одного чата обрабатываются строго по очереди, очередь чата ограничена.
+
+    BaseUpdateProcessor берет слот своего семафора еще до do_process_update (process_update
+    нельзя переопределить), поэтому он не ограничивает, а max_concurrent_updates действует
+    после очереди чата: обновления, ждущие свой чат, не занимают слоты и не мешают другим чатам.
+    preempt(update, key) вызывается до ожидания очереди чата - например, чтобы нажатие кнопки
+    отменило идущий переход, а не ждало его окончания
+    """
+
+    # Слоты базового семафора: ожидающие обновления ограничены max_pending_per_chat на чат
+    UNLIMITED = 2 ** 31
+
+    def __init__(self, max_concurrent_updates: int = 256, max_pending_per_chat: int = 8,
+                 locks: KeyedLocks = chat_locks,
+                 preempt: Optional[Callable[[object, Hashable], None]] = None):
+        super().__init__(self.UNLIMITED)
+        # Настоящее ограничение одновременно работающих обработчиков
+        self.limit = max_concurrent_updates
+        self.max_pending_per_chat = max_pending_per_chat
+        self.locks = locks
+        self.preempt = preempt
+        self._slots = Semaphore(max_concurrent_updates)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = update_key(update)
+        if key is None:
+            async with self._slots:
+                await coroutine
+            return
+
+        if self.locks.depth(key) >= self.max_pending_per_chat:
+            # Чат присылает обновления быстрее, чем мы их обрабатываем - лишние отбрасываем
+            if hasattr(coroutine, 'close'):
+                coroutine.close()
+            metrics.increment("updates.dropped")
+            logger.warning("⚠️ Очередь чата %s переполнена, обновление отброшено", key)
+            return
+
+        if self.preempt is not None:
+            self.preempt(update, key)
+
+        queued_at = time.perf_counter()
+        async with self.locks.hold(key):
+            async with self._slots:
+                metrics.observe("updates.queue_wait.duration_ms", (time.perf_counter() - queued_at) * 1000)
+                metrics.gauge("updates.queue_depth", self.locks.waiting)
+                await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
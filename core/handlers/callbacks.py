@@ -1,14 +1,27 @@
 from telegram import Update
 from telegram.ext import ContextTypes
-import asyncio
+import logging
+import time
 from utils.feedback import get_feedback
-from utils.keyboards import create_quiz_keyboard
+from utils.callback_data import (
+    ANSWER_PREFIX, AnswerPayload, decode_answer, TOPIC_PREFIX, TopicPayload, decode_topic, topics_tag
+)
 from core.services.quiz import QuizService
 from core.services.stats import StatsService
-from data.database import load_questions
+from core.services.transitions import transitions
+from core.router import router
+from core.services.cleanup import CleanupService
+from core.services.render import renderer
+from core.services.menu import menu_renderer
+from data.question_bank import question_bank
 from data.storage import storage
+from utils.instrumentation import metrics
 
 
+logger = logging.getLogger(__name__)
+
+
+@metrics.timed("handler.handle_button_click")
 async def handle_button_click(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Главный обработчик нажатий на inline-кнопки
@@ -16,35 +29,12 @@ async def handle_button_click(update: Update, context: ContextTypes.DEFAULT_TYPE
     query = update.callback_query
     await query.answer()
 
-    data = query.data
-
-    # Обработка разных типов кнопок
-    if data == "cancel_test":
-        await cancel_test_from_button(query, context)
-    elif data == "restart_test":
-        await restart_from_button(query, context)
-    elif data == "restart_from_menu":
-        await restart_from_menu_button(query, context)
-    elif data == "show_stats_from_menu":
-        await stats_from_menu(query, context)
-    elif data == "start_test_from_menu":
-        await start_test_from_menu(query, context)
-    elif data == "level_junior":
-        await start_junior_quiz(query, context)
-    elif data == "level_middle":
-        await start_middle_quiz(query, context)
-    elif data == "main_menu":
-        await main_menu(query, context)
-    elif data == "reset_stats_confirm":
-        await confirm_reset_stats(query, context)
-    elif data == "reset_stats_yes":
-        await reset_stats(query, context)
-    elif data == "reset_stats_no":
-        await main_menu(query, context)
-    elif data.startswith("answer_"):
-        await process_answer(query, data, context)
+    # Обработчик ищется по таблице маршрутов (см. декораторы @router.route)
+    await router.dispatch(query, context)
 
 
+@router.route("start_test_from_menu")
+@metrics.timed("handler.start_test_from_menu")
 async def start_test_from_menu(query, context):
     """
     Показывает выбор уровня сложности перед началом теста
@@ -71,24 +61,19 @@ async def start_test_from_menu(query, context):
     )
 
 
+@router.route("level_junior")
+@metrics.timed("handler.start_junior_quiz")
 async def start_junior_quiz(query, context):
     """
     Начинает тест в режиме Junior
     """
-    questions = load_questions()
-    if not questions:
+    snapshot = question_bank.snapshot
+    if not snapshot:
         await query.edit_message_text("❌ Вопросы не найдены!")
         return
 
     # ПЕРЕМЕШИВАЕМ вопросы в случайном порядке
-    shuffled_questions = QuizService.shuffle_questions(questions)
-
-    context.user_data.update({
-        'questions': shuffled_questions,
-        'current_question': 0,
-        'score': 0,
-        'level': 'junior'
-    })
+    QuizService.start_quiz(context, snapshot, level='junior')
 
     junior_text = """
 🎓 Режим: Junior
@@ -101,28 +86,22 @@ async def start_junior_quiz(query, context):
     await query.edit_message_text(junior_text, reply_markup=None)
     storage.track_message(query.from_user.id, query.message.message_id)
 
-    await asyncio.sleep(1.5)
-    await show_question_from_menu(query, context)
+    transitions.schedule(context, query.message.chat_id, 1.5, show_question, query, context)
 
 
+@router.route("level_middle")
+@metrics.timed("handler.start_middle_quiz")
 async def start_middle_quiz(query, context):
     """
     Начинает тест в режиме Middle
     """
-    questions = load_questions()
-    if not questions:
+    snapshot = question_bank.snapshot
+    if not snapshot:
         await query.edit_message_text("❌ Вопросы не найдены!")
         return
 
     # ПЕРЕМЕШИВАЕМ вопросы в случайном порядке
-    shuffled_questions = QuizService.shuffle_questions(questions)
-
-    context.user_data.update({
-        'questions': shuffled_questions,
-        'current_question': 0,
-        'score': 0,
-        'level': 'middle'
-    })
+    QuizService.start_quiz(context, snapshot, level='middle')
 
     middle_text = """
 💪 Режим: Middle
@@ -135,56 +114,102 @@ async def start_middle_quiz(query, context):
     await query.edit_message_text(middle_text, reply_markup=None)
     storage.track_message(query.from_user.id, query.message.message_id)
 
-    await asyncio.sleep(1.5)
-    await show_question_from_menu(query, context)
+    transitions.schedule(context, query.message.chat_id, 1.5, show_question, query, context)
 
 
-async def show_question_from_menu(query, context):
+@router.route("choose_topic")
+@metrics.timed("handler.choose_topic")
+async def choose_topic(query, context, notice: str = ''):
     """
-    Показывает первый вопрос ВСЕГДА новым сообщением
+    Показывает список тем с количеством вопросов.
+    notice - пояснение над списком (например, почему тест по теме не начался)
     """
-    result = await QuizService.get_current_question(context)
+    from utils.keyboards import create_topic_keyboard
 
-    if result is None:
-        await finish_test_from_callback(query, context)
+    snapshot = question_bank.snapshot
+    if not snapshot:
+        await query.edit_message_text("❌ Вопросы не найдены!")
+        return
+
+    labels = tuple(
+        f"{QuizService.topic_title(topic)} ({len(snapshot.topic_ids(topic))})"
+        for topic in snapshot.topics
+    )
+
+    await query.edit_message_text(
+        f"{notice}📚 Выберите тему:",
+        reply_markup=create_topic_keyboard(snapshot.topics, labels)
+    )
+
+
+@router.route_prefix(TOPIC_PREFIX, decode_topic)
+@metrics.timed("handler.start_topic_quiz")
+async def start_topic_quiz(query, context, payload: TopicPayload):
+    """
+    Начинает тест по выбранной теме.
+    У теста по теме свой уровень: его результаты не смешиваются со статистикой Junior
+    """
+    snapshot = question_bank.snapshot
+    if not snapshot:
+        await query.edit_message_text("❌ Вопросы не найдены!")
+        return
+    if payload.topics_tag != topics_tag(snapshot.topics) or payload.topic_index >= len(snapshot.topics):
+        # Кнопка из списка тем до перезагрузки банка: номер мог сменить тему
+        metrics.increment("callbacks.stale")
+        await choose_topic(query, context, notice="🔄 Список тем обновился.\n\n")
         return
 
-    question, current_index = result
+    topic = snapshot.topics[payload.topic_index]
+    QuizService.start_quiz(context, snapshot, level=QuizService.TOPIC_LEVEL, topic=topic)
 
-    # ПЕРЕМЕШИВАЕМ варианты ответов
-    shuffled_options, new_correct_index = QuizService.shuffle_options(question)
+    topic_text = f"""
+📚 Тема: {QuizService.topic_title(topic)}
 
-    # Сохраняем новый индекс правильного ответа в контексте
-    context.user_data[f'correct_index_{current_index}'] = new_correct_index
+Вопросов: {QuizService.get_total_questions(context)}
 
-    question_text = f"""
-🎯 Вопрос {current_index + 1}/{len(context.user_data['questions'])}
-{question['question']}
+Удачи! 🍀
+    """
+
+    await query.edit_message_text(topic_text, reply_markup=None)
+    storage.track_message(query.from_user.id, query.message.message_id)
+
+    transitions.schedule(context, query.message.chat_id, 1.5, show_question, query, context)
+
+
+@metrics.timed("handler.show_question")
+async def show_question(query, context):
+    """
+    Показывает текущий вопрос ВСЕГДА новым сообщением
+    """
+    if QuizService.is_session_expired(context):
+        await end_expired_session(query, context)
+        return
 
-""" + "\n".join([f"{i + 1}. {option}" for i, option in enumerate(shuffled_options)])
+    current_index = context.user_data.get('current_question', 0)
+    rendered = renderer.render(context, current_index)
 
-    level = context.user_data.get('level')
-    if level == 'middle':
-        question_text += "\n\n⚡ Всего 1 попытка!"
+    if rendered is None:
+        await finish_test_from_callback(query, context)
+        return
 
     # ВСЕГДА отправляем НОВОЕ сообщение с вопросом
-    message = await query.message.reply_text(
-        question_text,
-        reply_markup=create_quiz_keyboard(question, current_index, shuffled_options)
-    )
+    message = await query.message.reply_text(rendered.text, reply_markup=rendered.reply_markup)
 
     storage.track_message(query.from_user.id, message.message_id)
     context.user_data['last_question_message_id'] = message.message_id
+    context.user_data['shown_question'] = current_index
+    # Отсюда считается время ответа в журнале ответов
+    context.user_data['question_shown_at'] = time.time()
 
 
+@router.route("cancel_test")
+@metrics.timed("handler.cancel_test_from_button")
 async def cancel_test_from_button(query, context):
     """
     Отменяет текущий тест и возвращает в главное меню
     """
     # Очищаем данные теста
-    for key in ['questions', 'current_question', 'score', 'last_question_message_id']:
-        if key in context.user_data:
-            del context.user_data[key]
+    QuizService.clear_quiz(context)
 
     cancel_text = """
 🚫 Тест отменен
@@ -195,74 +220,34 @@ async def cancel_test_from_button(query, context):
     # РЕДАКТИРУЕМ текущее сообщение вместо отправки нового
     await query.edit_message_text(cancel_text, reply_markup=None)
 
-    # Ждем немного и показываем главное меню
-    await asyncio.sleep(1.5)
-    await main_menu(query, context)
+    # Через 1.5 секунды показываем главное меню
+    transitions.schedule(context, query.message.chat_id, 1.5, main_menu, query, context)
 
 
+@router.route("main_menu", "reset_stats_no")
+@metrics.timed("handler.main_menu")
 async def main_menu(query, context):
     """
     Возвращает в главное меню с БЫСТРОЙ очисткой
     """
-    from utils.keyboards import create_main_menu_keyboard
-
     user = query.from_user
     user_id = user.id
 
     # Инициализируем пользователя
-    StatsService.init_user(user_id, user.username, user.first_name)
-
-    # Получаем статистику
-    stats = StatsService.get_user_stats(user_id)
-
-    # Формируем блоки статистики для каждого уровня
-    junior_stats = ""
-    middle_stats = ""
-
-    if stats and (stats.junior_tests > 0 or stats.middle_tests > 0):
-        if stats.junior_tests > 0:
-            junior_success = StatsService.calculate_level_success_rate(stats, "junior")
-            junior_best_percentage = StatsService.calculate_best_score_percentage(stats, "junior")
-            junior_stats = f"""🎓 Junior
-    • Тестов: {stats.junior_tests}
-    • Последний результат: {stats.junior_total_correct}/{stats.junior_total_questions}
-    • Успешность: {junior_success}%
-    • Лучший результат: {stats.junior_best_score}/100 ({junior_best_percentage}%)"""
-
-        if stats.middle_tests > 0:
-            middle_success = StatsService.calculate_level_success_rate(stats, "middle")
-            middle_best_percentage = StatsService.calculate_best_score_percentage(stats, "middle")
-            middle_stats = f"""💪 Middle
-    • Тестов: {stats.middle_tests}
-    • Последний результат: {stats.middle_total_correct}/{stats.middle_total_questions}
-    • Успешность: {middle_success}%
-    • Лучший результат: {stats.middle_best_score}/100 ({middle_best_percentage}%)"""
-
-        if junior_stats and middle_stats:
-            stats_section = f"""📊 Ваша статистика:
-
-    {junior_stats}
-
-    {middle_stats}"""
-        else:
-            stats_section = f"""📊 Ваша статистика:
-
-    {junior_stats}{middle_stats}"""
-    else:
-        stats_section = "📊 Статистика: пройдите первый тест!"
-
-    welcome_text = f"""Привет, {user.first_name}! 👋
+    await StatsService.init_user(user_id, user.username, user.first_name)
 
-Я бот для проверки знаний QA.
+    # Текст меню берется из кэша, пока статистика не менялась
+    welcome_text = await menu_renderer.get_welcome_text(user_id, user.first_name)
 
-    {stats_section}
+    # Очистка и показ меню идут в фоне, обработчик сразу освобождается
+    transitions.schedule(context, query.message.chat_id, 0, show_main_menu, query, context, welcome_text)
 
-    📚 Что вас ждет:
-    • 100 вопросов по основам QA
-    • Объяснения к каждому ответу  
-    • Статистика ваших результатов
 
-Готовы начать? 🚀"""
+async def show_main_menu(query, context, welcome_text):
+    """
+    Очищает историю и показывает главное меню
+    """
+    from utils.keyboards import create_main_menu_keyboard
 
     # 1. ОЧИСТКА СООБЩЕНИЙ через общую функцию
     await clear_chat_history(query, context)
@@ -274,28 +259,42 @@ async def main_menu(query, context):
     )
 
 
+@router.route("restart_test")
+@metrics.timed("handler.restart_from_button")
 async def restart_from_button(query, context):
     """
     Перезапускает тест при нажатии на кнопку
     """
-
-    await clear_chat_history(query, context)
-
-    # ЗАГРУЖАЕМ ВОПРОСЫ ЗАНОВО
-    questions = load_questions()
-    if not questions:
+    # БЕРЕМ ТЕКУЩУЮ ВЕРСИЮ БАНКА ВОПРОСОВ
+    snapshot = question_bank.snapshot
+    if not snapshot:
         await query.edit_message_text("❌ Вопросы не найдены!")
         return
 
-    # Очищаем данные теста
-    for key in ['current_question', 'score', 'last_question_message_id', 'questions']:
-        if key in context.user_data:
-            del context.user_data[key]
+    # Тест по теме перезапускается по той же теме, если она осталась в банке
+    topic = context.user_data.get('topic')
+    if topic is not None and not snapshot.topic_ids(topic):
+        QuizService.clear_quiz(context)
+        context.user_data.pop('topic', None)
+        await choose_topic(
+            query, context,
+            notice=f"⚠️ Тема «{QuizService.topic_title(topic)}» больше недоступна.\n\n"
+        )
+        return
+
+    # Очищаем данные теста и начинаем новую сессию
+    QuizService.clear_quiz(context)
+    QuizService.start_quiz(context, snapshot, topic=topic)
 
-    # ЗАГРУЖАЕМ НОВЫЕ ВОПРОСЫ
-    context.user_data['questions'] = QuizService.shuffle_questions(questions)
-    context.user_data['current_question'] = 0
-    context.user_data['score'] = 0
+    # Очистка истории и первый вопрос показываются в фоне
+    transitions.schedule(context, query.message.chat_id, 0, show_restarted_quiz, query, context)
+
+
+async def show_restarted_quiz(query, context):
+    """
+    Очищает историю и через 1.5 секунды показывает первый вопрос нового теста
+    """
+    await clear_chat_history(query, context)
 
     restart_text = """
 🔄 Тест начат заново!
@@ -304,11 +303,12 @@ async def restart_from_button(query, context):
     """
 
     await query.edit_message_text(restart_text, reply_markup=None)
-    await asyncio.sleep(1.5)
 
-    await show_question_from_menu(query, context)
+    transitions.schedule(context, query.message.chat_id, 1.5, show_question, query, context)
 
 
+@router.route("restart_from_menu")
+@metrics.timed("handler.restart_from_menu_button")
 async def restart_from_menu_button(query, context):
     """
     Перезапускает бота из главного меню
@@ -328,10 +328,11 @@ async def restart_from_menu_button(query, context):
     await query.edit_message_text(restart_text, reply_markup=None)
 
     # Через секунду показываем главное меню
-    await asyncio.sleep(1)
-    await main_menu(query, context)
+    transitions.schedule(context, query.message.chat_id, 1, main_menu, query, context)
 
 
+@router.route("show_stats_from_menu")
+@metrics.timed("handler.stats_from_menu")
 async def stats_from_menu(query, context):
     """
     Показывает статистику из главного меню
@@ -360,24 +361,50 @@ async def stats_from_menu(query, context):
     )
 
 
-async def process_answer(query, callback_data, context):
+@router.route_prefix(ANSWER_PREFIX, decode_answer, cancels_transitions=False)
+@metrics.timed("handler.process_answer")
+async def process_answer(query, context, answer: AnswerPayload):
     """
     Обрабатывает ответ пользователя
     """
-    parts = callback_data.split('_')
-    question_index = int(parts[1])
-    answer_index = int(parts[2])
+    # Кнопка из прошлого теста: отбрасываем до обращения к данным сессии
+    if answer.nonce != context.user_data.get('nonce'):
+        metrics.increment("callbacks.stale")
+        return
+
+    question_index = answer.question_index
+    answer_index = answer.option
+
+    current_index = context.user_data.get('current_question')
+    if question_index != current_index:
+        # Переходы не сохраняются: если бот перезапустился, пока ждал показа следующего вопроса,
+        # вопрос так и не появится. Нажатие на последний показанный вопрос показывает его
+        if (current_index is not None and question_index == current_index - 1
+                and context.user_data.get('shown_question', question_index) == question_index
+                and not transitions.has_pending(query.message.chat_id)):
+            metrics.increment("quiz.resumed")
+            await show_question(query, context)
+        # Повторное нажатие на уже отвеченный вопрос игнорируем
+        return
+
+    if QuizService.is_session_expired(context):
+        await end_expired_session(query, context)
+        return
 
-    questions = context.user_data['questions']
-    question = questions[question_index]
+    question = QuizService.get_question(context, question_index)
+    if question is None:
+        return
     level = context.user_data.get('level', 'junior')
 
-    # Получаем ПРАВИЛЬНЫЙ индекс из контекста
-    correct_index = context.user_data.get(f'correct_index_{question_index}', question['correct_answer'])
+    # Получаем ПРАВИЛЬНЫЙ индекс из порядка вариантов сессии
+    _, correct_index = QuizService.get_options(context, question)
 
     # Проверяем правильность ответа
     is_correct = answer_index == correct_index
 
+    # В журнал ответов: только постановка в очередь, без обращения к БД
+    storage.record_answer(QuizService.answer_event(context, query.from_user.id, question, answer_index, is_correct))
+
     if is_correct:
         context.user_data['score'] += 1
         result_icon = "✅"
@@ -394,7 +421,7 @@ async def process_answer(query, callback_data, context):
 
     result_message = f"""{result_icon} Вопрос {question_index + 1}: {result_text}
 
-💡 {question['explanation']}"""
+💡 {question.explanation}"""
 
     # 1. Сначала отправляем результат ответа
     result_msg = await query.message.reply_text(result_message)
@@ -409,49 +436,31 @@ async def process_answer(query, callback_data, context):
         await finish_test_from_callback(query, context)
         return
 
-    # 2. Ждем немного и показываем СЛЕДУЮЩИЙ вопрос
-    await asyncio.sleep(1)
-    await show_next_question_always_new(query, context)
+    # Следующий вопрос готовится, пока пользователь читает пояснение
+    renderer.prefetch(context, context.user_data['current_question'])
 
+    # 2. Через секунду показываем СЛЕДУЮЩИЙ вопрос
+    transitions.schedule(context, query.message.chat_id, 1, show_question, query, context)
 
-async def show_next_question_always_new(query, context):
+
+async def end_expired_session(query, context):
     """
-    Показывает следующий вопрос ВСЕГДА новым сообщением
+    Завершает тест, версия банка которого больше недоступна.
+    Результат не сохраняется: пользователь начинает тест заново на новой версии
     """
-    result = await QuizService.get_current_question(context)
-
-    if result is None:
-        await finish_test_from_callback(query, context)
-        return
-
-    question, current_index = result
-
-    # ПЕРЕМЕШИВАЕМ варианты ответов
-    shuffled_options, new_correct_index = QuizService.shuffle_options(question)
-
-    # Сохраняем новый индекс правильного ответа в контексте
-    context.user_data[f'correct_index_{current_index}'] = new_correct_index
-
-    question_text = f"""
-🎯 Вопрос {current_index + 1}/{len(context.user_data['questions'])}
-{question['question']}
-
-""" + "\n".join([f"{i + 1}. {option}" for i, option in enumerate(shuffled_options)])
+    from utils.keyboards import create_restart_keyboard
 
-    level = context.user_data.get('level')
-    if level == 'middle':
-        question_text += "\n\n⚡ Всего 1 попытка!"
+    QuizService.clear_quiz(context)
+    metrics.increment("quiz.bank_expired")
 
-    # ВСЕГДА отправляем НОВОЕ сообщение с вопросом
     message = await query.message.reply_text(
-        question_text,
-        reply_markup=create_quiz_keyboard(question, current_index, shuffled_options)
+        "🔄 Банк вопросов обновился, пока шел тест.\n\nНачните тест заново.",
+        reply_markup=create_restart_keyboard()
     )
-
     storage.track_message(query.from_user.id, message.message_id)
-    context.user_data['last_question_message_id'] = message.message_id
 
 
+@metrics.timed("handler.finish_test_from_callback")
 async def finish_test_from_callback(query, context):
     """
     Завершает тест при вызове из callback
@@ -476,7 +485,7 @@ async def finish_test_from_callback(query, context):
     """
 
     # СОХРАНЯЕМ РЕЗУЛЬТАТ ТЕСТА С УЧЕТОМ УРОВНЯ
-    StatsService.save_test_result(
+    await StatsService.save_test_result(
         user_id=query.from_user.id,
         score=score,
         total_questions=total,
@@ -484,9 +493,7 @@ async def finish_test_from_callback(query, context):
     )
 
     # Очищаем временные данные теста
-    for key in ['current_question', 'score', 'last_question_message_id', 'questions']:
-        if key in context.user_data:
-            del context.user_data[key]
+    QuizService.clear_quiz(context)
 
     # Отправляем результат с кнопками
     result_message = await query.message.reply_text(
@@ -499,6 +506,7 @@ async def finish_test_from_callback(query, context):
     storage.track_message(query.from_user.id, result_message.message_id)
 
 
+@metrics.timed("handler.finish_middle_test_early")
 async def finish_middle_test_early(query, context, questions_answered):
     """
     Завершает тест Middle при неправильном ответе и возвращает в главное меню
@@ -508,7 +516,7 @@ async def finish_middle_test_early(query, context, questions_answered):
 
     score = context.user_data['score']
     level = context.user_data.get('level', 'middle')
-    total_questions = len(context.user_data.get('questions', []))
+    total_questions = QuizService.get_total_questions(context)
 
     result_text = f"""
 💥 Тест завершен!
@@ -524,7 +532,7 @@ async def finish_middle_test_early(query, context, questions_answered):
     """
 
     # СОХРАНЯЕМ РЕЗУЛЬТАТ ТЕСТА С УЧЕТОМ УРОВНЯ - ВАЖНО: сохраняем общее количество вопросов
-    StatsService.save_test_result(
+    await StatsService.save_test_result(
         user_id=query.from_user.id,
         score=score,
         total_questions=total_questions,
@@ -536,9 +544,7 @@ async def finish_middle_test_early(query, context, questions_answered):
     context.user_data['last_total'] = total_questions
 
     # Очищаем данные теста, но оставляем статистику для отображения
-    for key in ['current_question', 'score', 'questions', 'last_question_message_id']:
-        if key in context.user_data:
-            del context.user_data[key]
+    QuizService.clear_quiz(context)
 
     # Отправляем результат с кнопками для продолжения
     result_message = await query.message.reply_text(
@@ -551,6 +557,8 @@ async def finish_middle_test_early(query, context, questions_answered):
     storage.track_message(query.from_user.id, result_message.message_id)
 
 
+@router.route("reset_stats_confirm")
+@metrics.timed("handler.confirm_reset_stats")
 async def confirm_reset_stats(query, context):
     """
     Показывает подтверждение сброса статистики
@@ -574,6 +582,8 @@ async def confirm_reset_stats(query, context):
     )
 
 
+@router.route("reset_stats_yes")
+@metrics.timed("handler.reset_stats")
 async def reset_stats(query, context):
     """
     Сбрасывает статистику пользователя и возвращает в главное меню
@@ -581,7 +591,7 @@ async def reset_stats(query, context):
     user_id = query.from_user.id
 
     # Сбрасываем статистику
-    storage.reset_user_stats(user_id)
+    await StatsService.reset_user_stats(user_id)
 
     # Показываем сообщение об успехе
     success_text = """
@@ -594,64 +604,19 @@ async def reset_stats(query, context):
 
     await query.edit_message_text(success_text, reply_markup=None)
 
-    # Ждем 2 секунды и показываем главное меню
-    await asyncio.sleep(2)
-    await main_menu(query, context)
+    # Через 2 секунды показываем главное меню
+    transitions.schedule(context, query.message.chat_id, 2, main_menu, query, context)
 
 
+@metrics.timed("handler.clear_chat_history")
 async def clear_chat_history(query, context):
     """
-    Очищает историю сообщений бота
+    Очищает историю сообщений бота.
+    Сообщения удаляются пачками в фоне, поэтому меню показывается сразу
     """
-    user_id = query.from_user.id
-    chat_id = query.message.chat_id
-    current_message_id = query.message.message_id
-
-    try:
-        # 1. ОТПРАВЛЯЕМ АНИМИРОВАННОЕ УВЕДОМЛЕНИЕ
-        cleanup_msg = await query.message.reply_text("🧹 Очистка истории...")
-        storage.track_message(user_id, cleanup_msg.message_id)
-
-        # 2. АНИМАЦИЯ ЗАГРУЗКИ
-        dots = ["", ".", "..", "..."]
-        for i in range(8):  # 2 секунды анимации
-            await cleanup_msg.edit_text(f"🧹 Очистка истории{dots[i % 4]}")
-            await asyncio.sleep(0.25)
-
-        # 3. ОСНОВНАЯ ЛОГИКА ОЧИСТКИ (как в варианте 1)
-        message_ids = storage.get_user_messages(user_id)
-        batch_size = 10
-        deleted_count = 0
-
-        for i in range(0, len(message_ids), batch_size):
-            batch = message_ids[i:i + batch_size]
-            messages_to_delete = [msg_id for msg_id in batch if msg_id != current_message_id]
-
-            if messages_to_delete:
-                delete_tasks = []
-                for message_id in messages_to_delete:
-                    try:
-                        task = context.bot.delete_message(chat_id, message_id)
-                        delete_tasks.append(task)
-                    except Exception:
-                        pass
-
-                if delete_tasks:
-                    await asyncio.gather(*delete_tasks, return_exceptions=True)
-                    deleted_count += len(messages_to_delete)
-
-                await asyncio.sleep(0.1)
-
-        # 4. ФИНАЛЬНОЕ УВЕДОМЛЕНИЕ
-        await cleanup_msg.edit_text(f"✅ История очищена ({deleted_count} сообщений)")
-
-        # 5. УДАЛЯЕМ УВЕДОМЛЕНИЕ ЧЕРЕЗ 1.5 СЕКУНДЫ
-        await asyncio.sleep(1.5)
-        await context.bot.delete_message(chat_id, cleanup_msg.message_id)
-
-        # 6. Очищаем список сообщений
-        storage.clear_user_messages(user_id)
-        storage.track_message(user_id, current_message_id)
-
-    except Exception as e:
-        print(f"⚠️ Ошибка при очистке сообщений: {e}")
+    CleanupService.clear_history(
+        context,
+        query.from_user.id,
+        query.message.chat_id,
+        query.message.message_id
+    )
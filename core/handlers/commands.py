@@ -2,8 +2,12 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from utils.keyboards import create_main_menu_keyboard
 from core.services.stats import StatsService
+from core.services.menu import menu_renderer
+from core.services.transitions import transitions
+from utils.instrumentation import metrics
 
 
+@metrics.timed("handler.start_command")
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Главное меню со статистикой пользователя
@@ -11,59 +15,10 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user = update.message.from_user
 
     # Инициализируем пользователя в системе
-    StatsService.init_user(user.id, user.username, user.first_name)
-
-    # Получаем статистику
-    stats = StatsService.get_user_stats(user.id)
-
-    # Формируем блоки статистики для каждого уровня
-    junior_stats = ""
-    middle_stats = ""
-
-    if stats and (stats.junior_tests > 0 or stats.middle_tests > 0):
-        if stats.junior_tests > 0:
-            junior_success = StatsService.calculate_level_success_rate(stats, "junior")
-            junior_best_percentage = StatsService.calculate_best_score_percentage(stats, "junior")
-            junior_stats = f"""🎓 Junior
-    • Тестов: {stats.junior_tests}
-    • Последний результат: {stats.junior_total_correct}/{stats.junior_total_questions}
-    • Успешность: {junior_success}%
-    • Лучший результат: {stats.junior_best_score}/100 ({junior_best_percentage}%)"""
-
-        if stats.middle_tests > 0:
-            middle_success = StatsService.calculate_level_success_rate(stats, "middle")
-            middle_best_percentage = StatsService.calculate_best_score_percentage(stats, "middle")
-            middle_stats = f"""💪 Middle
-    • Тестов: {stats.middle_tests}
-    • Последний результат: {stats.middle_total_correct}/{stats.middle_total_questions}
-    • Успешность: {middle_success}%
-    • Лучший результат: {stats.middle_best_score}/100 ({middle_best_percentage}%)"""
-
-        if junior_stats and middle_stats:
-            stats_section = f"""📊 Ваша статистика:
-
-    {junior_stats}
-
-    {middle_stats}"""
-        else:
-            stats_section = f"""📊 Ваша статистика:
-
-    {junior_stats}{middle_stats}"""
-    else:
-        stats_section = "📊 Статистика: пройдите первый тест!"
-
-    welcome_text = f"""Привет, {user.first_name}! 👋
-
-Я бот для проверки знаний QA.
-
-    {stats_section}
-
-    📚 Что вас ждет:
-    • 100 вопросов по основам QA
-    • Объяснения к каждому ответу  
-    • Статистика ваших результатов
+    await StatsService.init_user(user.id, user.username, user.first_name)
 
-Готовы начать? 🚀"""
+    # Текст меню берется из кэша, пока статистика не менялась
+    welcome_text = await menu_renderer.get_welcome_text(user.id, user.first_name)
 
     await update.message.reply_text(
         welcome_text,
@@ -71,11 +26,13 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 
+@metrics.timed("handler.restart_command")
 async def restart_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Полностью перезапускает бота - очищает все данные и начинает с начала
     """
-    # Полностью очищаем все данные пользователя
+    # Полностью очищаем все данные пользователя и ожидающие переходы
+    transitions.cancel(update.message.chat_id)
     context.user_data.clear()
 
     user = update.message.from_user
@@ -93,12 +50,14 @@ async def restart_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(restart_text)
 
 
+@metrics.timed("handler.cancel_command")
 async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Обрабатывает команду /cancel - отменяет тест если он активен
     """
     if 'current_question' in context.user_data:
         from core.handlers.callbacks import cancel_test_from_button
+        transitions.cancel(update.message.chat_id)
         # Создаем fake query для совместимости
         class FakeQuery:
             def __init__(self, message):
@@ -0,0 +1,223 @@
+import asyncio
+import itertools
+import logging
+import time
+from bisect import insort
+from datetime import timedelta
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from utils.instrumentation import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты исходящих запросов: чем меньше, тем раньше уходит запрос
+INTERACTIVE = 0
+NORMAL = 1
+COSMETIC = 2
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity про запас"""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Через сколько секунд появится токен (0 - уже есть)"""
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        self.delay(now)
+        return self.tokens >= self.capacity
+
+
+def _seconds(value) -> float:
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+class FloodControlRateLimiter(BaseRateLimiter[int]):
+    """
+    Планировщик исходящих запросов к Bot API.
+    Общее ведро токенов на бота и отдельное на каждый чат (у групп лимит строже).
+    Ожидающие запросы выдаются по приоритету: ответы пользователю раньше
+    косметических правок и удалений. На RetryAfter все запросы ждут retry_after и повторяются
+    """
+
+    # Не расходуют лимит сообщений: ответ на нажатие кнопки и служебные методы
+    UNLIMITED = frozenset({
+        'answerCallbackQuery', 'getMe', 'getUpdates', 'setWebhook', 'deleteWebhook',
+        'getWebhookInfo', 'close', 'logOut',
+    })
+
+    ENDPOINT_PRIORITY = {
+        'sendMessage': INTERACTIVE,
+        'deleteMessage': COSMETIC,
+        'deleteMessages': COSMETIC,
+    }
+
+    # Ведра чатов без ожидающих запросов удаляются раз в столько секунд
+    BUCKET_CLEANUP_INTERVAL = 60.0
+
+    def __init__(self, overall_rate: float = 30, overall_burst: float = 30,
+                 chat_rate: float = 1, chat_burst: float = 5,
+                 group_rate: float = 20 / 60, group_burst: float = 3,
+                 max_retries: int = 3):
+        self.overall_rate = overall_rate
+        self.overall_burst = overall_burst
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+
+        self._overall = TokenBucket(overall_rate, overall_burst, time.monotonic())
+        self._chats: Dict[Hashable, TokenBucket] = {}
+        # (приоритет, порядковый номер, chat_id, future) - список отсортирован
+        self._waiting: List[Tuple[int, int, Any, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._halted_until = 0.0
+        self._last_cleanup = time.monotonic()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    async def initialize(self) -> None:
+        self._wakeup = asyncio.Event()
+        self._dispatcher = asyncio.create_task(self._dispatch(), name="rate-limiter")
+
+    async def shutdown(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+            self._dispatcher = None
+        for *_, future in self._waiting:
+            future.cancel()
+        self._waiting.clear()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        if endpoint in self.UNLIMITED:
+            return await callback(*args, **kwargs)
+
+        if isinstance(rate_limit_args, int):
+            priority = rate_limit_args
+        else:
+            priority = self.ENDPOINT_PRIORITY.get(endpoint, NORMAL)
+        chat_id = data.get('chat_id')
+        metrics.increment("ratelimit.requests")
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority, chat_id)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as error:
+                if attempt == self.max_retries:
+                    metrics.increment("ratelimit.failed")
+                    raise
+                retry_after = _seconds(error.retry_after)
+                metrics.increment("ratelimit.retry_after")
+                logger.warning("⚠️ Flood control на %s: ждем %.1f с (попытка %s)", endpoint, retry_after, attempt + 1)
+                # Лимит превышен - приостанавливаем все запросы, а не только этот
+                self._halted_until = max(self._halted_until, time.monotonic() + retry_after)
+        return None
+
+    def _chat_bucket(self, chat_id, now: float) -> Optional[TokenBucket]:
+        if chat_id is None:
+            return None
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            is_group = not isinstance(chat_id, int) or chat_id < 0
+            if is_group:
+                bucket = TokenBucket(self.group_rate, self.group_burst, now)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _try_take(self, chat_id, now: float) -> float:
+        """Забирает токены, если они есть. Возвращает 0 или сколько ждать"""
+        delay = self._overall.delay(now)
+        if delay > 0:
+            return delay
+        bucket = self._chat_bucket(chat_id, now)
+        if bucket is not None:
+            delay = bucket.delay(now)
+            if delay > 0:
+                return delay
+            bucket.take()
+        self._overall.take()
+        return 0.0
+
+    async def _acquire(self, priority: int, chat_id):
+        now = time.monotonic()
+        # Быстрый путь: очереди нет и токены есть
+        if not self._waiting and now >= self._halted_until and self._try_take(chat_id, now) == 0:
+            return
+
+        started = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        insort(self._waiting, (priority, next(self._sequence), chat_id, future))
+        metrics.increment("ratelimit.delayed")
+        metrics.gauge("ratelimit.queue_depth", len(self._waiting))
+        self._wakeup.set()
+        await future
+        metrics.observe("ratelimit.wait.duration_ms", (time.perf_counter() - started) * 1000)
+
+    def _grant_ready(self) -> float:
+        """Выдает разрешения всем, кому можно. Возвращает время до следующей проверки"""
+        now = time.monotonic()
+        if now - self._last_cleanup > self.BUCKET_CLEANUP_INTERVAL:
+            self._cleanup_buckets(now)
+        if not self._waiting:
+            return self.BUCKET_CLEANUP_INTERVAL
+        if now < self._halted_until:
+            return self._halted_until - now
+
+        next_check = None
+        still_waiting = []
+        for entry in self._waiting:
+            future = entry[3]
+            if future.done():
+                # Запрос отменили, пока он ждал
+                continue
+            delay = self._try_take(entry[2], now)
+            if delay == 0:
+                future.set_result(None)
+                continue
+            still_waiting.append(entry)
+            next_check = delay if next_check is None else min(next_check, delay)
+        self._waiting = still_waiting
+        return next_check if next_check is not None else self.BUCKET_CLEANUP_INTERVAL
+
+    def _cleanup_buckets(self, now: float):
+        """Удаляет полные ведра: чат давно ничего не отправлял"""
+        self._last_cleanup = now
+        busy = {entry[2] for entry in self._waiting}
+        for chat_id in [chat_id for chat_id, bucket in self._chats.items()
+                        if chat_id not in busy and bucket.is_full(now)]:
+            del self._chats[chat_id]
+
+    async def _dispatch(self):
+        while True:
+            self._wakeup.clear()
+            delay = self._grant_ready()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
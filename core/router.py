@@ -0,0 +1,94 @@
+import logging
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from core.services.transitions import transitions
+from utils.callback_data import SEPARATOR
+from utils.instrumentation import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class Route(NamedTuple):
+    handler: Callable[..., Awaitable[Any]]
+    # Нажатие отменяет ожидающий переход чата (например, показ меню после отмены теста)
+    cancels_transitions: bool
+
+
+class CallbackRouter:
+    """
+    Таблица обработчиков inline-кнопок.
+    Точные callback_data ищутся в словаре, данные с префиксом разбираются декодером префикса.
+    Новые кнопки добавляются регистрацией, а не правкой цепочки if/elif
+    """
+
+    def __init__(self):
+        self._exact: Dict[str, Route] = {}
+        self._prefixed: Dict[str, Tuple[Route, Callable[[str], Optional[Any]]]] = {}
+
+    def route(self, *callback_ids: str, cancels_transitions: bool = True):
+        """Декоратор: handler(query, context) для точных значений callback_data"""
+        def decorator(handler):
+            for callback_id in callback_ids:
+                if callback_id in self._exact:
+                    raise ValueError(f"callback_data {callback_id!r} уже зарегистрирован")
+                self._exact[callback_id] = Route(handler, cancels_transitions)
+            return handler
+        return decorator
+
+    def route_prefix(self, prefix: str, decode: Callable[[str], Optional[Any]], cancels_transitions: bool = True):
+        """
+        Декоратор: handler(query, context, payload) для callback_data вида <prefix>:<поля>.
+        decode получает поля и возвращает payload или None для поврежденных данных
+        """
+        def decorator(handler):
+            if prefix in self._prefixed:
+                raise ValueError(f"префикс {prefix!r} уже зарегистрирован")
+            self._prefixed[prefix] = (Route(handler, cancels_transitions), decode)
+            return handler
+        return decorator
+
+    def cancels_transitions(self, data: Optional[str]) -> bool:
+        """Отменит ли нажатие кнопки с такими callback_data переход чата (без вызова обработчика)"""
+        data = data or ''
+        route = self._exact.get(data)
+        if route is None:
+            prefix, separator, _ = data.partition(SEPARATOR)
+            entry = self._prefixed.get(prefix) if separator else None
+            if entry is None:
+                return False
+            route = entry[0]
+        return route.cancels_transitions
+
+    async def dispatch(self, query, context) -> bool:
+        """Вызывает обработчик кнопки. False - кнопка неизвестна или данные повреждены"""
+        data = query.data or ''
+        route = self._exact.get(data)
+        payload = None
+
+        if route is None:
+            prefix, separator, fields = data.partition(SEPARATOR)
+            entry = self._prefixed.get(prefix) if separator else None
+            if entry is None:
+                metrics.increment("callbacks.unknown")
+                logger.debug("Неизвестная кнопка: %r", data)
+                return False
+            route, decode = entry
+            payload = decode(fields)
+            if payload is None:
+                metrics.increment("callbacks.malformed")
+                logger.debug("Поврежденные данные кнопки: %r", data)
+                return False
+
+        if route.cancels_transitions:
+            transitions.cancel(query.message.chat_id)
+
+        if payload is None:
+            await route.handler(query, context)
+        else:
+            await route.handler(query, context, payload)
+        return True
+
+
+# Глобальный маршрутизатор inline-кнопок
+router = CallbackRouter()
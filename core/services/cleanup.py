@@ -0,0 +1,71 @@
+import asyncio
+import logging
+from typing import List
+
+from telegram.error import BadRequest
+from data.storage import storage
+from utils.instrumentation import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Bot API удаляет до 100 сообщений одним вызовом deleteMessages
+DELETE_BATCH_SIZE = 100
+
+
+class CleanupService:
+    @staticmethod
+    async def delete_messages(bot, chat_id: int, message_ids: List[int]) -> int:
+        """
+        Удаляет сообщения пачками по DELETE_BATCH_SIZE.
+        Если пачку удалить не удалось, удаляет ее сообщения по одному.
+        Возвращает количество запросов к API
+        """
+        api_calls = 0
+        for i in range(0, len(message_ids), DELETE_BATCH_SIZE):
+            batch = message_ids[i:i + DELETE_BATCH_SIZE]
+            api_calls += 1
+            try:
+                await bot.delete_messages(chat_id, batch)
+                continue
+            except BadRequest as e:
+                logger.debug("Пачка из %s сообщений не удалена (%s), удаляем по одному", len(batch), e)
+
+            # Например, часть сообщений старше 48 часов - удаляем то, что еще можно
+            await asyncio.gather(
+                *(bot.delete_message(chat_id, message_id) for message_id in batch),
+                return_exceptions=True
+            )
+            api_calls += len(batch)
+            metrics.increment("cleanup.fallbacks")
+
+        metrics.increment("cleanup.messages", len(message_ids))
+        metrics.increment("cleanup.api_calls", api_calls)
+        return api_calls
+
+    @staticmethod
+    def clear_history(context, user_id: int, chat_id: int, keep_message_id: int) -> int:
+        """
+        Забирает отслеживаемые сообщения пользователя и удаляет их в фоне.
+        Сообщение keep_message_id остается. Возвращает количество сообщений на удаление
+        """
+        message_ids = [
+            message_id for message_id in dict.fromkeys(storage.get_user_messages(user_id))
+            if message_id != keep_message_id
+        ]
+        storage.clear_user_messages(user_id)
+        storage.track_message(user_id, keep_message_id)
+
+        if message_ids:
+            context.application.create_task(
+                CleanupService._delete_in_background(context.bot, chat_id, message_ids),
+                name=f"cleanup:{chat_id}"
+            )
+        return len(message_ids)
+
+    @staticmethod
+    async def _delete_in_background(bot, chat_id: int, message_ids: List[int]):
+        try:
+            await CleanupService.delete_messages(bot, chat_id, message_ids)
+        except Exception as e:
+            logger.warning("⚠️ Ошибка при очистке сообщений: %s", e)
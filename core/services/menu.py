@@ -0,0 +1,90 @@
+from core.services.stats import StatsService
+from data.cache import LRUCache, MISSING
+
+
+class MenuRenderer:
+    """
+    Текст главного меню со статистикой пользователя.
+    Готовый текст кэшируется на пользователя и сбрасывается при записи или сбросе статистики,
+    поэтому повторный показ меню не читает БД и не собирает строки
+    """
+
+    def __init__(self, cache_size: int = 10000):
+        # user_id -> (first_name, текст меню)
+        self.cache = LRUCache(cache_size)
+
+    @staticmethod
+    def build_stats_section(stats) -> str:
+        """Формирует блоки статистики для каждого уровня"""
+        junior_stats = ""
+        middle_stats = ""
+
+        if not stats or (stats.junior_tests == 0 and stats.middle_tests == 0):
+            return "📊 Статистика: пройдите первый тест!"
+
+        if stats.junior_tests > 0:
+            junior_success = StatsService.calculate_level_success_rate(stats, "junior")
+            junior_best_percentage = StatsService.calculate_best_score_percentage(stats, "junior")
+            junior_stats = f"""🎓 Junior
+    • Тестов: {stats.junior_tests}
+    • Последний результат: {stats.junior_total_correct}/{stats.junior_total_questions}
+    • Успешность: {junior_success}%
+    • Лучший результат: {stats.junior_best_score}/100 ({junior_best_percentage}%)"""
+
+        if stats.middle_tests > 0:
+            middle_success = StatsService.calculate_level_success_rate(stats, "middle")
+            middle_best_percentage = StatsService.calculate_best_score_percentage(stats, "middle")
+            middle_stats = f"""💪 Middle
+    • Тестов: {stats.middle_tests}
+    • Последний результат: {stats.middle_total_correct}/{stats.middle_total_questions}
+    • Успешность: {middle_success}%
+    • Лучший результат: {stats.middle_best_score}/100 ({middle_best_percentage}%)"""
+
+        if junior_stats and middle_stats:
+            return f"""📊 Ваша статистика:
+
+    {junior_stats}
+
+    {middle_stats}"""
+        return f"""📊 Ваша статистика:
+
+    {junior_stats}{middle_stats}"""
+
+    @staticmethod
+    def build_welcome_text(first_name, stats) -> str:
+        """Собирает текст главного меню"""
+        stats_section = MenuRenderer.build_stats_section(stats)
+
+        return f"""Привет, {first_name}! 👋
+
+Я бот для проверки знаний QA.
+
+    {stats_section}
+
+    📚 Что вас ждет:
+    • 100 вопросов по основам QA
+    • Объяснения к каждому ответу  
+    • Статистика ваших результатов
+
+Готовы начать? 🚀"""
+
+    async def get_welcome_text(self, user_id: int, first_name) -> str:
+        """Возвращает текст меню из кэша или собирает его по статистике из БД"""
+        cached = self.cache.get(user_id)
+        if cached is not MISSING and cached[0] == first_name:
+            return cached[1]
+
+        async def load():
+            stats = await StatsService.get_user_stats(user_id)
+            return first_name, MenuRenderer.build_welcome_text(first_name, stats)
+
+        _, text = await self.cache.load_async(user_id, load)
+        return text
+
+    def invalidate(self, user_id: int):
+        """Сбрасывает текст меню пользователя после изменения статистики"""
+        self.cache.invalidate(user_id)
+
+
+# Глобальный рендер главного меню
+menu_renderer = MenuRenderer()
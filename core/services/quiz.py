@@ -1,53 +1,197 @@
 import random
-from data.database import load_questions
+import time
+from array import array
+from functools import lru_cache
+from data.models import AnswerEvent
+from data.question_bank import question_bank
+
+
+# Один генератор на процесс: seed() дает ту же последовательность, что новый Random(seed),
+# без выделения состояния генератора на каждый вызов (обработчики работают в одном потоке)
+_options_rng = random.Random()
+
+
+@lru_cache(maxsize=4096)
+def _shuffled_options(question, seed):
+    # Вопрос неизменяемый, поэтому порядок для (вопрос, seed) считается один раз:
+    # показ вопроса и проверка ответа берут один и тот же кортеж
+    order = list(range(len(question.options)))
+    _options_rng.seed((seed << 32) | question.id)
+    _options_rng.shuffle(order)
+
+    # order[i] - исходный номер варианта, показанного i-м
+    return tuple(question.options[i] for i in order), order.index(question.correct_answer), tuple(order)
 
 
 class QuizService:
+    # Ключи user_data, из которых состоит сессия теста
+    SESSION_KEYS = ('bank_version', 'question_ids', 'seed', 'nonce', 'session_id', 'current_question', 'score',
+                    'last_question_message_id', 'question_shown_at', 'shown_question')
+
+    # Последний выданный id сессии (см. next_session_id)
+    _last_session_id = 0
+
+    @staticmethod
+    def next_session_id():
+        """
+        Возрастающий id сессии для журнала ответов: время начала в мс, но строго больше предыдущего.
+        Не повторяется у пользователя и после перезапуска, в отличие от случайного nonce
+        """
+        QuizService._last_session_id = max(QuizService._last_session_id + 1, time.time_ns() // 1_000_000)
+        return QuizService._last_session_id
+
     @staticmethod
     def shuffle_questions(questions):
         """Перемешивает вопросы в случайном порядке"""
-        shuffled = questions.copy()
+        shuffled = list(questions)
         random.shuffle(shuffled)
         return shuffled
 
+    # Сколько вопросов в тесте по теме
+    TOPIC_QUIZ_SIZE = 10
+
+    # Уровень теста по теме: результаты пишутся отдельно от Junior и Middle (другой масштаб - из 10)
+    TOPIC_LEVEL = 'topic'
+
+    # Названия тем для кнопок; остальные показываются как есть, без подчеркиваний
+    TOPIC_TITLES = {'general': 'Общие вопросы'}
+
+    @staticmethod
+    def topic_title(topic):
+        """Название темы для пользователя"""
+        title = QuizService.TOPIC_TITLES.get(topic)
+        if title is None:
+            title = topic.replace('_', ' ').capitalize()
+        return title
+
+    @staticmethod
+    def start_quiz(context, snapshot, level=None, topic=None):
+        """
+        Начинает новую сессию теста.
+        В сессии хранится только версия банка, перестановка id вопросов и seed.
+        nonce попадает в кнопки ответов и отличает их от кнопок прошлых тестов.
+        С topic в тест попадают TOPIC_QUIZ_SIZE случайных вопросов темы
+        """
+        seed = random.getrandbits(32)
+        rng = random.Random(seed)
+        topic_ids = snapshot.topic_ids(topic) if topic is not None else None
+
+        if topic_ids:
+            # Выборка из индекса темы: O(k), остальной банк не просматривается
+            question_ids = array('I', rng.sample(topic_ids, min(QuizService.TOPIC_QUIZ_SIZE, len(topic_ids))))
+            context.user_data['topic'] = topic
+        else:
+            # Копия готового массива id вместо обхода всех вопросов
+            question_ids = array('I', snapshot.ids)
+            rng.shuffle(question_ids)
+            context.user_data.pop('topic', None)
+
+        context.user_data.update({
+            'bank_version': snapshot.version,
+            'question_ids': question_ids,
+            'seed': seed,
+            'nonce': random.getrandbits(24),
+            'session_id': QuizService.next_session_id(),
+            'current_question': 0,
+            'score': 0,
+        })
+        if level is not None:
+            context.user_data['level'] = level
+
+    @staticmethod
+    def clear_quiz(context):
+        """Удаляет данные текущей сессии теста"""
+        for key in QuizService.SESSION_KEYS:
+            context.user_data.pop(key, None)
+
+    @staticmethod
+    def session_snapshot(context):
+        """Версия банка, с которой началась сессия. None - ее уже нет в истории банка"""
+        return question_bank.get_snapshot(context.user_data.get('bank_version'))
+
+    @staticmethod
+    def is_session_expired(context):
+        """
+        Идет тест, но его версия банка вытеснена из истории (или не пережила перезапуск).
+        Продолжать на новой версии нельзя: под теми же id могут быть другие вопросы
+        """
+        return 'question_ids' in context.user_data and QuizService.session_snapshot(context) is None
+
     @staticmethod
-    def shuffle_options(question):
-        """Перемешивает варианты ответов и возвращает новый correct_answer индекс"""
-        options = question['options'].copy()
-        correct_answer = question['correct_answer']
+    def get_question(context, index):
+        """Возвращает вопрос сессии по его порядковому номеру"""
+        question_ids = context.user_data.get('question_ids', ())
+        if not 0 <= index < len(question_ids):
+            return None
+
+        # Сессия работает только с той версией банка, с которой началась
+        snapshot = QuizService.session_snapshot(context)
+        if snapshot is None:
+            return None
+        return snapshot.get(question_ids[index])
 
-        # Сохраняем правильный ответ до перемешивания
-        correct_option = options[correct_answer]
+    @staticmethod
+    def shuffle_options(question, seed):
+        """
+        Перемешивает варианты ответов и возвращает (кортеж вариантов, новый correct_answer индекс).
+        Порядок определяется seed сессии, поэтому его не нужно хранить
+        """
+        options, correct_answer, _ = _shuffled_options(question, seed)
+        return options, correct_answer
 
-        # Перемешиваем варианты
-        random.shuffle(options)
+    @staticmethod
+    def get_options(context, question):
+        """Возвращает варианты ответов вопроса в порядке текущей сессии"""
+        return QuizService.shuffle_options(question, context.user_data.get('seed', 0))
 
-        # Находим новый индекс правильного ответа
-        new_correct_answer = options.index(correct_option)
+    @staticmethod
+    def answer_event(context, user_id, question, option, is_correct):
+        """
+        Событие журнала ответов. chosen - номер варианта в исходном порядке вопроса,
+        время ответа считается от отправки вопроса (question_shown_at)
+        """
+        _, _, order = _shuffled_options(question, context.user_data.get('seed', 0))
+        chosen = order[option] if option < len(order) else None
+        now = time.time()
+        shown_at = context.user_data.get('question_shown_at')
 
-        return options, new_correct_answer
+        return AnswerEvent(
+            answered_at=int(now),
+            user_id=user_id,
+            # Сессии, начатые до появления session_id, различаются только nonce
+            session=context.user_data.get('session_id') or context.user_data.get('nonce', 0),
+            question_id=question.id,
+            chosen=chosen,
+            correct=is_correct,
+            response_ms=max(0, round((now - shown_at) * 1000)) if shown_at else None,
+            level=context.user_data.get('level', 'junior')
+        )
 
     @staticmethod
     async def get_current_question(context):
         """Возвращает текущий вопрос"""
         current_index = context.user_data.get('current_question', 0)
-        questions = context.user_data.get('questions', [])
+        question = QuizService.get_question(context, current_index)
 
-        if current_index >= len(questions):
+        if question is None:
             return None
 
-        return questions[current_index], current_index
+        return question, current_index
+
+    @staticmethod
+    def get_total_questions(context):
+        """Возвращает количество вопросов в сессии"""
+        return len(context.user_data.get('question_ids', ()))
 
     @staticmethod
     def is_quiz_finished(context):
         """Проверяет завершен ли тест"""
         current_index = context.user_data.get('current_question', 0)
-        questions = context.user_data.get('questions', [])
-        return current_index >= len(questions)
+        return current_index >= QuizService.get_total_questions(context)
 
     @staticmethod
     def get_quiz_results(context):
         """Возвращает результаты теста"""
         score = context.user_data.get('score', 0)
-        total = len(context.user_data.get('questions', []))
+        total = QuizService.get_total_questions(context)
         return score, total
@@ -0,0 +1,70 @@
+import asyncio
+from typing import NamedTuple, Optional
+
+from telegram import InlineKeyboardMarkup
+
+from core.services.quiz import QuizService
+from data.cache import LRUCache, MISSING
+from utils.instrumentation import metrics
+from utils.keyboards import create_quiz_keyboard
+
+
+class RenderedQuestion(NamedTuple):
+    """Готовое к отправке сообщение с вопросом"""
+    text: str
+    reply_markup: InlineKeyboardMarkup
+
+
+class QuestionRenderer:
+    """
+    Рендер вопросов теста: текст и клавиатура.
+    Результат кэшируется по (seed, nonce, номер вопроса) сессии,
+    поэтому следующий вопрос можно подготовить заранее, пока пользователь читает пояснение
+    """
+
+    MIDDLE_SUFFIX = "\n\n⚡ Всего 1 попытка!"
+
+    def __init__(self, cache_size: int = 2048):
+        self.cache = LRUCache(cache_size)
+
+    @staticmethod
+    def _key(context, index):
+        return context.user_data.get('seed'), context.user_data.get('nonce'), index
+
+    def render(self, context, index) -> Optional[RenderedQuestion]:
+        """Возвращает вопрос сессии с номером index, из кэша или собирая заново"""
+        key = self._key(context, index)
+        rendered = self.cache.get(key)
+        if rendered is not MISSING:
+            return rendered
+
+        question = QuizService.get_question(context, index)
+        if question is None:
+            return None
+
+        with metrics.timer("render.question"):
+            # ПЕРЕМЕШИВАЕМ варианты ответов (порядок выводится из seed сессии)
+            shuffled_options, _ = QuizService.get_options(context, question)
+
+            text = (
+                f"\n🎯 Вопрос {index + 1}/{QuizService.get_total_questions(context)}\n{question.question}\n\n"
+                + "\n".join([f"{i + 1}. {option}" for i, option in enumerate(shuffled_options)])
+            )
+            if context.user_data.get('level') == 'middle':
+                text += self.MIDDLE_SUFFIX
+
+            rendered = RenderedQuestion(
+                text,
+                create_quiz_keyboard(question, index, shuffled_options, nonce=context.user_data.get('nonce', 0))
+            )
+        self.cache.set(key, rendered)
+        return rendered
+
+    def prefetch(self, context, index):
+        """Готовит вопрос в фоне, после того как текущий обработчик отдаст управление"""
+        if index < QuizService.get_total_questions(context):
+            asyncio.get_running_loop().call_soon(self.render, context, index)
+
+
+# Глобальный рендер вопросов
+renderer = QuestionRenderer()
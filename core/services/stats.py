@@ -1,10 +1,10 @@
-from data.storage import storage
+from data.async_storage import async_storage
 from datetime import datetime
 
 
 class StatsService:
     @staticmethod
-    def init_user(user_id: int, username: str, first_name: str):
+    async def init_user(user_id: int, username: str, first_name: str):
         """Инициализирует пользователя в системе"""
         from data.models import User
         user = User(
@@ -13,19 +13,34 @@ class StatsService:
             first_name=first_name,
             created_at=datetime.now().isoformat()
         )
-        storage.save_user(user)
+        await async_storage.save_user(user)
 
 
     @staticmethod
-    def save_test_result(user_id: int, score: int, total_questions: int, level: str = "junior"):
+    async def save_test_result(user_id: int, score: int, total_questions: int, level: str = "junior"):
         """Сохраняет результат теста с указанием уровня"""
-        storage.save_test_result_with_level(user_id, score, total_questions, level)
+        await async_storage.save_test_result_with_level(user_id, score, total_questions, level)
+        StatsService._invalidate_menu(user_id)
 
 
     @staticmethod
-    def get_user_stats(user_id: int):
+    async def reset_user_stats(user_id: int):
+        """Сбрасывает статистику пользователя"""
+        await async_storage.reset_user_stats(user_id)
+        StatsService._invalidate_menu(user_id)
+
+
+    @staticmethod
+    def _invalidate_menu(user_id: int):
+        """Текст главного меню содержит статистику - сбрасываем его"""
+        from core.services.menu import menu_renderer
+        menu_renderer.invalidate(user_id)
+
+
+    @staticmethod
+    async def get_user_stats(user_id: int):
         """Возвращает статистику пользователя"""
-        return storage.get_user_stats(user_id)
+        return await async_storage.get_user_stats(user_id)
 
 
     @staticmethod
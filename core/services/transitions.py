@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable
+from core.concurrency import chat_locks
+
+
+logger = logging.getLogger(__name__)
+
+
+class TransitionScheduler:
+    """
+    Отложенные переходы интерфейса (следующий вопрос, возврат в меню и т.п.).
+    Обработчик ставит следующий шаг в очередь и сразу освобождается.
+    На каждый чат держится не больше одного ожидающего перехода
+    """
+
+    def __init__(self):
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+        # Множитель задержек: нагрузочные тесты ускоряют переходы, не меняя обработчики
+        self.delay_scale = 1.0
+
+    def schedule(self, context, key: Hashable, delay: float,
+                 callback: Callable[..., Awaitable], *args) -> asyncio.Task:
+        """Запускает callback(*args) через delay секунд, отменяя предыдущий переход чата"""
+        self.cancel(key)
+        task = context.application.create_task(
+            self._run(context, key, delay, callback, args),
+            name=f"transition:{key}:{getattr(callback, '__name__', 'callback')}"
+        )
+        self._pending[key] = task
+        return task
+
+    def cancel(self, key: Hashable) -> bool:
+        """
+        Отменяет ожидающий переход чата.
+        Переход, из которого вызвана отмена (цепочка шагов), не отменяется
+        """
+        task = self._pending.get(key)
+        if task is None or task.done() or task is asyncio.current_task():
+            return False
+        task.cancel()
+        del self._pending[key]
+        return True
+
+    def has_pending(self, key: Hashable) -> bool:
+        """Есть ли у чата ожидающий переход"""
+        task = self._pending.get(key)
+        return task is not None and not task.done()
+
+    def __len__(self):
+        return len(self._pending)
+
+    async def _run(self, context, key, delay, callback, args):
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay * self.delay_scale)
+            # Переход меняет данные чата так же, как обработчик, поэтому ждет своей очереди
+            async with chat_locks.hold(key):
+                await callback(*args)
+            # Переход мог изменить user_data вне обработки обновления - отмечаем их для сохранения.
+            # Бот работает в личных чатах, где id чата совпадает с id пользователя
+            context.application.mark_data_for_update_persistence(user_ids=key)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("⚠️ Ошибка в отложенном переходе %s", getattr(callback, '__name__', callback))
+        finally:
+            if self._pending.get(key) is asyncio.current_task():
+                del self._pending[key]
+
+
+# Глобальный планировщик переходов
+transitions = TransitionScheduler()
@@ -0,0 +1,302 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import signal
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import Application
+
+from utils.instrumentation import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Telegram присылает обновления размером в килобайты, больше не принимаем
+MAX_BODY_SIZE = 1024 * 1024
+# Заголовков в запросе Telegram около десятка; длина строки ограничена лимитом StreamReader (64 КБ)
+MAX_HEADERS = 100
+# Сколько ждать каждую строку и тело уже начатого запроса
+READ_TIMEOUT = 10.0
+# Сколько держать простаивающее keep-alive соединение до следующего запроса
+IDLE_TIMEOUT = 60.0
+
+STATUS_TEXT = {
+    200: 'OK',
+    400: 'Bad Request',
+    403: 'Forbidden',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    408: 'Request Timeout',
+    411: 'Length Required',
+    413: 'Payload Too Large',
+    429: 'Too Many Requests',
+    431: 'Request Header Fields Too Large',
+    501: 'Not Implemented',
+    503: 'Service Unavailable',
+}
+
+
+class HttpError(Exception):
+    """Ошибка разбора HTTP-запроса, на которую отвечаем кодом status"""
+
+    def __init__(self, status: int):
+        super().__init__(status)
+        self.status = status
+
+
+async def _read_line(reader: asyncio.StreamReader, timeout: float) -> bytes:
+    """Строка запроса или заголовка; медленный клиент получает 408, слишком длинная строка - 431"""
+    try:
+        return await asyncio.wait_for(reader.readline(), timeout)
+    except asyncio.TimeoutError:
+        raise HttpError(408)
+    except (ValueError, asyncio.LimitOverrunError):
+        raise HttpError(431)
+
+
+async def read_request(reader: asyncio.StreamReader, read_timeout: float = READ_TIMEOUT,
+                       idle_timeout: float = IDLE_TIMEOUT) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """
+    Читает один HTTP/1.1 запрос: (method, path, headers, body).
+    Возвращает None, если клиент закрыл соединение или молчал дольше idle_timeout.
+    Каждое чтение ограничено read_timeout, чтобы соединение нельзя было держать,
+    присылая запрос по байту (slowloris)
+    """
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), idle_timeout)
+    except asyncio.TimeoutError:
+        return None
+    except (ValueError, asyncio.LimitOverrunError):
+        raise HttpError(431)
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HttpError(400)
+
+    headers: Dict[str, str] = {}
+    for _ in range(MAX_HEADERS + 1):
+        line = await _read_line(reader, read_timeout)
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HttpError(431)
+
+    # Telegram присылает тело с Content-Length; chunked не поддерживаем
+    if headers.get('transfer-encoding', 'identity').lower() != 'identity':
+        raise HttpError(501)
+    if 'content-length' not in headers:
+        if method == 'POST':
+            raise HttpError(411)
+        return method, target, headers, b''
+
+    try:
+        length = int(headers['content-length'])
+    except ValueError:
+        raise HttpError(400)
+    if length < 0:
+        raise HttpError(400)
+    if length > MAX_BODY_SIZE:
+        raise HttpError(413)
+    if not length:
+        return method, target, headers, b''
+    try:
+        body = await asyncio.wait_for(reader.readexactly(length), read_timeout)
+    except asyncio.TimeoutError:
+        raise HttpError(408)
+    return method, target, headers, body
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, body: bytes = b'',
+                   content_type: str = 'application/json', keep_alive: bool = True):
+    """Пишет HTTP-ответ в поток"""
+    head = (
+        f"HTTP/1.1 {status} {STATUS_TEXT.get(status, 'Unknown')}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    writer.write(head.encode('latin-1') + body)
+
+
+async def serve_http(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, handle,
+                     read_timeout: float = READ_TIMEOUT, idle_timeout: float = IDLE_TIMEOUT):
+    """
+    Обслуживает одно соединение с keep-alive.
+    handle(method, path, headers, body) возвращает (status, body)
+    """
+    try:
+        while True:
+            try:
+                request = await read_request(reader, read_timeout, idle_timeout)
+            except HttpError as error:
+                metrics.increment(f"webhook.http_{error.status}")
+                write_response(writer, error.status, keep_alive=False)
+                await asyncio.wait_for(writer.drain(), read_timeout)
+                break
+            if request is None:
+                break
+
+            method, path, headers, body = request
+            keep_alive = headers.get('connection', '').lower() != 'close'
+            status, payload = await handle(method, path, headers, body)
+            write_response(writer, status, payload, keep_alive=keep_alive)
+            await asyncio.wait_for(writer.drain(), read_timeout)
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, asyncio.CancelledError):
+        # Клиент ушел, не читает ответ или сервер останавливается
+        pass
+    finally:
+        writer.close()
+
+
+@dataclass
+class WebhookConfig:
+    """Настройки режима webhook"""
+    url: str = ''
+    path: str = '/webhook'
+    secret_token: str = ''
+    host: str = '0.0.0.0'
+    port: int = 8443
+    # Сколько ждать места в очереди обновлений, прежде чем ответить 503
+    enqueue_timeout: float = 5.0
+    max_connections: int = 40
+    drop_pending_updates: bool = False
+
+    @classmethod
+    def from_env(cls) -> 'WebhookConfig':
+        """
+        WEBHOOK_URL - публичный адрес бота, WEBHOOK_PATH, WEBHOOK_SECRET (обязателен),
+        WEBHOOK_HOST, WEBHOOK_PORT (или PORT), WEBHOOK_ENQUEUE_TIMEOUT, WEBHOOK_MAX_CONNECTIONS
+        """
+        return cls(
+            url=os.environ.get('WEBHOOK_URL', '').rstrip('/'),
+            path=os.environ.get('WEBHOOK_PATH', '/webhook'),
+            secret_token=os.environ.get('WEBHOOK_SECRET', ''),
+            host=os.environ.get('WEBHOOK_HOST', '0.0.0.0'),
+            port=int(os.environ.get('WEBHOOK_PORT', os.environ.get('PORT', 8443))),
+            enqueue_timeout=float(os.environ.get('WEBHOOK_ENQUEUE_TIMEOUT', 5.0)),
+            max_connections=int(os.environ.get('WEBHOOK_MAX_CONNECTIONS', 40)),
+            drop_pending_updates=os.environ.get('WEBHOOK_DROP_PENDING', '').lower() in ('1', 'true', 'yes'),
+        )
+
+
+class WebhookServer:
+    """
+    HTTP-эндпоинт для обновлений Telegram.
+    Проверяет заголовок X-Telegram-Bot-Api-Secret-Token и кладет обновления в update_queue приложения.
+    Без secret_token сервер не создается: иначе любой, кто узнал адрес, может слать боту поддельные обновления.
+    Если очередь заполнена, запрос ждет места, а после enqueue_timeout получает 503 -
+    Telegram повторит доставку позже
+    """
+
+    def __init__(self, application: Application, config: WebhookConfig):
+        if not config.secret_token:
+            raise ValueError("Для режима webhook нужен WEBHOOK_SECRET")
+        self.application = application
+        self.config = config
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def port(self) -> int:
+        """Фактический порт (полезно при port=0)"""
+        return self._server.sockets[0].getsockname()[1]
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            lambda reader, writer: serve_http(reader, writer, self.handle),
+            self.config.host, self.config.port
+        )
+        logger.info("🌐 Webhook слушает %s:%s%s", self.config.host, self.port, self.config.path)
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def handle(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, bytes]:
+        if path.split('?', 1)[0] != self.config.path:
+            return 404, b''
+        if method != 'POST':
+            return 405, b''
+
+        received = headers.get('x-telegram-bot-api-secret-token', '')
+        if not hmac.compare_digest(received.encode(), self.config.secret_token.encode()):
+            metrics.increment("webhook.forbidden")
+            return 403, b''
+
+        try:
+            payload = json.loads(body)
+            # Валидный JSON, но не объект ([], 1, "x") до Update.de_json не доходит
+            if not isinstance(payload, dict):
+                raise ValueError("обновление должно быть JSON-объектом")
+            update = Update.de_json(payload, self.application.bot)
+        except (ValueError, TypeError, KeyError):
+            metrics.increment("webhook.bad_request")
+            return 400, b''
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.application.update_queue.put(update), self.config.enqueue_timeout)
+        except asyncio.TimeoutError:
+            metrics.increment("webhook.rejected")
+            logger.warning("⚠️ Очередь обновлений заполнена, обновление %s отклонено", update.update_id)
+            return 503, b''
+        metrics.observe("webhook.enqueue.duration_ms", (time.perf_counter() - started) * 1000)
+        metrics.gauge("webhook.queue_depth", self.application.update_queue.qsize())
+        metrics.increment("webhook.updates")
+        return 200, b''
+
+
+async def serve_webhook(application: Application, config: WebhookConfig, stop_event: Optional[asyncio.Event] = None):
+    """
+    Запускает приложение в режиме webhook и работает до сигнала остановки.
+    Повторяет жизненный цикл Application.run_webhook без зависимости от tornado
+    """
+    if stop_event is None:
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except NotImplementedError:
+                pass
+
+    server = WebhookServer(application, config)
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await server.start()
+        if config.url:
+            await application.bot.set_webhook(
+                url=config.url + config.path,
+                secret_token=config.secret_token,
+                max_connections=config.max_connections,
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=config.drop_pending_updates,
+            )
+        await application.start()
+        try:
+            await stop_event.wait()
+        finally:
+            await server.stop()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+    finally:
+        await server.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
@@ -0,0 +1,206 @@
+"""
+Журнал ответов: каждый ответ на вопрос теста - строка answer_events (только дописывается).
+Вместе с журналом в той же транзакции обновляются сводки по вопросам:
+question_stats (попытки, правильные ответы) и question_time_buckets
+(гистограмма времени ответа, по ней считается медиана). Отчет по сводкам
+не просматривает журнал, сколько бы ответов в нем ни было.
+
+Самые трудные вопросы из корня репозитория:
+    python -m data.answer_log --min-attempts 30 --limit 20
+"""
+import argparse
+import os
+import sqlite3
+import sys
+from bisect import bisect_right
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from .models import AnswerEvent, QuestionStats
+from .write_behind import DeadLetters, WriteBehindQueue
+from utils.instrumentation import metrics
+
+
+# Верхние границы корзин времени ответа, мс: шаг 25% от 0.5 с до ~8 минут.
+# Медиана по гистограмме точна до ширины корзины; ответы дольше последней границы - в одной корзине
+TIME_BUCKETS = tuple(round(500 * 1.25 ** i) for i in range(32))
+
+
+def time_bucket(response_ms: int) -> int:
+    """Номер корзины гистограммы для времени ответа"""
+    return bisect_right(TIME_BUCKETS, response_ms)
+
+
+def histogram_median(histogram: Dict[int, int]) -> Optional[float]:
+    """Медиана времени ответа (мс) по гистограмме корзина -> число ответов, с интерполяцией внутри корзины"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+
+    target = total / 2
+    seen = 0
+    for bucket in sorted(histogram):
+        count = histogram[bucket]
+        if seen + count >= target:
+            lower = TIME_BUCKETS[bucket - 1] if bucket else 0
+            if bucket >= len(TIME_BUCKETS):
+                return float(lower)
+            return lower + (TIME_BUCKETS[bucket] - lower) * (target - seen) / count
+        seen += count
+    return None
+
+
+class AnswerLog:
+    """
+    Запись ответов в answer_events и поддержка сводок по вопросам.
+    record только ставит событие в очередь: ответы пишутся группами в фоне
+    одним executemany на таблицу, нажатие кнопки не ждет БД
+    """
+
+    def __init__(self, db, flush_interval: float = 0.5, flush_batch: int = 1000):
+        self.db = db
+        self._events = WriteBehindQueue(
+            self._write_events,
+            key=lambda event: event.user_id,
+            flush_interval=flush_interval,
+            max_batch=flush_batch,
+            name='answers-writer',
+            dead_letters=DeadLetters(db)
+        )
+
+    def record(self, event: AnswerEvent):
+        """Ставит ответ в очередь записи"""
+        self._events.put(event)
+        metrics.increment("answers.recorded")
+
+    def question_stats(self, question_id: int) -> Optional[QuestionStats]:
+        """Сводка по вопросу. Ответы из очереди (последние flush_interval секунд) не учитываются"""
+        with self.db.read() as conn:
+            row = conn.execute(
+                'SELECT question_id, attempts, correct FROM question_stats WHERE question_id = ?', (question_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._with_medians([QuestionStats(*row)])[0]
+
+    def weakest_questions(self, limit: int = 20, min_attempts: int = 30) -> List[QuestionStats]:
+        """Вопросы с самой низкой долей правильных ответов среди тех, где ответов не меньше min_attempts"""
+        with self.db.read() as conn:
+            rows = conn.execute('''
+                SELECT question_id, attempts, correct FROM question_stats
+                WHERE attempts >= ?
+                ORDER BY CAST(correct AS REAL) / attempts, attempts DESC
+                LIMIT ?
+            ''', (min_attempts, limit)).fetchall()
+        return self._with_medians([QuestionStats(*row) for row in rows])
+
+    def _with_medians(self, stats: List[QuestionStats]) -> List[QuestionStats]:
+        if not stats:
+            return stats
+        histograms: Dict[int, Dict[int, int]] = defaultdict(dict)
+        with self.db.read() as conn:
+            rows = conn.execute(
+                f'''SELECT question_id, bucket, answers FROM question_time_buckets
+                    WHERE question_id IN ({",".join("?" * len(stats))})''',
+                [item.question_id for item in stats]
+            ).fetchall()
+        for question_id, bucket, answers in rows:
+            histograms[question_id][bucket] = answers
+        for item in stats:
+            item.median_ms = histogram_median(histograms.get(item.question_id, {}))
+        return stats
+
+    def flush(self):
+        self._events.flush()
+
+    def close(self):
+        """Дописывает накопленные ответы"""
+        self._events.close()
+
+    @metrics.timed("storage.save_answers")
+    def _write_events(self, events: List[AnswerEvent]):
+        """Записывает пачку ответов и прибавляет ее к сводкам одной транзакцией"""
+        # Сводки сначала складываются в памяти: по одной строке UPSERT на вопрос и корзину, а не на ответ
+        totals: Dict[int, List[int]] = {}
+        buckets: Dict[tuple, int] = defaultdict(int)
+        for event in events:
+            total = totals.get(event.question_id)
+            if total is None:
+                total = totals[event.question_id] = [0, 0, 0]
+            total[0] += 1
+            total[1] += event.correct
+            total[2] = max(total[2], event.answered_at)
+            if event.response_ms is not None:
+                buckets[(event.question_id, time_bucket(event.response_ms))] += 1
+
+        with self.db.write() as conn:
+            conn.executemany('''
+                INSERT INTO answer_events
+                    (answered_at, user_id, session, question_id, chosen, correct, response_ms, level)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(e.answered_at, e.user_id, e.session, e.question_id, e.chosen, e.correct,
+                   e.response_ms, e.level) for e in events])
+
+            conn.executemany('''
+                INSERT INTO question_stats (question_id, attempts, correct, last_answered_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (question_id) DO UPDATE SET
+                    attempts = attempts + excluded.attempts,
+                    correct = correct + excluded.correct,
+                    last_answered_at = MAX(last_answered_at, excluded.last_answered_at)
+            ''', [(question_id, *total) for question_id, total in totals.items()])
+
+            conn.executemany('''
+                INSERT INTO question_time_buckets (question_id, bucket, answers)
+                VALUES (?, ?, ?)
+                ON CONFLICT (question_id, bucket) DO UPDATE SET
+                    answers = answers + excluded.answers
+            ''', [(question_id, bucket, answers) for (question_id, bucket), answers in buckets.items()])
+
+        metrics.increment("answers.written", len(events))
+
+
+def format_report(stats: Iterable[QuestionStats], questions) -> List[str]:
+    """Строки отчета: id, ответы, доля правильных, медиана времени и начало текста вопроса"""
+    lines = [f"{'id':>6} {'answers':>8} {'correct':>8} {'median, s':>10}  question"]
+    for item in stats:
+        question = questions.get(item.question_id)
+        text = question.question.replace('\n', ' ')[:60] if question else '(нет в текущем банке)'
+        median = f"{item.median_ms / 1000:.1f}" if item.median_ms is not None else '-'
+        lines.append(f"{item.question_id:>6} {item.attempts:>8} {item.correct_rate:>8.0%} {median:>10}  {text}")
+    return lines
+
+
+def main():
+    from .connection import ConnectionManager
+    from .question_bank import question_bank
+
+    parser = argparse.ArgumentParser(description="Вопросы с самой низкой долей правильных ответов")
+    parser.add_argument('--db', default=os.environ.get('DB_PATH', 'data/qa_bot.db'))
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--min-attempts', type=int, default=30)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"❌ БД {args.db} не найдена")
+        sys.exit(1)
+
+    db = ConnectionManager(args.db)
+    log = AnswerLog(db)
+    try:
+        weakest = log.weakest_questions(args.limit, args.min_attempts)
+    except sqlite3.OperationalError as e:
+        print(f"❌ {args.db}: {e}")
+        sys.exit(1)
+    finally:
+        log.close()
+        db.close()
+
+    if not weakest:
+        print(f"Нет вопросов с {args.min_attempts}+ ответами")
+        return
+    print("\n".join(format_report(weakest, question_bank.snapshot)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from .cache import MISSING
+from .models import User, UserStats, Achievement
+from .storage import Storage, storage
+
+
+class AsyncStorage:
+    """
+    Асинхронный фасад над Storage.
+    Чтение выполняется в ограниченном пуле потоков, запись - в одном выделенном потоке,
+    поэтому обращения к SQLite не блокируют цикл событий бота
+    """
+
+    def __init__(self, storage: Storage, max_readers: int = 4):
+        self.storage = storage
+        self._readers = ThreadPoolExecutor(max_workers=max_readers, thread_name_prefix='storage-read')
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='storage-write')
+
+    @property
+    def read_executor(self) -> ThreadPoolExecutor:
+        """Пул потоков чтения: в нем же читает user_data SQLitePersistence"""
+        return self._readers
+
+    async def _run(self, executor, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args))
+
+    async def save_user(self, user: User):
+        """Сохраняет или обновляет пользователя; известный пользователь без изменений не пишется"""
+        if self.storage.is_user_up_to_date(user):
+            return
+        await self._run(self._writer, self.storage.save_user, user)
+
+    async def get_user_stats(self, user_id: int) -> Optional[UserStats]:
+        """Возвращает статистику пользователя; попадание в кэш обслуживается без потока и БД"""
+        stats = self.storage.get_cached_user_stats(user_id)
+        if stats is MISSING:
+            stats = await self._run(self._readers, self.storage.load_user_stats, user_id)
+        return stats
+
+    async def get_user_achievements(self, user_id: int) -> List[Achievement]:
+        """Возвращает достижения пользователя"""
+        return await self._run(self._readers, self.storage.get_user_achievements, user_id)
+
+    async def save_test_result_with_level(self, user_id: int, score: int, total_questions: int, level: str):
+        """
+        Сохраняет результат теста с учетом уровня сложности.
+        Storage только ставит результат в очередь групповой записи, поэтому вызов не уходит в поток
+        """
+        self.storage.save_test_result_with_level(user_id, score, total_questions, level)
+
+    async def reset_user_stats(self, user_id: int):
+        """Полностью сбрасывает статистику пользователя"""
+        await self._run(self._writer, self.storage.reset_user_stats, user_id)
+
+    def shutdown(self):
+        """Дожидается завершения начатых операций и останавливает потоки"""
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+
+
+# Глобальный асинхронный фасад хранилища
+async_storage = AsyncStorage(storage)
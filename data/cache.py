@@ -0,0 +1,122 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+# Маркер отсутствия значения: None тоже может лежать в кэше
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Ограниченный LRU-кэш со счетчиками попаданий и промахов.
+    Значения отдаются как есть, поэтому их нельзя изменять после чтения
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        # Поколение ключа растет при его инвалидации, epoch - при очистке всего кэша.
+        # Поколения хранятся только для ключей, которые сейчас загружаются (_loading - число загрузок),
+        # поэтому инвалидация одного ключа не отбрасывает загрузки других
+        self._generations: Dict[Hashable, int] = {}
+        self._loading: Dict[Hashable, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Возвращает значение и отмечает его как недавно использованное"""
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """Кладет значение, вытесняя самое старое при переполнении"""
+        with self._lock:
+            self._set(key, value)
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Возвращает значение из кэша или загружает его"""
+        value = self.get(key)
+        if value is not MISSING:
+            return value
+        return self.load(key, loader)
+
+    def load(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Загружает значение и кладет его в кэш.
+        Если во время загрузки этот ключ инвалидировали, результат не кэшируется
+        """
+        token = self._begin_load(key)
+        value = MISSING
+        try:
+            value = loader()
+        finally:
+            self._end_load(key, token, value)
+        return value
+
+    async def load_async(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Как load, но loader - корутина (например, чтение статистики из БД в пуле потоков)"""
+        token = self._begin_load(key)
+        value = MISSING
+        try:
+            value = await loader()
+        finally:
+            self._end_load(key, token, value)
+        return value
+
+    def invalidate(self, key: Hashable):
+        """Удаляет значение из кэша"""
+        with self._lock:
+            if key in self._loading:
+                self._generations[key] = self._generations.get(key, 0) + 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        """Очищает кэш"""
+        with self._lock:
+            self._epoch += 1
+            self._data.clear()
+
+    def info(self) -> Dict[str, Any]:
+        """Счетчики кэша"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'hit_rate': round(self.hits / requests, 3) if requests else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._data)
+
+    def _begin_load(self, key: Hashable) -> Tuple[int, int]:
+        with self._lock:
+            self._loading[key] = self._loading.get(key, 0) + 1
+            return self._epoch, self._generations.get(key, 0)
+
+    def _end_load(self, key: Hashable, token: Tuple[int, int], value: Any):
+        with self._lock:
+            if value is not MISSING and token == (self._epoch, self._generations.get(key, 0)):
+                self._set(key, value)
+            self._loading[key] -= 1
+            if not self._loading[key]:
+                del self._loading[key]
+                self._generations.pop(key, None)
+
+    def _set(self, key: Hashable, value: Any):
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
@@ -0,0 +1,315 @@
+"""
+Скомпилированный банк вопросов: бинарный файл, который читается через mmap.
+
+Формат (little-endian, все секции выровнены по 4 байта):
+    заголовок       HEADER: сигнатура, версия формата, размер и mtime исходного JSON,
+                    версия банка, количества и смещения секций
+    строки          u32 * (строк + 1) - смещения в блоке UTF-8, затем сам блок.
+                    Одинаковые строки (темы, варианты ответов) хранятся один раз
+    вопросы         RECORD на вопрос в порядке файла: id и номера строк
+    варианты        u32 - номера строк вариантов всех вопросов подряд
+    id по порядку   u32 * вопросов - id в порядке файла
+    поиск по id     u32 * вопросов - отсортированные id, затем u32 * вопросов - номера записей
+    индексы         INDEX_ENTRY на тему / сложность, затем u32 - id вопросов всех индексов подряд
+
+Вопрос по id находится двоичным поиском и разбирается один, остальной банк не читается.
+
+Сборка из корня репозитория:
+    python -m data.compiled_bank
+"""
+import argparse
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .cache import LRUCache, MISSING
+from .models import Question
+
+
+COMPILED_PATH = 'data/questions.bin'
+
+MAGIC = b'QBNK'
+FORMAT_VERSION = 1
+
+# сигнатура, версия формата, резерв, размер и mtime_ns исходного JSON, версия банка,
+# количества: вопросов, строк, вариантов, записей индексов, id в индексах;
+# смещения: смещений строк, блока строк, вопросов, вариантов, id по порядку, поиска по id, индексов
+HEADER = struct.Struct('<4sHHQQ16s5I7I')
+# id, текст, пояснение, тема, сложность (номера строк), correct_answer, число вариантов, первый вариант
+RECORD = struct.Struct('<5IHHI')
+# вид (0 - тема, 1 - сложность), номер строки значения, первый id, количество
+INDEX_ENTRY = struct.Struct('<4I')
+
+INDEX_TOPIC = 0
+INDEX_DIFFICULTY = 1
+
+logger = logging.getLogger(__name__)
+
+
+class CompiledBankError(ValueError):
+    """Файл скомпилированного банка поврежден или другого формата"""
+
+
+def _align(buffer: bytearray):
+    buffer.extend(b'\0' * (-len(buffer) % 4))
+
+
+def _u32(values) -> bytes:
+    return array('I', values).tobytes()
+
+
+def compile_questions(questions: Sequence[Question], version: str,
+                      source_size: int = 0, source_mtime_ns: int = 0) -> bytes:
+    """Собирает файл банка из уже провалидированных вопросов (см. parse_questions)"""
+    strings: Dict[str, int] = {}
+
+    def intern(text: str) -> int:
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+
+    records = bytearray()
+    options: List[int] = []
+    topics: Dict[str, List[int]] = {}
+    difficulties: Dict[str, List[int]] = {}
+    for question in questions:
+        records += RECORD.pack(
+            question.id,
+            intern(question.question),
+            intern(question.explanation),
+            intern(question.topic),
+            intern(question.difficulty),
+            question.correct_answer,
+            len(question.options),
+            len(options)
+        )
+        options.extend(intern(option) for option in question.options)
+        topics.setdefault(question.topic, []).append(question.id)
+        difficulties.setdefault(question.difficulty, []).append(question.id)
+
+    encoded = [text.encode('utf-8') for text in strings]
+    string_offsets = [0]
+    for data in encoded:
+        string_offsets.append(string_offsets[-1] + len(data))
+
+    ids = [question.id for question in questions]
+    order = sorted(range(len(ids)), key=ids.__getitem__)
+
+    index_entries = bytearray()
+    index_ids: List[int] = []
+    for kind, index in ((INDEX_TOPIC, topics), (INDEX_DIFFICULTY, difficulties)):
+        for value, value_ids in sorted(index.items()):
+            index_entries += INDEX_ENTRY.pack(kind, strings[value], len(index_ids), len(value_ids))
+            index_ids.extend(value_ids)
+
+    body = bytearray(b'\0' * HEADER.size)
+    offsets = []
+    for section in (
+        _u32(string_offsets),
+        b''.join(encoded),
+        bytes(records),
+        _u32(options),
+        _u32(ids),
+        _u32(ids[i] for i in order) + _u32(order),
+        bytes(index_entries) + _u32(index_ids),
+    ):
+        _align(body)
+        offsets.append(len(body))
+        body += section
+
+    HEADER.pack_into(
+        body, 0, MAGIC, FORMAT_VERSION, 0, source_size, source_mtime_ns, version.encode('ascii'),
+        len(questions), len(strings), len(options), len(index_entries) // INDEX_ENTRY.size, len(index_ids),
+        *offsets
+    )
+    return bytes(body)
+
+
+def write_compiled(path: str, data: bytes):
+    """Записывает файл атомарно: открытые mmap старой версии продолжают работать"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+
+
+class CompiledQuestions(Sequence):
+    """questions скомпилированного банка: вопрос разбирается при обращении"""
+
+    __slots__ = ('_snapshot',)
+
+    def __init__(self, snapshot: 'CompiledSnapshot'):
+        self._snapshot = snapshot
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._snapshot.question_at(index)
+
+
+class CompiledSnapshot:
+    """
+    Версия банка из скомпилированного файла.
+    Тот же интерфейс, что у QuestionBankSnapshot, но вопросы разбираются по запросу
+    """
+
+    __slots__ = (
+        'version', 'source_size', 'source_mtime_ns', 'ids', 'topics', 'questions',
+        '_map', '_string_offsets', '_strings', '_records_offset', '_options',
+        '_sorted_ids', '_order', '_by_topic', '_by_difficulty', '_names', '_cache',
+    )
+
+    EMPTY_IDS = array('I')
+
+    def __init__(self, buffer, cache_size: int = 4096):
+        if len(buffer) < HEADER.size:
+            raise CompiledBankError("файл короче заголовка")
+        (magic, format_version, _, self.source_size, self.source_mtime_ns, version,
+         count, string_count, option_count, index_count, index_id_count,
+         string_offsets_at, strings_at, records_at, options_at, ids_at, lookup_at, indexes_at) = \
+            HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise CompiledBankError(f"неизвестный формат {magic!r} v{format_version}")
+        if indexes_at + index_count * INDEX_ENTRY.size + index_id_count * 4 > len(buffer):
+            raise CompiledBankError("файл обрезан")
+
+        self.version = version.decode('ascii')
+        self._map = buffer
+        view = memoryview(buffer)
+
+        def u32(offset: int, length: int) -> memoryview:
+            return view[offset:offset + length * 4].cast('I')
+
+        self._string_offsets = u32(string_offsets_at, string_count + 1)
+        self._strings = view[strings_at:strings_at + self._string_offsets[-1]]
+        self._records_offset = records_at
+        self._options = u32(options_at, option_count)
+        self.ids = array('I')
+        self.ids.frombytes(view[ids_at:ids_at + count * 4])
+        self._sorted_ids = u32(lookup_at, count)
+        self._order = u32(lookup_at + count * 4, count)
+
+        # Индексы: срезы файла без копирования
+        index_ids_at = indexes_at + index_count * INDEX_ENTRY.size
+        self._by_topic: Dict[str, memoryview] = {}
+        self._by_difficulty: Dict[str, memoryview] = {}
+        # Значения тем и сложностей разбираются один раз и общие для всех вопросов
+        self._names: Dict[int, str] = {}
+        for kind, string_index, start, length in INDEX_ENTRY.iter_unpack(view[indexes_at:index_ids_at]):
+            name = self._names[string_index] = sys.intern(self._string(string_index))
+            index = self._by_topic if kind == INDEX_TOPIC else self._by_difficulty
+            index[name] = u32(index_ids_at + start * 4, length)
+        self.topics: Tuple[str, ...] = tuple(sorted(self._by_topic))
+        self.questions = CompiledQuestions(self)
+        self._cache = LRUCache(cache_size)
+
+    def _string(self, index: int) -> str:
+        return str(self._strings[self._string_offsets[index]:self._string_offsets[index + 1]], 'utf-8')
+
+    def question_at(self, record_index: int) -> Question:
+        """Вопрос по номеру записи (порядку в файле)"""
+        question = self._cache.get(record_index)
+        if question is not MISSING:
+            return question
+
+        (question_id, text, explanation, topic, difficulty, correct_answer, option_count, first_option) = \
+            RECORD.unpack_from(self._map, self._records_offset + record_index * RECORD.size)
+        question = Question(
+            id=question_id,
+            question=self._string(text),
+            options=tuple(self._string(i) for i in self._options[first_option:first_option + option_count]),
+            correct_answer=correct_answer,
+            explanation=self._string(explanation),
+            topic=self._names.get(topic) or self._string(topic),
+            difficulty=self._names.get(difficulty) or self._string(difficulty)
+        )
+        self._cache.set(record_index, question)
+        return question
+
+    def get(self, question_id: int) -> Optional[Question]:
+        """Возвращает вопрос по id"""
+        position = bisect_left(self._sorted_ids, question_id)
+        if position == len(self._sorted_ids) or self._sorted_ids[position] != question_id:
+            return None
+        return self.question_at(self._order[position])
+
+    def topic_ids(self, topic: str):
+        """id вопросов темы"""
+        return self._by_topic.get(topic, self.EMPTY_IDS)
+
+    def difficulty_ids(self, difficulty: str):
+        """id вопросов заданной сложности"""
+        return self._by_difficulty.get(difficulty, self.EMPTY_IDS)
+
+    def matches_source(self, size: int, mtime_ns: int) -> bool:
+        """Собран ли файл из questions.json с такими размером и mtime"""
+        return self.source_size == size and self.source_mtime_ns == mtime_ns
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def open_compiled(path: str) -> Optional[CompiledSnapshot]:
+    """Открывает скомпилированный банк через mmap. None - файла нет или он не читается"""
+    if sys.byteorder != 'little':
+        # Массивы файла читаются как есть, без перестановки байт
+        return None
+    try:
+        with open(path, 'rb') as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning("⚠️ Не удалось открыть %s: %s", path, e)
+        return None
+
+    try:
+        return CompiledSnapshot(buffer)
+    except (CompiledBankError, struct.error, TypeError, ValueError) as e:
+        logger.warning("⚠️ Файл %s поврежден, читаем JSON: %s", path, e)
+        return None
+
+
+def compile_file(source: str, target: str) -> int:
+    """Валидирует source и записывает скомпилированный банк в target. Возвращает число вопросов"""
+    from .question_bank import bank_version, parse_questions
+
+    with open(source, 'rb') as file:
+        raw = file.read()
+    stat = os.stat(source)
+    questions = parse_questions(raw)
+    write_compiled(target, compile_questions(questions, bank_version(raw), stat.st_size, stat.st_mtime_ns))
+    return len(questions)
+
+
+def main():
+    from .question_bank import QUESTIONS_PATH, QuestionValidationError
+
+    parser = argparse.ArgumentParser(description="Компиляция questions.json в бинарный банк вопросов")
+    parser.add_argument('source', nargs='?', default=QUESTIONS_PATH)
+    parser.add_argument('target', nargs='?', default=COMPILED_PATH)
+    args = parser.parse_args()
+
+    try:
+        count = compile_file(args.source, args.target)
+    except (QuestionValidationError, ValueError) as e:
+        print(f"❌ {args.source}: {e}")
+        sys.exit(1)
+    print(f"✅ {args.target}: {count} вопросов, {os.path.getsize(args.target)} байт")
+
+
+if __name__ == "__main__":
+    main()
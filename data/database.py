@@ -1,6 +1,11 @@
 import json
+import logging
 from typing import List, Dict, Any
 from .models import Question
+from .question_bank import question_bank
+
+
+logger = logging.getLogger(__name__)
 
 
 def load_questions() -> List[Dict[str, Any]]:
@@ -12,43 +17,43 @@ def load_questions() -> List[Dict[str, Any]]:
             data = json.load(file)
             return data.get('questions', [])
     except FileNotFoundError:
-        print("❌ Файл data/questions.json не найден!")
+        logger.error("❌ Файл data/questions.json не найден!")
         return []
 
 
+def _to_model(q_data) -> Question:
+    """Словарь из JSON -> запись вопроса. Дальше этой границы словари не передаются"""
+    return Question(
+        id=q_data['id'],
+        question=q_data['question'],
+        options=tuple(q_data['options']),
+        correct_answer=q_data['correct_answer'],
+        explanation=q_data.get('explanation', ''),
+        topic=q_data.get('topic', 'general'),
+        difficulty=q_data.get('difficulty', 'easy')
+    )
+
+
 def load_questions_as_models() -> List[Question]:
     """
     Загружает вопросы как объекты моделей
     """
-    questions_data = load_questions()
-    questions = []
-
-    for q_data in questions_data:
-        question = Question(
-            id=q_data['id'],
-            question=q_data['question'],
-            options=q_data['options'],
-            correct_answer=q_data['correct_answer'],
-            explanation=q_data.get('explanation', ''),
-            topic=q_data.get('topic', 'general'),
-            difficulty=q_data.get('difficulty', 'easy')
-        )
-        questions.append(question)
-
-    return questions
+    return [_to_model(q_data) for q_data in load_questions()]
 
 
 def get_questions_by_topic(topic: str) -> List[Question]:
     """
-    Возвращает вопросы по теме
+    Возвращает вопросы по теме.
+    Берет id из индекса текущей версии банка: остальные вопросы не просматриваются.
+    Возвращаются общие записи банка, без копирования
     """
-    all_questions = load_questions_as_models()
-    return [q for q in all_questions if q.topic == topic]
+    snapshot = question_bank.snapshot
+    return [snapshot.get(question_id) for question_id in snapshot.topic_ids(topic)]
 
 
 def get_questions_by_difficulty(difficulty: str) -> List[Question]:
     """
-    Возвращает вопросы по сложности
+    Возвращает вопросы по сложности (через индекс банка, как get_questions_by_topic)
     """
-    all_questions = load_questions_as_models()
-    return [q for q in all_questions if q.difficulty == difficulty]
+    snapshot = question_bank.snapshot
+    return [snapshot.get(question_id) for question_id in snapshot.difficulty_ids(difficulty)]
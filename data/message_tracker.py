@@ -0,0 +1,204 @@
+import itertools
+import time
+from array import array
+from typing import Dict, List, Optional
+
+from .write_behind import DeadLetters, WriteBehindQueue
+
+
+# Telegram разрешает боту удалять сообщения не старше 48 часов
+DELETE_WINDOW = 48 * 3600
+
+
+class MessageRing:
+    """
+    Кольцевой буфер id сообщений одного пользователя с временем отправки.
+    Массивы растут до capacity, дальше новые id затирают самые старые
+    """
+
+    __slots__ = ('ids', 'times', 'head', 'size')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.times = array('I')
+        self.head = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def last(self) -> Optional[int]:
+        if not self.size:
+            return None
+        return self.ids[(self.head + self.size - 1) % len(self.ids)]
+
+    def append(self, message_id: int, tracked_at: int, capacity: int) -> Optional[int]:
+        """Добавляет id. Возвращает вытесненный id, если буфер был полон"""
+        allocated = len(self.ids)
+        if self.size < allocated:
+            i = (self.head + self.size) % allocated
+            self.ids[i] = message_id
+            self.times[i] = tracked_at
+            self.size += 1
+            return None
+
+        if allocated < capacity:
+            if self.head:
+                # Разворачиваем кольцо, чтобы дописывать в конец
+                self.ids = self.ids[self.head:] + self.ids[:self.head]
+                self.times = self.times[self.head:] + self.times[:self.head]
+                self.head = 0
+            self.ids.append(message_id)
+            self.times.append(tracked_at)
+            self.size += 1
+            return None
+
+        evicted = self.ids[self.head]
+        self.ids[self.head] = message_id
+        self.times[self.head] = tracked_at
+        self.head = (self.head + 1) % allocated
+        return evicted
+
+    def prune(self, cutoff: int):
+        """Убирает сообщения, отправленные раньше cutoff"""
+        while self.size and self.times[self.head] < cutoff:
+            self.head = (self.head + 1) % len(self.ids)
+            self.size -= 1
+        if not self.size:
+            # Пустой буфер не держит память
+            self.ids = array('q')
+            self.times = array('I')
+            self.head = 0
+
+    def __contains__(self, message_id: int) -> bool:
+        allocated = len(self.ids)
+        return any(self.ids[(self.head + i) % allocated] == message_id for i in range(self.size))
+
+    def to_list(self) -> List[int]:
+        allocated = len(self.ids)
+        return [self.ids[(self.head + i) % allocated] for i in range(self.size)]
+
+
+class MessageTracker:
+    """
+    Сообщения бота, которые нужно удалить при очистке чата.
+    На пользователя не больше capacity последних id, сообщения старше 48 часов отбрасываются.
+    Изменения пишутся в SQLite группами в фоне и восстанавливаются после перезапуска
+    """
+
+    # Как часто просматривать всех пользователей и удалять устаревшие записи
+    SWEEP_INTERVAL = 600
+
+    def __init__(self, db, capacity: int = 256, max_age: int = DELETE_WINDOW,
+                 flush_interval: float = 0.5, flush_batch: int = 500):
+        self.db = db
+        self.capacity = capacity
+        self.max_age = max_age
+        self._rings: Dict[int, MessageRing] = {}
+        self._last_sweep = int(time.time())
+        self._load()
+        # Операции: ('add', user_id, message_id, tracked_at), ('drop', user_id, message_id),
+        # ('clear', user_id) и ('expire', cutoff)
+        self._changes = WriteBehindQueue(
+            self._write_changes,
+            key=lambda change: change[1],
+            flush_interval=flush_interval,
+            max_batch=flush_batch,
+            name='messages-writer',
+            dead_letters=DeadLetters(db)
+        )
+
+    def __len__(self):
+        return len(self._rings)
+
+    def track(self, user_id: int, message_id: int):
+        """Запоминает сообщение пользователя"""
+        now = int(time.time())
+        if now - self._last_sweep > self.SWEEP_INTERVAL:
+            self.sweep(now)
+
+        ring = self._rings.get(user_id)
+        if ring is None:
+            ring = self._rings[user_id] = MessageRing()
+        elif ring.last() == message_id:
+            # Одно и то же сообщение редактируется много раз подряд
+            return
+
+        evicted = ring.append(message_id, now, self.capacity)
+        # Строка в БД одна на id: удаляем ее, только когда из буфера ушла последняя копия id
+        if evicted is not None and evicted not in ring:
+            self._changes.put(('drop', user_id, evicted))
+        self._changes.put(('add', user_id, message_id, now))
+
+    def get(self, user_id: int) -> List[int]:
+        """id сообщений пользователя, которые еще можно удалить, от старых к новым"""
+        ring = self._rings.get(user_id)
+        if ring is None:
+            return []
+        ring.prune(int(time.time()) - self.max_age)
+        if not ring:
+            del self._rings[user_id]
+            return []
+        return ring.to_list()
+
+    def clear(self, user_id: int):
+        """Забывает все сообщения пользователя"""
+        if self._rings.pop(user_id, None) is not None:
+            self._changes.put(('clear', user_id))
+
+    def sweep(self, now: Optional[int] = None):
+        """Удаляет устаревшие сообщения всех пользователей"""
+        now = int(time.time()) if now is None else now
+        self._last_sweep = now
+        cutoff = now - self.max_age
+        for user_id in list(self._rings):
+            ring = self._rings[user_id]
+            ring.prune(cutoff)
+            if not ring:
+                del self._rings[user_id]
+        self._changes.put(('expire', cutoff))
+
+    def flush(self):
+        self._changes.flush()
+
+    def close(self):
+        """Дописывает накопленные изменения"""
+        self._changes.close()
+
+    def _load(self):
+        cutoff = int(time.time()) - self.max_age
+        with self.db.write() as conn:
+            conn.execute('DELETE FROM tracked_messages WHERE tracked_at < ?', (cutoff,))
+        with self.db.read() as conn:
+            rows = conn.execute(
+                'SELECT user_id, message_id, tracked_at FROM tracked_messages ORDER BY user_id, tracked_at'
+            ).fetchall()
+
+        evicted = []
+        for user_id, message_id, tracked_at in rows:
+            ring = self._rings.get(user_id)
+            if ring is None:
+                ring = self._rings[user_id] = MessageRing()
+            dropped = ring.append(message_id, tracked_at, self.capacity)
+            if dropped is not None:
+                evicted.append((user_id, dropped))
+        if evicted:
+            with self.db.write() as conn:
+                conn.executemany('DELETE FROM tracked_messages WHERE user_id = ? AND message_id = ?', evicted)
+
+    def _write_changes(self, changes):
+        with self.db.write() as conn:
+            # Подряд идущие операции одного вида пишутся одним executemany, порядок сохраняется
+            for kind, group in itertools.groupby(changes, key=lambda change: change[0]):
+                params = [change[1:] for change in group]
+                if kind == 'add':
+                    conn.executemany(
+                        'INSERT OR REPLACE INTO tracked_messages (user_id, message_id, tracked_at) VALUES (?, ?, ?)',
+                        params
+                    )
+                elif kind == 'drop':
+                    conn.executemany('DELETE FROM tracked_messages WHERE user_id = ? AND message_id = ?', params)
+                elif kind == 'clear':
+                    conn.executemany('DELETE FROM tracked_messages WHERE user_id = ?', params)
+                else:
+                    conn.executemany('DELETE FROM tracked_messages WHERE tracked_at < ?', params)
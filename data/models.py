@@ -1,14 +1,17 @@
-from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Iterable, Tuple
 from datetime import datetime
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Question:
-    """Модель вопроса"""
+    """
+    Вопрос банка. Неизменяемый: один экземпляр на вопрос разделяют все сессии,
+    варианты ответов хранятся кортежем
+    """
     id: int
     question: str
-    options: List[str]
+    options: Tuple[str, ...]
     correct_answer: int
     explanation: str
     topic: str = "general"
@@ -24,6 +27,19 @@ class User:
     created_at: str
 
 
+@dataclass
+class LevelStats:
+    """Модель статистики пользователя на одном уровне сложности"""
+    level: str
+    tests: int = 0
+    best_score: int = 0
+    last_correct: int = 0
+    last_total: int = 0
+    total_correct: int = 0
+    total_questions: int = 0
+    last_test_date: Optional[str] = None
+
+
 @dataclass
 class UserStats:
     """Модель статистики пользователя"""
@@ -41,6 +57,34 @@ class UserStats:
     middle_best_score: int = 0
     middle_total_correct: int = 0
     middle_total_questions: int = 0
+    levels: Dict[str, LevelStats] = field(default_factory=dict)
+
+    @classmethod
+    def from_levels(cls, user_id: int, levels: Iterable[LevelStats]) -> "UserStats":
+        """Собирает общую статистику из статистики по уровням"""
+        stats = cls(user_id=user_id, levels={level.level: level for level in levels})
+        for level in stats.levels.values():
+            stats.total_tests += level.tests
+            stats.best_score = max(stats.best_score, level.best_score)
+            stats.total_correct_answers += level.total_correct
+            stats.total_questions_answered += level.total_questions
+            if level.last_test_date and (stats.last_test_date is None or level.last_test_date > stats.last_test_date):
+                stats.last_test_date = level.last_test_date
+
+        # Поля уровней Junior и Middle: *_total_correct/*_total_questions - результат последнего теста
+        junior = stats.levels.get("junior")
+        if junior:
+            stats.junior_tests = junior.tests
+            stats.junior_best_score = junior.best_score
+            stats.junior_total_correct = junior.last_correct
+            stats.junior_total_questions = junior.last_total
+        middle = stats.levels.get("middle")
+        if middle:
+            stats.middle_tests = middle.tests
+            stats.middle_best_score = middle.best_score
+            stats.middle_total_correct = middle.last_correct
+            stats.middle_total_questions = middle.last_total
+        return stats
 
 
 @dataclass
@@ -50,6 +94,33 @@ class TestResult:
     score: int
     total_questions: int
     test_date: str
+    level: str = "junior"
+
+
+@dataclass(frozen=True, slots=True)
+class AnswerEvent:
+    """Один ответ на вопрос теста: строка журнала answer_events"""
+    answered_at: int
+    user_id: int
+    session: int
+    question_id: int
+    chosen: Optional[int]
+    correct: bool
+    response_ms: Optional[int]
+    level: str = "junior"
+
+
+@dataclass
+class QuestionStats:
+    """Сводка ответов на вопрос по всем пользователям"""
+    question_id: int
+    attempts: int = 0
+    correct: int = 0
+    median_ms: Optional[float] = None
+
+    @property
+    def correct_rate(self) -> float:
+        return self.correct / self.attempts if self.attempts else 0.0
 
 
 @dataclass
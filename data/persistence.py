@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import logging
+import pickle
+import time
+from concurrent.futures import Executor
+from typing import Dict, Optional
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+from .cache import LRUCache, MISSING
+from .write_behind import DeadLetters, WriteBehindQueue
+from utils.instrumentation import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(blob: bytes) -> bytes:
+    return hashlib.blake2b(blob, digest_size=8).digest()
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Хранит context.user_data в таблице user_data основной БД.
+    Данные пользователя читаются при его первом обновлении после перезапуска,
+    а не все сразу при старте. Application передает изменившихся пользователей
+    раз в update_interval секунд, в БД уходят только те, чьи данные действительно поменялись,
+    одной транзакцией на пачку. Чтение идет в пуле потоков executor, а не в цикле событий
+    """
+
+    def __init__(self, db, executor: Optional[Executor] = None, update_interval: float = 5,
+                 flush_interval: float = 0.5, flush_batch: int = 500, max_users: int = 100_000):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.db = db
+        self.executor = executor
+        # user_id -> отпечаток последних сохраненных данных (None - в БД ничего нет).
+        # Заодно отмечает пользователей, чьи данные уже загружены. Ограничен max_users недавними:
+        # вытесненный пользователь обойдется одной лишней записью или повторной загрузкой
+        self._digests = LRUCache(max_users)
+        self._writes = WriteBehindQueue(
+            self._write_user_data,
+            key=lambda item: item[0],
+            flush_interval=flush_interval,
+            max_batch=flush_batch,
+            name='user-data-writer',
+            dead_letters=DeadLetters(db)
+        )
+
+    async def get_user_data(self) -> Dict[int, dict]:
+        # Ничего не загружаем при старте: см. refresh_user_data
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        """Вызывается перед обработкой каждого обновления - подгружает данные один раз"""
+        # Непустые user_data уже загружены (или заполнены после загрузки) - даже если отпечаток вытеснен
+        if user_data or self._digests.get(user_id) is not MISSING:
+            return
+
+        loop = asyncio.get_running_loop()
+        blob = await loop.run_in_executor(self.executor, self._read_user_data, user_id)
+        if self._digests.get(user_id) is MISSING:
+            self._digests.set(user_id, _digest(blob) if blob is not None else None)
+        if blob is None:
+            return
+
+        try:
+            stored = pickle.loads(blob)
+        except Exception as e:
+            logger.warning("⚠️ Не удалось прочитать user_data пользователя %s: %s", user_id, e)
+            return
+        # Значения, появившиеся в памяти раньше загрузки, важнее сохраненных
+        for key, value in stored.items():
+            user_data.setdefault(key, value)
+        metrics.increment("persistence.loaded")
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        blob = pickle.dumps(dict(data), protocol=pickle.HIGHEST_PROTOCOL) if data else None
+        digest = _digest(blob) if blob is not None else None
+        if self._digests.get(user_id) == digest:
+            metrics.increment("persistence.unchanged")
+            return
+
+        self._digests.set(user_id, digest)
+        self._writes.put((user_id, blob))
+        metrics.increment("persistence.writes")
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._digests.set(user_id, None)
+        self._writes.put((user_id, None))
+
+    async def flush(self) -> None:
+        """Application вызывает flush при остановке: дописываем очередь, поток записи продолжает работать"""
+        await asyncio.get_running_loop().run_in_executor(self.executor, self._writes.flush)
+
+    def close(self):
+        """Дописывает очередь и останавливает поток записи (post_shutdown)"""
+        self._writes.close()
+
+    def _read_user_data(self, user_id: int) -> Optional[bytes]:
+        def read(pending):
+            # Еще не записанная версия новее той, что в БД
+            if pending:
+                return pending[-1][1]
+            with self.db.read() as conn:
+                row = conn.execute('SELECT data FROM user_data WHERE user_id = ?', (user_id,)).fetchone()
+            return row[0] if row is not None else None
+
+        return self._writes.read(user_id, read)
+
+    def _write_user_data(self, items):
+        # Из нескольких версий данных пользователя в пачке пишется последняя
+        latest = dict(items)
+        now = int(time.time())
+        with self.db.write() as conn:
+            conn.executemany(
+                'INSERT OR REPLACE INTO user_data (user_id, data, updated_at) VALUES (?, ?, ?)',
+                [(user_id, blob, now) for user_id, blob in latest.items() if blob is not None]
+            )
+            conn.executemany(
+                'DELETE FROM user_data WHERE user_id = ?',
+                [(user_id,) for user_id, blob in latest.items() if blob is None]
+            )
+
+    # Остальные данные бот не хранит
+
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def get_conversations(self, name):
+        return {}
+
+    async def update_conversation(self, name, key, new_state) -> None:
+        pass
+
+    async def update_chat_data(self, chat_id, data) -> None:
+        pass
+
+    async def update_bot_data(self, data) -> None:
+        pass
+
+    async def update_callback_data(self, data) -> None:
+        pass
+
+    async def drop_chat_data(self, chat_id) -> None:
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data) -> None:
+        pass
+
+    async def refresh_bot_data(self, bot_data) -> None:
+        pass
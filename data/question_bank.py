@@ -0,0 +1,276 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from .compiled_bank import COMPILED_PATH, CompiledSnapshot, open_compiled
+from .models import Question
+
+
+QUESTIONS_PATH = 'data/questions.json'
+
+logger = logging.getLogger(__name__)
+
+
+def bank_version(raw: bytes) -> str:
+    """Версия банка - отпечаток содержимого questions.json"""
+    return hashlib.sha256(raw).hexdigest()[:16]
+
+
+def _stat_key(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class QuestionValidationError(ValueError):
+    """Ошибка валидации файла с вопросами"""
+
+
+def parse_questions(raw: bytes) -> Tuple[Question, ...]:
+    """
+    Разбирает и валидирует содержимое questions.json.
+    Возвращает кортеж неизменяемых вопросов; словари из JSON дальше не передаются
+    """
+    data = json.loads(raw)
+    items = data.get('questions') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise QuestionValidationError("ожидается объект с ключом 'questions'")
+
+    seen_ids = set()
+    questions = []
+    for position, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise QuestionValidationError(f"вопрос #{position}: ожидается объект")
+
+        question_id = item.get('id')
+        # id хранятся в array('I') и в скомпилированном банке как u32
+        if not isinstance(question_id, int) or not 0 <= question_id < 2 ** 32:
+            raise QuestionValidationError(f"вопрос #{position}: некорректный id {question_id!r}")
+        if question_id in seen_ids:
+            raise QuestionValidationError(f"вопрос #{position}: повторяющийся id {question_id}")
+        seen_ids.add(question_id)
+
+        text = item.get('question')
+        if not isinstance(text, str) or not text:
+            raise QuestionValidationError(f"вопрос {question_id}: пустой текст")
+
+        options = item.get('options')
+        if not isinstance(options, list) or len(options) < 2 \
+                or not all(isinstance(option, str) for option in options):
+            raise QuestionValidationError(f"вопрос {question_id}: некорректные варианты ответа")
+
+        correct_answer = item.get('correct_answer')
+        if not isinstance(correct_answer, int) or not 0 <= correct_answer < len(options):
+            raise QuestionValidationError(f"вопрос {question_id}: некорректный correct_answer")
+
+        explanation = item.get('explanation', '')
+        topic = item.get('topic', 'general')
+        difficulty = item.get('difficulty', 'easy')
+        for name, value in (('explanation', explanation), ('topic', topic), ('difficulty', difficulty)):
+            if not isinstance(value, str):
+                raise QuestionValidationError(f"вопрос {question_id}: {name} должен быть строкой")
+
+        questions.append(Question(
+            id=question_id,
+            question=text,
+            options=tuple(options),
+            correct_answer=correct_answer,
+            explanation=explanation,
+            # Темы и сложности повторяются у тысяч вопросов - храним по одной строке
+            topic=sys.intern(topic),
+            difficulty=sys.intern(difficulty)
+        ))
+
+    return tuple(questions)
+
+
+def build_index(questions: Tuple[Question, ...], field: str) -> Dict[str, array]:
+    """Инвертированный индекс: значение поля -> id вопросов в порядке файла"""
+    index: Dict[str, array] = {}
+    for question in questions:
+        value = getattr(question, field)
+        ids = index.get(value)
+        if ids is None:
+            ids = index[value] = array('I')
+        ids.append(question.id)
+    return index
+
+
+class QuestionBankSnapshot:
+    """
+    Неизменяемая версия банка вопросов.
+    Индексы по теме и сложности строятся один раз при загрузке, массивы id не меняются
+    """
+
+    __slots__ = ('version', 'questions', 'ids', 'topics', '_by_id', '_by_topic', '_by_difficulty')
+
+    EMPTY_IDS = array('I')
+
+    def __init__(self, version: str, questions: Tuple[Question, ...]):
+        self.version = version
+        self.questions = questions
+        self.ids = array('I', (q.id for q in questions))
+        self._by_id: Dict[int, Question] = {q.id: q for q in questions}
+        self._by_topic = build_index(questions, 'topic')
+        self._by_difficulty = build_index(questions, 'difficulty')
+        self.topics: Tuple[str, ...] = tuple(sorted(self._by_topic))
+
+    def get(self, question_id: int) -> Optional[Question]:
+        """Возвращает вопрос по id"""
+        return self._by_id.get(question_id)
+
+    def topic_ids(self, topic: str) -> array:
+        """id вопросов темы"""
+        return self._by_topic.get(topic, self.EMPTY_IDS)
+
+    def difficulty_ids(self, difficulty: str) -> array:
+        """id вопросов заданной сложности"""
+        return self._by_difficulty.get(difficulty, self.EMPTY_IDS)
+
+    def __len__(self):
+        return len(self.questions)
+
+
+class QuestionBank:
+    """
+    Банк вопросов в памяти процесса.
+    Файл читается один раз и перечитывается в фоне, когда меняется его mtime или содержимое.
+    Если рядом лежит актуальный скомпилированный банк, вопросы читаются из него через mmap
+    """
+
+    # Сколько предыдущих версий держим для уже начатых сессий
+    HISTORY_SIZE = 4
+
+    def __init__(self, path: str = QUESTIONS_PATH, compiled_path: Optional[str] = COMPILED_PATH,
+                 check_interval: float = 5.0):
+        self.path = path
+        # Скомпилированный банк (см. data/compiled_bank.py). None - всегда читать JSON
+        self.compiled_path = compiled_path
+        self.check_interval = check_interval
+        self._snapshot = QuestionBankSnapshot('', ())
+        self._history: "OrderedDict[str, QuestionBankSnapshot]" = OrderedDict()
+        self._stat_key = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self.reload()
+
+    @property
+    def snapshot(self) -> QuestionBankSnapshot:
+        """Текущая версия банка"""
+        return self._snapshot
+
+    def get_snapshot(self, version: str) -> Optional[QuestionBankSnapshot]:
+        """Возвращает версию банка, с которой была начата сессия"""
+        if version == self._snapshot.version:
+            return self._snapshot
+        return self._history.get(version)
+
+    def reload(self) -> bool:
+        """
+        Перечитывает банк если questions.json или скомпилированный банк изменились.
+        Скомпилированный банк используется, только если собран из текущего questions.json.
+        Возвращает True если банк заменен
+        """
+        with self._lock:
+            source_key = _stat_key(self.path)
+            compiled_key = _stat_key(self.compiled_path) if self.compiled_path else None
+            if source_key is None and compiled_key is None:
+                if self._stat_key is not None or not self._snapshot.version:
+                    logger.error("❌ Файл %s не найден!", self.path)
+                self._stat_key = None
+                return False
+
+            stat_key = (source_key, compiled_key)
+            if stat_key == self._stat_key:
+                return False
+            self._stat_key = stat_key
+
+            snapshot = self._open_compiled(source_key) if compiled_key is not None else None
+            if snapshot is None and source_key is not None:
+                snapshot = self._parse_source()
+            if snapshot is None or snapshot.version == self._snapshot.version and (
+                    # Та же версия заменяет текущую, только если вместо JSON появился скомпилированный банк
+                    isinstance(self._snapshot, CompiledSnapshot) or not isinstance(snapshot, CompiledSnapshot)):
+                return False
+
+            if self._snapshot.version and self._snapshot.version != snapshot.version:
+                self._history[self._snapshot.version] = self._snapshot
+                while len(self._history) > self.HISTORY_SIZE:
+                    self._history.popitem(last=False)
+            # Атомарная подмена: читатели видят либо старую, либо новую версию целиком
+            self._snapshot = snapshot
+
+        logger.info("📚 Загружено вопросов: %s (версия %s, %s)", len(snapshot), snapshot.version,
+                    'скомпилированный банк' if isinstance(snapshot, CompiledSnapshot) else 'JSON')
+        return True
+
+    def _open_compiled(self, source_key):
+        """Скомпилированный банк, если он собран из текущего questions.json, иначе None"""
+        snapshot = open_compiled(self.compiled_path)
+        if snapshot is None or source_key is None:
+            return snapshot
+        mtime_ns, size = source_key
+        if snapshot.matches_source(size, mtime_ns):
+            return snapshot
+
+        # mtime меняется и при копировании файла - сверяем содержимое
+        with open(self.path, 'rb') as file:
+            if bank_version(file.read()) == snapshot.version:
+                return snapshot
+        logger.warning("⚠️ %s собран из другой версии %s, читаем JSON. "
+                       "Пересоберите: python -m data.compiled_bank", self.compiled_path, self.path)
+        return None
+
+    def _parse_source(self):
+        """Версия банка из questions.json. None - файл с ошибками"""
+        with open(self.path, 'rb') as file:
+            raw = file.read()
+
+        version = bank_version(raw)
+        if version == self._snapshot.version:
+            return self._snapshot
+
+        try:
+            questions = parse_questions(raw)
+        except ValueError as e:
+            logger.error("❌ Ошибка в %s, оставляем версию %s: %s", self.path, self._snapshot.version or '-', e)
+            return None
+        return QuestionBankSnapshot(version, questions)
+
+    def start_watching(self):
+        """Запускает фоновую проверку изменений файла"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=self._watch, name='question-bank-watcher', daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        """Останавливает фоновую проверку"""
+        self._stop_event.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=self.check_interval)
+            self._watcher = None
+
+    def _watch(self):
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                self.reload()
+            except OSError as e:
+                logger.warning("⚠️ Ошибка при перезагрузке вопросов: %s", e)
+            except Exception:
+                # Поток проверки не должен умирать: следующая правка файла снова будет подхвачена
+                logger.exception("❌ Непредвиденная ошибка при перезагрузке вопросов")
+
+
+# Глобальный банк вопросов
+question_bank = QuestionBank()
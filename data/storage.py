@@ -1,34 +1,65 @@
+import logging
 import sqlite3
 import os
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
-from .models import User, UserStats, Achievement
+from .answer_log import AnswerLog
+from .cache import LRUCache
+from .connection import ConnectionManager
+from .message_tracker import MessageTracker
+from .models import User, UserStats, LevelStats, Achievement, TestResult, AnswerEvent, QuestionStats
+from .write_behind import DeadLetters, WriteBehindQueue
+from utils.instrumentation import metrics
+
+
+logger = logging.getLogger(__name__)
 
 
 class Storage:
-    def __init__(self, db_path: str = "data/qa_bot.db"):
+    def __init__(self, db_path: str = "data/qa_bot.db", connections: Optional[ConnectionManager] = None,
+                 flush_interval: float = 0.05, flush_batch: int = 500, stats_cache_size: int = 10000):
         self.db_path = db_path
-        self.user_messages = {}
+        self.db = connections or ConnectionManager(db_path)
+        # Кэш UserStats: меню читает статистику гораздо чаще, чем она меняется
+        self.stats_cache = LRUCache(stats_cache_size)
+        # Известные пользователи: user_id -> (username, first_name)
+        self.known_users: Dict[int, Tuple[Optional[str], Optional[str]]] = {}
         self._init_database()
+        self._load_known_users()
+        # События очередей записи, которые не записываются из-за своих данных
+        self.dead_letters = DeadLetters(self.db)
+        # Результаты тестов пишутся группами в фоне
+        self.results = WriteBehindQueue(
+            self._write_test_results,
+            key=lambda result: result.user_id,
+            flush_interval=flush_interval,
+            max_batch=flush_batch,
+            name='results-writer',
+            dead_letters=self.dead_letters
+        )
+        # Сообщения для очистки чата: ограниченный буфер на пользователя, переживает перезапуск
+        self.messages = MessageTracker(self.db)
+        # Журнал ответов и сводки по вопросам: тоже группами в фоне
+        self.answers = AnswerLog(self.db)
 
     def _init_database(self):
         """Инициализирует базу данных и таблицы"""
         # Проверяем существует ли уже БД
         if os.path.exists(self.db_path):
-            print(f"📁 Подключаемся к существующей БД: {self.db_path}")
+            logger.info("📁 Подключаемся к существующей БД: %s", self.db_path)
             # Только проверяем структуру, не создаем заново
             self._update_database_schema()
             return
 
-        print(f"📁 Создаем папку для: {os.path.dirname(self.db_path)}")
+        logger.info("📁 Создаем папку для: %s", os.path.dirname(self.db_path))
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
 
-        print(f"🔧 Подключаемся к БД: {self.db_path}")
-        with sqlite3.connect(self.db_path) as conn:
+        logger.info("🔧 Подключаемся к БД: %s", self.db_path)
+        with self.db.write() as conn:
             cursor = conn.cursor()
 
             # Создаем таблицу пользователей ПЕРВОЙ
-            print("🛠️ Создаем таблицу users...")
+            logger.debug("🛠️ Создаем таблицу users...")
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS users (
                     user_id INTEGER PRIMARY KEY,
@@ -39,7 +70,7 @@ class Storage:
             ''')
 
             # Создаем таблицу статистики
-            print("🛠️ Создаем таблицу user_stats...")
+            logger.debug("🛠️ Создаем таблицу user_stats...")
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS user_stats (
                     user_id INTEGER PRIMARY KEY,
@@ -61,7 +92,7 @@ class Storage:
             ''')
 
             # Создаем таблицу результатов тестов
-            print("🛠️ Создаем таблицу test_results...")
+            logger.debug("🛠️ Создаем таблицу test_results...")
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS test_results (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -69,12 +100,13 @@ class Storage:
                     score INTEGER,
                     total_questions INTEGER,
                     test_date TEXT,
+                    level TEXT,
                     FOREIGN KEY (user_id) REFERENCES users (user_id)
                 )
             ''')
 
             # Создаем таблицу достижений
-            print("🛠️ Создаем таблицу achievements...")
+            logger.debug("🛠️ Создаем таблицу achievements...")
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS achievements (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -88,66 +120,103 @@ class Storage:
             # Проверяем что таблицы создались
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
             tables = cursor.fetchall()
-            print(f"✅ Созданные таблицы: {tables}")
+            logger.debug("✅ Созданные таблицы: %s", tables)
             self._update_database_schema()
             self.debug_check_table_columns()
 
-            conn.commit()
+        logger.info("✅ БД инициализирована!")
+
+
+    def _load_known_users(self):
+        """Заполняет индекс известных пользователей из БД"""
+        with self.db.read() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT user_id, username, first_name FROM users')
+            self.known_users = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
 
-        print("✅ БД инициализирована!")
+    def is_user_up_to_date(self, user: User) -> bool:
+        """Проверяет по индексу в памяти, что пользователь уже сохранен с теми же данными"""
+        return self.known_users.get(user.user_id) == (user.username, user.first_name)
 
 
-    def save_user(self, user: User):
-        """Сохраняет или обновляет пользователя"""
-        with sqlite3.connect(self.db_path) as conn:
+    @metrics.timed("storage.save_user")
+    def save_user(self, user: User) -> bool:
+        """
+        Сохраняет нового пользователя или обновляет изменившиеся username/first_name.
+        created_at при обновлении не меняется. Возвращает True если была запись в БД
+        """
+        if self.is_user_up_to_date(user):
+            return False
+
+        with self.db.write() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT OR REPLACE INTO users (user_id, username, first_name, created_at)
+                INSERT INTO users (user_id, username, first_name, created_at)
                 VALUES (?, ?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    username = excluded.username,
+                    first_name = excluded.first_name
+                WHERE users.username IS NOT excluded.username
+                   OR users.first_name IS NOT excluded.first_name
             ''', (user.user_id, user.username, user.first_name, user.created_at))
-            conn.commit()
+
+        self.known_users[user.user_id] = (user.username, user.first_name)
+        return True
 
 
     def get_user_stats(self, user_id: int) -> Optional[UserStats]:
-        """Возвращает статистику пользователя"""
-        with sqlite3.connect(self.db_path) as conn:
+        """
+        Возвращает статистику пользователя с учетом еще не записанных результатов.
+        Повторные чтения без изменений обслуживаются из кэша
+        """
+        return self.stats_cache.get_or_load(user_id, lambda: self._load_user_stats(user_id))
+
+
+    def get_cached_user_stats(self, user_id: int):
+        """Возвращает статистику из кэша без обращения к БД или MISSING"""
+        return self.stats_cache.get(user_id)
+
+
+    def load_user_stats(self, user_id: int) -> Optional[UserStats]:
+        """Читает статистику из БД (после промаха кэша) и кэширует ее"""
+        return self.stats_cache.load(user_id, lambda: self._load_user_stats(user_id))
+
+
+    @metrics.timed("storage.get_user_stats")
+    def _load_user_stats(self, user_id: int) -> Optional[UserStats]:
+        """Читает статистику из БД и накладывает ожидающие записи результаты"""
+        def read(pending: List[TestResult]) -> Optional[UserStats]:
+            levels = self._read_level_stats(user_id)
+            for result in pending:
+                self._apply_result(levels, result)
+
+            if not levels:
+                logger.debug("get_user_stats: user_id=%s, row found: False", user_id)
+                return None
+
+            logger.debug("get_user_stats: user_id=%s, levels: %s", user_id, levels)
+            return UserStats.from_levels(user_id, levels.values())
+
+        return self.results.read(user_id, read)
+
+
+    def _read_level_stats(self, user_id: int) -> Dict[str, LevelStats]:
+        """Читает статистику пользователя по уровням из БД"""
+        with self.db.read() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                SELECT * FROM user_stats WHERE user_id = ?
+                SELECT level, tests, best_score, last_correct, last_total,
+                       total_correct, total_questions, last_test_date
+                FROM user_level_stats WHERE user_id = ?
             ''', (user_id,))
 
-            row = cursor.fetchone()
-
-            if row:
-                print(f"🔍 DEBUG get_user_stats: user_id={user_id}, row found: True")
-                print(f"🔍 DEBUG - full row: {row}")
-
-                # Создаем объект UserStats из строки БД
-                stats = UserStats(
-                    user_id=row[0],
-                    total_tests=row[1],
-                    best_score=row[2],
-                    total_correct_answers=row[3],
-                    total_questions_answered=row[4],
-                    last_test_date=row[5],
-                    junior_tests=row[6],
-                    junior_best_score=row[7],
-                    junior_total_correct=row[8],
-                    junior_total_questions=row[9],
-                    middle_tests=row[10],
-                    middle_best_score=row[11],
-                    middle_total_correct=row[12],
-                    middle_total_questions=row[13]
-                )
-                return stats
-            else:
-                print(f"🔍 DEBUG get_user_stats: user_id={user_id}, row found: False")
-                return None
+            return {row[0]: LevelStats(*row) for row in cursor.fetchall()}
 
 
     def get_user_achievements(self, user_id: int) -> List[Achievement]:
         """Возвращает достижения пользователя"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.read() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 SELECT user_id, achievement_name, earned_date 
@@ -161,7 +230,7 @@ class Storage:
         """Выводит все данные для отладки"""
         print("🔍 ДЕБАГ: Проверяем данные в БД:")
 
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.read() as conn:
             cursor = conn.cursor()
 
             # Проверяем пользователей
@@ -180,14 +249,19 @@ class Storage:
             print(f"🎯 Результаты тестов: {results}")
 
 
+    @metrics.timed("storage.reset_stats")
     def reset_user_stats(self, user_id: int):
         """
         Полностью сбрасывает статистику пользователя
         """
-        with sqlite3.connect(self.db_path) as conn:
+        # Сначала дописываем ожидающие результаты, чтобы они не вернулись после сброса
+        self.results.flush()
+
+        with self.db.write() as conn:
             cursor = conn.cursor()
 
             # Удаляем статистику
+            cursor.execute('DELETE FROM user_level_stats WHERE user_id = ?', (user_id,))
             cursor.execute('DELETE FROM user_stats WHERE user_id = ?', (user_id,))
 
             # Удаляем результаты тестов
@@ -196,102 +270,87 @@ class Storage:
             # Удаляем достижения
             cursor.execute('DELETE FROM achievements WHERE user_id = ?', (user_id,))
 
-            conn.commit()
+        self.stats_cache.invalidate(user_id)
 
-        print(f"🗑️ Статистика пользователя {user_id} сброшена")
+        logger.info("🗑️ Статистика пользователя %s сброшена", user_id)
 
 
     def save_test_result_with_level(self, user_id: int, score: int, total_questions: int, level: str):
-        """Сохраняет результат теста с учетом уровня сложности"""
+        """
+        Сохраняет результат теста с учетом уровня сложности.
+        Результат ставится в очередь и записывается в БД вместе с другими одной транзакцией
+        """
         test_date = datetime.now().isoformat()
 
-        print(f"🔍 СОХРАНЕНИЕ: user_id={user_id}, score={score}, total={total_questions}, level={level}")
-
+        logger.debug("СОХРАНЕНИЕ: user_id=%s, score=%s, total=%s, level=%s", user_id, score, total_questions, level)
+
+        self.results.put(TestResult(
+            user_id=user_id,
+            score=score,
+            total_questions=total_questions,
+            test_date=test_date,
+            level=level
+        ))
+        self.stats_cache.invalidate(user_id)
+
+
+    @staticmethod
+    def _apply_result(levels: Dict[str, LevelStats], result: TestResult):
+        """Применяет еще не записанный результат к статистике так же, как это сделает UPSERT в БД"""
+        level = levels.get(result.level)
+        if level is None:
+            level = levels[result.level] = LevelStats(level=result.level)
+
+        level.tests += 1
+        level.best_score = max(level.best_score, result.score)
+        level.last_correct = result.score
+        level.last_total = result.total_questions
+        level.total_correct += result.score
+        level.total_questions += result.total_questions
+        level.last_test_date = result.test_date
+
+
+    @metrics.timed("storage.save_result")
+    def _write_test_results(self, results: List[TestResult]):
+        """Записывает пачку результатов тестов одной транзакцией"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with self.db.write() as conn:
                 cursor = conn.cursor()
 
-                # Сохраняем результат теста
-                cursor.execute('''
-                        INSERT INTO test_results (user_id, score, total_questions, test_date)
-                        VALUES (?, ?, ?, ?)
-                    ''', (user_id, score, total_questions, test_date))
-                print(f"✅ Результат теста сохранен в test_results")
-
-                # Обновляем статистику в зависимости от уровня
-                if level == "junior":
-                    print(f"🔍 Обновляем статистику JUNIOR...")
-                    cursor.execute('''
-                            INSERT OR REPLACE INTO user_stats 
-                            (user_id, total_tests, best_score, total_correct_answers, total_questions_answered, 
-                             last_test_date, junior_tests, junior_best_score, junior_total_correct, junior_total_questions,
-                             middle_tests, middle_best_score, middle_total_correct, middle_total_questions)
-                            VALUES (
-                                ?,
-                                COALESCE((SELECT total_tests FROM user_stats WHERE user_id = ?), 0) + 1,
-                                MAX(COALESCE((SELECT best_score FROM user_stats WHERE user_id = ?), 0), ?),
-                                COALESCE((SELECT total_correct_answers FROM user_stats WHERE user_id = ?), 0) + ?,
-                                COALESCE((SELECT total_questions_answered FROM user_stats WHERE user_id = ?), 0) + ?,
-                                ?,
-                                COALESCE((SELECT junior_tests FROM user_stats WHERE user_id = ?), 0) + 1,
-                                MAX(COALESCE((SELECT junior_best_score FROM user_stats WHERE user_id = ?), 0), ?),
-                                ?,  -- junior_total_correct: результат последнего теста
-                                ?,  -- junior_total_questions: количество вопросов последнего теста
-                                COALESCE((SELECT middle_tests FROM user_stats WHERE user_id = ?), 0),
-                                COALESCE((SELECT middle_best_score FROM user_stats WHERE user_id = ?), 0),
-                                COALESCE((SELECT middle_total_correct FROM user_stats WHERE user_id = ?), 0),
-                                COALESCE((SELECT middle_total_questions FROM user_stats WHERE user_id = ?), 0)
-                            )
-                        ''', (user_id, user_id, user_id, score, user_id, score, user_id, total_questions,
-                              test_date,
-                              user_id, user_id, score,
-                              score,  # junior_total_correct = результат последнего теста
-                              total_questions,  # junior_total_questions = количество вопросов последнего теста
-                              user_id, user_id, user_id, user_id))  # middle поля (оставляем как есть)
-                    print(f"✅ Статистика JUNIOR обновлена")
-
-                elif level == "middle":
-                    print(f"🔍 Обновляем статистику MIDDLE...")
-                    cursor.execute('''
-                            INSERT OR REPLACE INTO user_stats 
-                            (user_id, total_tests, best_score, total_correct_answers, total_questions_answered, 
-                             last_test_date, junior_tests, junior_best_score, junior_total_correct, junior_total_questions,
-                             middle_tests, middle_best_score, middle_total_correct, middle_total_questions)
-                            VALUES (
-                                ?,
-                                COALESCE((SELECT total_tests FROM user_stats WHERE user_id = ?), 0) + 1,
-                                MAX(COALESCE((SELECT best_score FROM user_stats WHERE user_id = ?), 0), ?),
-                                COALESCE((SELECT total_correct_answers FROM user_stats WHERE user_id = ?), 0) + ?,
-                                COALESCE((SELECT total_questions_answered FROM user_stats WHERE user_id = ?), 0) + ?,
-                                ?,
-                                COALESCE((SELECT junior_tests FROM user_stats WHERE user_id = ?), 0),
-                                COALESCE((SELECT junior_best_score FROM user_stats WHERE user_id = ?), 0),
-                                COALESCE((SELECT junior_total_correct FROM user_stats WHERE user_id = ?), 0),
-                                COALESCE((SELECT junior_total_questions FROM user_stats WHERE user_id = ?), 0),
-                                COALESCE((SELECT middle_tests FROM user_stats WHERE user_id = ?), 0) + 1,
-                                MAX(COALESCE((SELECT middle_best_score FROM user_stats WHERE user_id = ?), 0), ?),
-                                ?,  -- middle_total_correct: результат последнего теста
-                                ?   -- middle_total_questions: всегда 100 для Middle
-                            )
-                        ''', (user_id, user_id, user_id, score, user_id, score, user_id, 100,
-                              test_date,
-                              user_id, user_id, user_id, user_id,  # junior поля (оставляем как есть)
-                              user_id, user_id, score,
-                              score,  # middle_total_correct = результат последнего теста
-                              100))  # middle_total_questions = всегда 100
-                    print(f"✅ Статистика MIDDLE обновлена")
-
-                conn.commit()
-                print(f"✅ Все данные успешно сохранены в БД!")
-
-        except Exception as e:
-            print(f"❌ ОШИБКА при сохранении в БД: {e}")
+                # Сохраняем результаты тестов
+                cursor.executemany('''
+                    INSERT INTO test_results (user_id, score, total_questions, test_date, level)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(r.user_id, r.score, r.total_questions, r.test_date, r.level) for r in results])
+
+                # Обновляем счетчики уровня: каждый результат меняет одну строку (user_id, level)
+                cursor.executemany('''
+                    INSERT INTO user_level_stats
+                        (user_id, level, tests, best_score, last_correct, last_total,
+                         total_correct, total_questions, last_test_date)
+                    VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (user_id, level) DO UPDATE SET
+                        tests = tests + 1,
+                        best_score = MAX(best_score, excluded.best_score),
+                        last_correct = excluded.last_correct,
+                        last_total = excluded.last_total,
+                        total_correct = total_correct + excluded.total_correct,
+                        total_questions = total_questions + excluded.total_questions,
+                        last_test_date = excluded.last_test_date
+                ''', [(r.user_id, r.level, r.score, r.score, r.total_questions,
+                       r.score, r.total_questions, r.test_date) for r in results])
+
+                logger.debug("✅ Сохранено результатов: %s", len(results))
+                metrics.increment("storage.results_written", len(results))
+
+        except Exception:
+            logger.exception("❌ ОШИБКА при сохранении %s результатов в БД", len(results))
             raise
 
 
     def _update_database_schema(self):
         """Обновляет схему базы данных добавляя недостающие колонки"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.write() as conn:
             cursor = conn.cursor()
 
             # Добавляем недостающие колонки если их нет
@@ -306,40 +365,206 @@ class Storage:
                 column_name = column_def.split(' ')[0]
                 try:
                     cursor.execute(f'ALTER TABLE user_stats ADD COLUMN {column_def}')
-                    print(f"✅ Добавлена колонка {column_name}")
+                    logger.info("✅ Добавлена колонка %s", column_name)
                 except sqlite3.OperationalError:
                     # Колонка уже существует - это нормально
                     pass
 
+            # Уровень теста в test_results; у старых результатов остается NULL
+            try:
+                cursor.execute('ALTER TABLE test_results ADD COLUMN level TEXT')
+                logger.info("✅ Добавлена колонка test_results.level")
+            except sqlite3.OperationalError:
+                pass
+
+            # Статистика по уровням: одна строка на (пользователь, уровень)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_level_stats (
+                    user_id INTEGER NOT NULL,
+                    level TEXT NOT NULL,
+                    tests INTEGER NOT NULL DEFAULT 0,
+                    best_score INTEGER NOT NULL DEFAULT 0,
+                    last_correct INTEGER NOT NULL DEFAULT 0,
+                    last_total INTEGER NOT NULL DEFAULT 0,
+                    total_correct INTEGER NOT NULL DEFAULT 0,
+                    total_questions INTEGER NOT NULL DEFAULT 0,
+                    last_test_date TEXT,
+                    PRIMARY KEY (user_id, level)
+                ) WITHOUT ROWID
+            ''')
+
+            # Сообщения бота, которые будут удалены при очистке чата
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tracked_messages (
+                    user_id INTEGER NOT NULL,
+                    message_id INTEGER NOT NULL,
+                    tracked_at INTEGER NOT NULL,
+                    PRIMARY KEY (user_id, message_id)
+                ) WITHOUT ROWID
+            ''')
+
+            # context.user_data: незавершенные тесты и последние результаты переживают перезапуск
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS user_data (
+                    user_id INTEGER PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    updated_at INTEGER NOT NULL
+                )
+            ''')
+
+            # Журнал ответов: только дописывается, индексов нет - отчеты строятся по сводкам ниже
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS answer_events (
+                    answered_at INTEGER NOT NULL,
+                    user_id INTEGER NOT NULL,
+                    session INTEGER NOT NULL,
+                    question_id INTEGER NOT NULL,
+                    chosen INTEGER,
+                    correct INTEGER NOT NULL,
+                    response_ms INTEGER,
+                    level TEXT NOT NULL
+                )
+            ''')
+
+            # Сводка ответов по вопросу, обновляется вместе с журналом
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS question_stats (
+                    question_id INTEGER PRIMARY KEY,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    correct INTEGER NOT NULL DEFAULT 0,
+                    last_answered_at INTEGER
+                )
+            ''')
+
+            # Гистограмма времени ответа на вопрос (корзины см. data/answer_log.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS question_time_buckets (
+                    question_id INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    answers INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (question_id, bucket)
+                ) WITHOUT ROWID
+            ''')
+
+            # События очередей записи, отложенные из-за ошибки в данных (см. data/write_behind.py)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS dead_letters (
+                    id INTEGER PRIMARY KEY,
+                    queue TEXT NOT NULL,
+                    failed_at INTEGER NOT NULL,
+                    error TEXT NOT NULL,
+                    item TEXT NOT NULL,
+                    data BLOB
+                )
+            ''')
+
+            schema_version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            if schema_version < 1:
+                self._migrate_user_stats_to_levels(cursor)
+                cursor.execute('PRAGMA user_version = 1')
+
+
+    @staticmethod
+    def _migrate_user_stats_to_levels(cursor):
+        """
+        Переносит статистику из колонок user_stats в user_level_stats.
+        Старая схема не хранила суммы правильных ответов по уровням: если были и Junior, и Middle,
+        Middle получает результат последнего теста, остаток относится к Junior.
+        У пользователя с одним уровнем все суммы относятся к нему. Общие суммы сохраняются
+        """
+        cursor.execute('''
+            INSERT OR IGNORE INTO user_level_stats
+                (user_id, level, tests, best_score, last_correct, last_total,
+                 total_correct, total_questions, last_test_date)
+            SELECT user_id, 'middle', middle_tests, middle_best_score,
+                   middle_total_correct, middle_total_questions,
+                   CASE WHEN junior_tests > 0
+                       THEN MIN(total_correct_answers, middle_total_correct) ELSE total_correct_answers END,
+                   CASE WHEN junior_tests > 0
+                       THEN middle_tests * 100 ELSE total_questions_answered END,
+                   last_test_date
+            FROM user_stats WHERE middle_tests > 0
+        ''')
+        cursor.execute('''
+            INSERT OR IGNORE INTO user_level_stats
+                (user_id, level, tests, best_score, last_correct, last_total,
+                 total_correct, total_questions, last_test_date)
+            SELECT user_id, 'junior', junior_tests, junior_best_score,
+                   junior_total_correct, junior_total_questions,
+                   total_correct_answers - CASE WHEN middle_tests > 0
+                       THEN MIN(total_correct_answers, middle_total_correct) ELSE 0 END,
+                   total_questions_answered - middle_tests * 100, last_test_date
+            FROM user_stats WHERE junior_tests > 0
+        ''')
+        migrated = cursor.execute('SELECT COUNT(*) FROM user_level_stats').fetchone()[0]
+        if migrated:
+            logger.info("✅ Статистика перенесена в user_level_stats: %s строк", migrated)
+
+        # ПРОВЕРКА: суммы по уровням должны совпасть с общими суммами старой схемы
+        mismatched = cursor.execute('''
+            SELECT s.user_id FROM user_stats s
+            JOIN (SELECT user_id, SUM(total_correct) AS correct, SUM(total_questions) AS questions
+                  FROM user_level_stats GROUP BY user_id) l ON l.user_id = s.user_id
+            WHERE l.correct != s.total_correct_answers OR l.questions != s.total_questions_answered
+        ''').fetchall()
+        if mismatched:
+            logger.warning("⚠️ После переноса не сходятся суммы у %s пользователей: %s",
+                           len(mismatched), [row[0] for row in mismatched[:20]])
+
 
     def debug_check_table_columns(self):
         """Проверяет какие колонки есть в таблице user_stats"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self.db.read() as conn:
             cursor = conn.cursor()
             cursor.execute("PRAGMA table_info(user_stats)")
             columns = cursor.fetchall()
-            print("🔍 Колонки таблицы user_stats:")
-            for col in columns:
-                print(f"   {col[1]} ({col[2]})")
+            logger.debug("🔍 Колонки таблицы user_stats: %s", ", ".join(f"{col[1]} ({col[2]})" for col in columns))
 
 
     def track_message(self, user_id: int, message_id: int):
         """Сохраняет ID сообщения для пользователя"""
-        if user_id not in self.user_messages:
-            self.user_messages[user_id] = []
-        self.user_messages[user_id].append(message_id)
+        self.messages.track(user_id, message_id)
 
 
     def get_user_messages(self, user_id: int) -> List[int]:
-        """Возвращает список ID сообщений пользователя"""
-        return self.user_messages.get(user_id, [])
+        """Возвращает список ID сообщений пользователя, которые еще можно удалить"""
+        return self.messages.get(user_id)
 
 
     def clear_user_messages(self, user_id: int):
         """Очищает список сообщений пользователя"""
-        if user_id in self.user_messages:
-            self.user_messages[user_id] = []
+        self.messages.clear(user_id)
+
+
+    def record_answer(self, event: AnswerEvent):
+        """Ставит ответ в журнал; запись в БД идет в фоне"""
+        self.answers.record(event)
+
+
+    def get_question_stats(self, question_id: int) -> Optional[QuestionStats]:
+        """Сводка ответов на вопрос: попытки, доля правильных, медиана времени"""
+        return self.answers.question_stats(question_id)
+
+
+    def get_weakest_questions(self, limit: int = 20, min_attempts: int = 30) -> List[QuestionStats]:
+        """Вопросы с самой низкой долей правильных ответов"""
+        return self.answers.weakest_questions(limit, min_attempts)
+
+
+    def close(self):
+        """Дописывает очереди записи и закрывает соединения с БД"""
+        # Ошибка одной очереди не мешает дописать остальные и закрыть соединения
+        try:
+            self.results.close()
+        finally:
+            try:
+                self.messages.close()
+            finally:
+                try:
+                    self.answers.close()
+                finally:
+                    self.db.close()
 
 
-# Глобальный экземпляр хранилища
-storage = Storage()
+# Глобальный экземпляр хранилища (DB_PATH - другой файл БД, например для нагрузочных тестов)
+storage = Storage(os.environ.get('DB_PATH', 'data/qa_bot.db'))
@@ -0,0 +1,238 @@
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Hashable, List, Optional, Sequence, Tuple
+
+from utils.instrumentation import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+# Ошибки, которые вызывает само событие: повтор не поможет, событие откладывается в dead_letters.
+# Остальные (sqlite3.OperationalError - БД занята, диск заполнен и т.п.) считаются временными
+DATA_ERRORS = (
+    sqlite3.IntegrityError, sqlite3.ProgrammingError, sqlite3.InterfaceError, sqlite3.DataError,
+    TypeError, ValueError,
+)
+
+
+class DeadLetters:
+    """
+    Таблица dead_letters: события очередей записи, которые не удалось записать из-за их данных.
+    Хранится repr события для просмотра и pickle (если получился) для повторной записи вручную
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def add(self, queue: str, item: Any, error: Exception):
+        try:
+            data = pickle.dumps(item, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            data = None
+        with self.db.write() as conn:
+            conn.execute(
+                'INSERT INTO dead_letters (queue, failed_at, error, item, data) VALUES (?, ?, ?, ?, ?)',
+                (queue, int(time.time()), f"{type(error).__name__}: {error}", repr(item)[:1000], data)
+            )
+
+    def list(self, queue: Optional[str] = None, limit: int = 100) -> List[Tuple[str, int, str, str]]:
+        """Последние отложенные события: (queue, failed_at, error, item)"""
+        with self.db.read() as conn:
+            if queue is None:
+                rows = conn.execute(
+                    'SELECT queue, failed_at, error, item FROM dead_letters ORDER BY id DESC LIMIT ?', (limit,)
+                )
+            else:
+                rows = conn.execute(
+                    'SELECT queue, failed_at, error, item FROM dead_letters WHERE queue = ? ORDER BY id DESC LIMIT ?',
+                    (queue, limit)
+                )
+            return rows.fetchall()
+
+
+class WriteBehindQueue:
+    """
+    Очередь отложенной записи с групповым коммитом.
+    События копятся в памяти и сбрасываются одной транзакцией
+    каждые flush_interval секунд или по достижении max_batch событий.
+    Временная ошибка (OperationalError) повторяется с растущей до max_backoff паузой, события не теряются.
+    Если пачка не записалась из-за данных (DATA_ERRORS), она пишется по одному событию:
+    события, которые не записываются и так, уходят в dead_letters, остальная очередь продолжает писаться
+    """
+
+    def __init__(self, flush: Callable[[Sequence[Any]], None], key: Callable[[Any], Hashable],
+                 flush_interval: float = 0.05, max_batch: int = 500, name: str = 'write-behind',
+                 dead_letters: Optional[DeadLetters] = None, max_backoff: float = 5.0, max_failures: int = 5):
+        self._flush = flush
+        self._key = key
+        self.name = name
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        # Без таблицы незаписываемые события только попадают в лог
+        self.dead_letters = dead_letters
+        self.max_backoff = max_backoff
+        # Сколько временных ошибок подряд выдерживает синхронный flush, прежде чем отдать ошибку
+        self.max_failures = max_failures
+        self._failures = 0
+        self._pending: List[Any] = []
+        self._counts: Counter = Counter()
+        self._first_put_at = 0.0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # Держится на время записи пачки: читатель не увидит событие одновременно в БД и в очереди
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, item: Any):
+        """Ставит событие в очередь, не дожидаясь записи"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("очередь записи уже закрыта")
+            if not self._pending:
+                self._first_put_at = time.monotonic()
+            self._pending.append(item)
+            self._counts[self._key(item)] += 1
+            if len(self._pending) == 1 or len(self._pending) >= self.max_batch:
+                self._wakeup.notify()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def read(self, key: Hashable, read_fn: Callable[[List[Any]], Any]) -> Any:
+        """
+        Вызывает read_fn со списком еще не записанных событий по ключу.
+        Если таких событий нет, чтение не ждет записи
+        """
+        with self._lock:
+            has_pending = self._counts.get(key, 0) > 0
+        if not has_pending:
+            return read_fn([])
+
+        with self._flush_lock:
+            with self._lock:
+                items = [item for item in self._pending if self._key(item) == key]
+            return read_fn(items)
+
+    def flush(self):
+        """
+        Синхронно записывает все накопленные события.
+        Плохие события откладываются так же, как в фоне; после max_failures временных ошибок
+        подряд ошибка отдается вызывающему, события остаются в очереди
+        """
+        failures = 0
+        while True:
+            try:
+                if not self._write_batch():
+                    return
+                failures = 0
+            except Exception:
+                failures += 1
+                if failures >= self.max_failures:
+                    raise
+                time.sleep(self._backoff(failures))
+
+    def close(self):
+        """Останавливает фоновый поток и записывает остаток очереди"""
+        with self._lock:
+            self._closed = True
+            self._wakeup.notify()
+        self._thread.join()
+        self.flush()
+
+    def _backoff(self, failures: int) -> float:
+        return min(self.flush_interval * 2 ** failures, self.max_backoff)
+
+    def _write_batch(self) -> bool:
+        """Пишет головную пачку; если в ней плохие данные - по одному событию. False, если очередь пуста"""
+        try:
+            return self._write_next()
+        except DATA_ERRORS as e:
+            logger.warning("⚠️ %s: пачка не записана (%s), пишем по одному событию", self.name, e)
+            self._isolate_failed_batch()
+            return True
+
+    def _write_next(self) -> bool:
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending[:self.max_batch]
+            if not batch:
+                return False
+
+            self._flush(batch)
+            self._remove(batch)
+        return True
+
+    def _remove(self, batch: List[Any]):
+        """Убирает записанную (или отложенную в сторону) пачку из головы очереди"""
+        with self._lock:
+            # Пока шла запись, в очередь могли добавиться новые события - они остаются
+            del self._pending[:len(batch)]
+            for item in batch:
+                key = self._key(item)
+                self._counts[key] -= 1
+                if self._counts[key] <= 0:
+                    del self._counts[key]
+
+    def _isolate_failed_batch(self):
+        """
+        Пишет головную пачку по одному событию; незаписываемые события откладывает в dead_letters.
+        Каждое событие убирается из очереди сразу после записи: при временной ошибке
+        посередине записанные события не будут записаны повторно
+        """
+        with self._flush_lock:
+            with self._lock:
+                batch = self._pending[:self.max_batch]
+            for item in batch:
+                try:
+                    self._flush([item])
+                except DATA_ERRORS as e:
+                    self._dead_letter(item, e)
+                self._remove([item])
+
+    def _dead_letter(self, item: Any, error: Exception):
+        logger.error("❌ %s: событие не записано и отложено: %r (%s)", self.name, item, error)
+        metrics.increment("write_behind.dead_letters")
+        if self.dead_letters is not None:
+            # Если не записалось и сюда, событие остается в очереди до следующей попытки
+            self.dead_letters.add(self.name, item, error)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._closed:
+                    self._wakeup.wait()
+                if self._closed:
+                    return
+                deadline = self._first_put_at + self.flush_interval
+                while len(self._pending) < self.max_batch and not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(remaining)
+                if self._closed:
+                    return
+
+            try:
+                self._write_batch()
+                self._failures = 0
+            except Exception:
+                # Временная ошибка: события остаются в очереди и будут записаны следующей попыткой
+                self._failures += 1
+                logger.exception("❌ ОШИБКА групповой записи (%s), попытка %s", self.name, self._failures)
+                metrics.increment("write_behind.retries")
+                deadline = time.monotonic() + self._backoff(self._failures)
+                with self._lock:
+                    # Пауза прерывается закрытием очереди: остаток допишет close
+                    while not self._closed:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._wakeup.wait(remaining)
@@ -0,0 +1,29 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Глобальный storage создается при импорте data.storage: до импорта модулей бота
+# направляем его во временную БД, чтобы тесты не трогали data/qa_bot.db
+os.environ.setdefault('DB_PATH', os.path.join(tempfile.mkdtemp(prefix='qa_bot_tests_'), 'qa_bot.db'))
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_storage(tmp_path):
+    """Storage во временном каталоге; все созданные хранилища закрываются после теста"""
+    from data.storage import Storage
+
+    created = []
+
+    def make(name: str = 'qa_bot.db', **kwargs):
+        storage = Storage(str(tmp_path / 'data' / name), **kwargs)
+        created.append(storage)
+        return storage
+
+    yield make
+    for storage in created:
+        storage.close()
@@ -0,0 +1,89 @@
+"""Кодек callback_data (a1:/t1:) и отбрасывание кнопок из прошлых тестов и старых списков тем"""
+import asyncio
+
+import pytest
+
+from benchmarks.bench_handlers import FakeBot, FakeContext, FakeMessage, FakeQuery, FakeUser
+from utils.callback_data import (
+    AnswerPayload, TopicPayload, decode_answer, decode_topic, encode_answer, encode_topic, topics_tag
+)
+
+
+@pytest.mark.parametrize('nonce, question_index, option', [
+    (0, 0, 0),
+    (123456, 17, 3),
+    (2 ** 24 - 1, 9999, 9),
+])
+def test_answer_round_trip(nonce, question_index, option):
+    data = encode_answer(nonce, question_index, option)
+    prefix, _, fields = data.partition(':')
+
+    assert prefix == 'a1'
+    assert len(data.encode()) <= 64
+    assert decode_answer(fields) == AnswerPayload(nonce, question_index, option)
+
+
+@pytest.mark.parametrize('fields', ['', '1:2', '1:2:3:4', 'x!:1:1', '1:-1:0', '1::0'])
+def test_answer_malformed(fields):
+    assert decode_answer(fields) is None
+
+
+def test_topic_round_trip():
+    tag = topics_tag(('api', 'sql', 'web'))
+    data = encode_topic(tag, 2)
+    prefix, _, fields = data.partition(':')
+
+    assert prefix == 't1'
+    assert decode_topic(fields) == TopicPayload(tag, 2)
+
+
+@pytest.mark.parametrize('fields', ['', '5', 'abc:1:2', 'abc:-1', 'abc:?'])
+def test_topic_malformed(fields):
+    assert decode_topic(fields) is None
+
+
+def test_topics_tag_depends_on_list():
+    assert topics_tag(('api', 'sql')) == topics_tag(('api', 'sql'))
+    assert topics_tag(('api', 'sql')) != topics_tag(('api', 'sql', 'web'))
+    assert topics_tag(('api', 'sql')) < 2 ** 24
+
+
+def _press(data: str, user_data=None):
+    bot = FakeBot()
+    user = FakeUser(501)
+    context = FakeContext(bot)
+    context.user_data.update(user_data or {})
+    message = FakeMessage(bot, user.id, 1, 'before', from_user=user)
+    return context, message, FakeQuery(message, user, data)
+
+
+def test_stale_nonce_rejected():
+    from core.handlers.callbacks import process_answer
+    from core.services.quiz import QuizService
+    from data.question_bank import question_bank
+
+    context, message, query = _press('')
+    QuizService.start_quiz(context, question_bank.snapshot, level='junior')
+    session = dict(context.user_data)
+    stale = AnswerPayload((session['nonce'] + 1) % 2 ** 24, 0, 0)
+
+    asyncio.run(process_answer(query, context, stale))
+
+    assert context.user_data == session
+    assert message.text == 'before'
+
+
+def test_stale_topic_tag_shows_current_list():
+    from core.handlers.callbacks import start_topic_quiz
+    from data.question_bank import question_bank
+
+    snapshot = question_bank.snapshot
+    if not snapshot.topics:
+        pytest.skip("в банке нет тем")
+    context, message, query = _press('')
+    stale = TopicPayload((topics_tag(snapshot.topics) + 1) % 2 ** 24, 0)
+
+    asyncio.run(start_topic_quiz(query, context, stale))
+
+    assert 'question_ids' not in context.user_data
+    assert 'Список тем обновился' in message.text
@@ -0,0 +1,64 @@
+"""MessageRing: кольцевой буфер id сообщений"""
+from data.message_tracker import MessageRing
+
+
+def fill(ring, ids, capacity, tracked_at=100):
+    return [ring.append(message_id, tracked_at, capacity) for message_id in ids]
+
+
+def test_grows_to_capacity():
+    ring = MessageRing()
+    assert fill(ring, [1, 2, 3], capacity=3) == [None, None, None]
+    assert ring.to_list() == [1, 2, 3]
+    assert ring.last() == 3
+
+
+def test_wraparound_evicts_oldest():
+    ring = MessageRing()
+    evicted = fill(ring, [1, 2, 3, 4, 5, 6, 7], capacity=3)
+
+    assert evicted == [None, None, None, 1, 2, 3, 4]
+    assert ring.to_list() == [5, 6, 7]
+    assert len(ring) == 3
+    assert ring.last() == 7
+    assert 4 not in ring
+    assert 5 in ring
+
+
+def test_prune_drops_old_messages():
+    ring = MessageRing()
+    ring.append(1, 10, 4)
+    ring.append(2, 20, 4)
+    ring.append(3, 30, 4)
+
+    ring.prune(20)
+
+    assert ring.to_list() == [2, 3]
+    # Вытесненный prune id больше не считается лежащим в буфере, хотя остался в массиве
+    assert 1 not in ring
+
+
+def test_prune_everything_releases_arrays():
+    ring = MessageRing()
+    fill(ring, [1, 2], capacity=4, tracked_at=10)
+
+    ring.prune(11)
+
+    assert len(ring) == 0
+    assert ring.last() is None
+    assert len(ring.ids) == 0 and ring.head == 0
+
+
+def test_append_after_prune_with_offset_head():
+    ring = MessageRing()
+    ring.append(1, 10, 4)
+    ring.append(2, 20, 4)
+    ring.prune(15)
+
+    # Свободная ячейка в начале массива занимается по кругу, затем кольцо разворачивается для роста
+    assert ring.append(3, 30, 4) is None
+    assert ring.append(4, 40, 4) is None
+    assert ring.to_list() == [2, 3, 4]
+    assert ring.append(5, 50, 4) is None
+    assert ring.append(6, 60, 4) == 2
+    assert ring.to_list() == [3, 4, 5, 6]
@@ -0,0 +1,118 @@
+"""SQLitePersistence: ленивая загрузка user_data и пропуск неизменившихся данных"""
+import asyncio
+
+import pytest
+
+from data.persistence import SQLitePersistence
+
+
+@pytest.fixture
+def db(make_storage):
+    return make_storage().db
+
+
+@pytest.fixture
+def persistences(db):
+    created = []
+
+    def make(**kwargs):
+        kwargs.setdefault('flush_interval', 60)
+        persistence = SQLitePersistence(db, **kwargs)
+        created.append(persistence)
+        return persistence
+
+    yield make
+    for persistence in created:
+        persistence.close()
+
+
+def count_reads(persistence):
+    reads = []
+    original = persistence._read_user_data
+
+    def read(user_id):
+        reads.append(user_id)
+        return original(user_id)
+
+    persistence._read_user_data = read
+    return reads
+
+
+def test_unchanged_data_is_not_written_again(persistences):
+    persistence = persistences()
+
+    async def scenario():
+        await persistence.update_user_data(1, {'level': 'junior', 'score': 1})
+        await persistence.update_user_data(1, {'level': 'junior', 'score': 1})
+        assert len(persistence._writes) == 1
+
+        await persistence.update_user_data(1, {'level': 'junior', 'score': 2})
+        assert len(persistence._writes) == 2
+
+    asyncio.run(scenario())
+
+
+def test_user_data_loaded_lazily_once(persistences):
+    writer = persistences()
+    asyncio.run(writer.update_user_data(7, {'level': 'middle', 'score': 3}))
+    writer._writes.flush()
+
+    # "Перезапуск": новый экземпляр ничего не загружает при старте
+    restored = persistences()
+    reads = count_reads(restored)
+
+    async def scenario():
+        assert await restored.get_user_data() == {}
+        assert reads == []
+
+        user_data = {}
+        await restored.refresh_user_data(7, user_data)
+        assert user_data == {'level': 'middle', 'score': 3}
+
+        # Данные уже в памяти: повторно БД не читается, даже если user_data опустели
+        await restored.refresh_user_data(7, user_data)
+        await restored.refresh_user_data(7, {})
+        assert reads == [7]
+
+    asyncio.run(scenario())
+
+
+def test_dropped_user_data_not_restored(persistences):
+    writer = persistences()
+
+    async def write():
+        await writer.update_user_data(8, {'score': 5})
+        await writer.drop_user_data(8)
+
+    asyncio.run(write())
+    writer._writes.flush()
+
+    user_data = {}
+    asyncio.run(persistences().refresh_user_data(8, user_data))
+    assert user_data == {}
+
+
+def test_refresh_reads_pending_write(persistences):
+    persistence = persistences()
+
+    async def scenario():
+        await persistence.update_user_data(9, {'score': 1})
+        # Запись еще в очереди, отпечаток вытеснен: чтение берет версию из очереди, а не из БД
+        persistence._digests.clear()
+        user_data = {}
+        await persistence.refresh_user_data(9, user_data)
+        return user_data
+
+    assert asyncio.run(scenario()) == {'score': 1}
+
+
+def test_unknown_user_is_not_read_twice(persistences):
+    persistence = persistences()
+    reads = count_reads(persistence)
+
+    async def scenario():
+        await persistence.refresh_user_data(42, {})
+        await persistence.refresh_user_data(42, {})
+
+    asyncio.run(scenario())
+    assert reads == [42]
@@ -0,0 +1,35 @@
+"""Память записей вопросов: замеры benchmarks/bench_question_records.py как проверки"""
+import json
+
+import pytest
+
+from benchmarks.bench_question_bank import make_bank
+from benchmarks.bench_question_records import answer_cost, parse_as_dicts, retained_bytes, shuffle_dict_options
+from core.services.quiz import QuizService
+from data.question_bank import parse_questions
+
+# Варианты ответа кэшируются по (вопрос, seed): на ответ не должно выделяться больше нескольких объектов
+MAX_PEAK_PER_ANSWER = 512
+
+
+@pytest.fixture(scope='module')
+def raw_bank():
+    return json.dumps(make_bank(2000), ensure_ascii=False).encode('utf-8')
+
+
+def test_slotted_questions_smaller_than_dicts(raw_bank):
+    dict_bytes, _ = retained_bytes(lambda: parse_as_dicts(raw_bank))
+    slots_bytes, _ = retained_bytes(lambda: parse_questions(raw_bank))
+
+    assert slots_bytes < dict_bytes
+
+
+def test_answer_peak_memory_bounded(raw_bank):
+    questions = parse_questions(raw_bank)
+    dict_questions = parse_as_dicts(raw_bank)
+
+    slots_cost = answer_cost(questions, QuizService.shuffle_options, answers=2000)
+    dict_cost = answer_cost(dict_questions, shuffle_dict_options, answers=2000)
+
+    assert slots_cost['peak_b'] < MAX_PEAK_PER_ANSWER
+    assert slots_cost['peak_b'] < dict_cost['peak_b']
@@ -0,0 +1,68 @@
+"""CallbackRouter: точные callback_data и данные с префиксом"""
+import asyncio
+
+import pytest
+
+from benchmarks.bench_handlers import FakeBot, FakeContext, FakeMessage, FakeQuery, FakeUser
+from core.router import CallbackRouter
+from utils.callback_data import decode_answer
+
+
+@pytest.fixture
+def router():
+    router = CallbackRouter()
+    calls = []
+
+    @router.route("main_menu", "reset_stats_no")
+    async def main_menu(query, context):
+        calls.append(('main_menu', query.data))
+
+    @router.route_prefix("a1", decode_answer, cancels_transitions=False)
+    async def answer(query, context, payload):
+        calls.append(('answer', payload))
+
+    router.calls = calls
+    return router
+
+
+def dispatch(router, data):
+    bot = FakeBot()
+    user = FakeUser(1)
+    query = FakeQuery(FakeMessage(bot, user.id, 1, from_user=user), user, data)
+    return asyncio.run(router.dispatch(query, FakeContext(bot)))
+
+
+def test_exact_dispatch(router):
+    assert dispatch(router, "main_menu")
+    assert dispatch(router, "reset_stats_no")
+    assert router.calls == [('main_menu', 'main_menu'), ('main_menu', 'reset_stats_no')]
+
+
+def test_prefix_dispatch_decodes_payload(router):
+    assert dispatch(router, "a1:z:1:2")
+    assert router.calls == [('answer', decode_answer("z:1:2"))]
+
+
+@pytest.mark.parametrize('data', ["", "unknown", "b1:1:2:3", "main_menu:1", "a1"])
+def test_unknown_data_not_dispatched(router, data):
+    assert not dispatch(router, data)
+    assert router.calls == []
+
+
+def test_malformed_payload_not_dispatched(router):
+    assert not dispatch(router, "a1:1:2")
+    assert router.calls == []
+
+
+def test_duplicate_registration_rejected(router):
+    with pytest.raises(ValueError):
+        router.route("main_menu")(lambda query, context: None)
+    with pytest.raises(ValueError):
+        router.route_prefix("a1", decode_answer)(lambda query, context, payload: None)
+
+
+def test_cancels_transitions(router):
+    assert router.cancels_transitions("main_menu")
+    assert not router.cancels_transitions("a1:z:1:2")
+    assert not router.cancels_transitions("unknown")
+    assert not router.cancels_transitions(None)
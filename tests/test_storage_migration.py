@@ -0,0 +1,104 @@
+"""Перенос статистики из колонок user_stats в user_level_stats (PRAGMA user_version 0 -> 1)"""
+import sqlite3
+
+import pytest
+
+OLD_SCHEMA = '''
+    CREATE TABLE users (user_id INTEGER PRIMARY KEY, username TEXT, first_name TEXT, created_at TEXT);
+    CREATE TABLE user_stats (
+        user_id INTEGER PRIMARY KEY,
+        total_tests INTEGER DEFAULT 0,
+        best_score INTEGER DEFAULT 0,
+        total_correct_answers INTEGER DEFAULT 0,
+        total_questions_answered INTEGER DEFAULT 0,
+        last_test_date TEXT,
+        junior_tests INTEGER DEFAULT 0,
+        junior_best_score INTEGER DEFAULT 0,
+        junior_total_correct INTEGER DEFAULT 0,
+        junior_total_questions INTEGER DEFAULT 0,
+        middle_tests INTEGER DEFAULT 0,
+        middle_best_score INTEGER DEFAULT 0,
+        middle_total_correct INTEGER DEFAULT 0,
+        middle_total_questions INTEGER DEFAULT 0
+    );
+    CREATE TABLE test_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, score INTEGER, total_questions INTEGER, test_date TEXT
+    );
+    CREATE TABLE achievements (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, achievement_name TEXT, earned_date TEXT
+    );
+'''
+
+JUNIOR_ONLY, MIDDLE_ONLY, BOTH = 1, 2, 3
+
+# user_id, total_tests, best_score, total_correct, total_questions,
+# junior: tests, best, last correct, last total; middle: tests, best, last correct, last total
+OLD_STATS = [
+    (JUNIOR_ONLY, 2, 80, 150, 200, 2, 80, 70, 100, 0, 0, 0, 0),
+    (MIDDLE_ONLY, 3, 5, 12, 15, 0, 0, 0, 0, 3, 5, 4, 5),
+    (BOTH, 2, 70, 130, 200, 1, 60, 60, 100, 1, 70, 70, 100),
+]
+
+
+@pytest.fixture
+def migrated(tmp_path, make_storage):
+    (tmp_path / 'data').mkdir()
+    conn = sqlite3.connect(tmp_path / 'data' / 'qa_bot.db')
+    conn.executescript(OLD_SCHEMA)
+    conn.executemany(f'''
+        INSERT INTO user_stats (
+            user_id, total_tests, best_score, total_correct_answers, total_questions_answered,
+            junior_tests, junior_best_score, junior_total_correct, junior_total_questions,
+            middle_tests, middle_best_score, middle_total_correct, middle_total_questions
+        ) VALUES ({",".join("?" * 13)})
+    ''', OLD_STATS)
+    conn.commit()
+    conn.close()
+
+    storage = make_storage()
+    with storage.db.read() as conn:
+        rows = conn.execute('''
+            SELECT user_id, level, tests, best_score, last_correct, last_total, total_correct, total_questions
+            FROM user_level_stats
+        ''').fetchall()
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+    return version, {(row[0], row[1]): row[2:] for row in rows}
+
+
+def test_schema_version_bumped(migrated):
+    version, _ = migrated
+    assert version == 1
+
+
+def test_junior_only_user(migrated):
+    _, levels = migrated
+    assert levels[(JUNIOR_ONLY, 'junior')] == (2, 80, 70, 100, 150, 200)
+    assert (JUNIOR_ONLY, 'middle') not in levels
+
+
+def test_middle_only_user(migrated):
+    _, levels = migrated
+    # Все суммы относятся к единственному уровню
+    assert levels[(MIDDLE_ONLY, 'middle')] == (3, 5, 4, 5, 12, 15)
+    assert (MIDDLE_ONLY, 'junior') not in levels
+
+
+def test_both_levels_user(migrated):
+    _, levels = migrated
+    junior = levels[(BOTH, 'junior')]
+    middle = levels[(BOTH, 'middle')]
+
+    assert junior[:4] == (1, 60, 60, 100)
+    assert middle[:4] == (1, 70, 70, 100)
+    # Middle получает результат последнего теста, остаток - Junior; общие суммы сохраняются
+    assert middle[4:] == (70, 100)
+    assert junior[4] + middle[4] == 130
+    assert junior[5] + middle[5] == 200
+
+
+def test_migration_runs_once(tmp_path, migrated, make_storage):
+    _, before = migrated
+    storage = make_storage()
+    with storage.db.read() as conn:
+        count = conn.execute('SELECT COUNT(*) FROM user_level_stats').fetchone()[0]
+    assert count == len(before)
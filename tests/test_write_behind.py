@@ -0,0 +1,126 @@
+"""WriteBehindQueue: чтение с учетом очереди, повтор временных ошибок, отложенные события"""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from data.write_behind import WriteBehindQueue
+
+
+class Sink:
+    """Функция записи пачки: запоминает записанное, может падать по сценарию"""
+
+    def __init__(self, fail_times: int = 0, bad=()):
+        self.written = []
+        self.batches = 0
+        self.fail_times = fail_times
+        self.bad = set(bad)
+        self.lock = threading.Lock()
+
+    def __call__(self, batch):
+        with self.lock:
+            self.batches += 1
+            if self.fail_times:
+                self.fail_times -= 1
+                raise sqlite3.OperationalError("database is locked")
+            if self.bad.intersection(item[1] for item in batch):
+                raise sqlite3.IntegrityError("UNIQUE constraint failed")
+            self.written.extend(batch)
+
+
+@pytest.fixture
+def queues():
+    created = []
+
+    def make(sink, **kwargs):
+        # Большой flush_interval: фоновый поток не пишет сам, тест вызывает flush
+        kwargs.setdefault('flush_interval', 60)
+        kwargs.setdefault('max_backoff', 0.01)
+        queue = WriteBehindQueue(sink, key=lambda item: item[0], **kwargs)
+        created.append(queue)
+        return queue
+
+    yield make
+    for queue in created:
+        queue.close()
+
+
+def test_read_sees_pending_items_by_key(queues):
+    sink = Sink()
+    queue = queues(sink)
+    queue.put((1, 'a'))
+    queue.put((2, 'b'))
+    queue.put((1, 'c'))
+
+    assert queue.read(1, list) == [(1, 'a'), (1, 'c')]
+    assert queue.read(3, list) == []
+
+    queue.flush()
+    assert queue.read(1, list) == []
+    assert sink.written == [(1, 'a'), (2, 'b'), (1, 'c')]
+
+
+def test_transient_error_is_retried(queues):
+    sink = Sink(fail_times=2)
+    queue = queues(sink, max_failures=5)
+    for i in range(10):
+        queue.put((i, i))
+
+    queue.flush()
+
+    assert sink.written == [(i, i) for i in range(10)]
+    assert len(queue) == 0
+
+
+def test_persistent_transient_error_keeps_items(queues):
+    sink = Sink(fail_times=100)
+    queue = queues(sink, max_failures=3)
+    queue.put((1, 'a'))
+
+    with pytest.raises(sqlite3.OperationalError):
+        queue.flush()
+
+    # Временная ошибка не откладывает события: они ждут следующей попытки
+    assert len(queue) == 1
+    assert sink.written == []
+    sink.fail_times = 0
+
+
+def test_bad_item_goes_to_dead_letters(queues, make_storage):
+    storage = make_storage()
+    sink = Sink(bad={'poison'})
+    queue = queues(sink, name='test-writer', dead_letters=storage.dead_letters)
+    for item in [(1, 'a'), (2, 'poison'), (3, 'b')]:
+        queue.put(item)
+
+    queue.flush()
+
+    assert sink.written == [(1, 'a'), (3, 'b')]
+    assert len(queue) == 0
+    letters = storage.dead_letters.list('test-writer')
+    assert len(letters) == 1
+    name, _, error, item = letters[0]
+    assert name == 'test-writer'
+    assert error.startswith('IntegrityError')
+    assert 'poison' in item
+
+
+def test_background_writer_flushes_by_interval(queues):
+    sink = Sink()
+    queue = queues(sink, flush_interval=0.01)
+    queue.put((1, 'a'))
+
+    deadline = time.monotonic() + 2
+    while not sink.written and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert sink.written == [(1, 'a')]
+
+
+def test_put_after_close_fails(queues):
+    queue = queues(Sink())
+    queue.close()
+
+    with pytest.raises(RuntimeError):
+        queue.put((1, 'a'))
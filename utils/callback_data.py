@@ -0,0 +1,90 @@
+import zlib
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+
+# Разделитель префикса и полей в callback_data
+SEPARATOR = ':'
+
+# Префикс кнопок ответа, цифра - версия формата
+ANSWER_PREFIX = 'a1'
+
+# Префикс кнопок выбора темы
+TOPIC_PREFIX = 't1'
+
+
+class AnswerPayload(NamedTuple):
+    """Данные кнопки ответа"""
+    nonce: int
+    question_index: int
+    option: int
+
+
+class TopicPayload(NamedTuple):
+    """Данные кнопки темы"""
+    topics_tag: int
+    topic_index: int
+
+
+def _base36(value: int) -> str:
+    digits = '0123456789abcdefghijklmnopqrstuvwxyz'
+    if value == 0:
+        return '0'
+    result = ''
+    while value:
+        value, rest = divmod(value, 36)
+        result = digits[rest] + result
+    return result
+
+
+def encode_answer(nonce: int, question_index: int, option: int) -> str:
+    """
+    Кодирует кнопку ответа: a1:<nonce>:<номер вопроса>:<вариант> в base36.
+    Например, a1:5yc1s:1b:2 - около 12 байт вместо лимита в 64
+    """
+    return SEPARATOR.join((ANSWER_PREFIX, _base36(nonce), _base36(question_index), _base36(option)))
+
+
+def decode_answer(fields: str) -> Optional[AnswerPayload]:
+    """Разбирает поля кнопки ответа (без префикса). None - данные повреждены"""
+    parts = fields.split(SEPARATOR)
+    if len(parts) != 3:
+        return None
+    try:
+        nonce, question_index, option = (int(part, 36) for part in parts)
+    except ValueError:
+        return None
+    if nonce < 0 or question_index < 0 or option < 0:
+        return None
+    return AnswerPayload(nonce, question_index, option)
+
+
+@lru_cache(maxsize=8)
+def topics_tag(topics: Tuple[str, ...]) -> int:
+    """
+    Отпечаток списка тем (24 бита). Кнопка темы хранит номер в списке, и после перезагрузки банка
+    тот же номер может указывать на другую тему: по отпечатку такие кнопки отбрасываются
+    """
+    return zlib.crc32('\n'.join(topics).encode('utf-8')) & 0xFFFFFF
+
+
+def encode_topic(tag: int, topic_index: int) -> str:
+    """
+    Кодирует кнопку темы: t1:<отпечаток списка тем>:<номер темы в snapshot.topics> в base36.
+    Название темы в callback_data не помещается в лимит 64 байт на любом языке
+    """
+    return SEPARATOR.join((TOPIC_PREFIX, _base36(tag), _base36(topic_index)))
+
+
+def decode_topic(fields: str) -> Optional[TopicPayload]:
+    """Разбирает поля кнопки темы (без префикса). None - данные повреждены"""
+    parts = fields.split(SEPARATOR)
+    if len(parts) != 2:
+        return None
+    try:
+        tag, topic_index = (int(part, 36) for part in parts)
+    except ValueError:
+        return None
+    if tag < 0 or topic_index < 0:
+        return None
+    return TopicPayload(tag, topic_index)
@@ -0,0 +1,147 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict
+
+
+logger = logging.getLogger("qa_bot.metrics")
+
+
+class JsonFormatter(logging.Formatter):
+    """Форматирует записи лога как одну JSON-строку"""
+
+    # Стандартные атрибуты LogRecord, которые не нужно дублировать в JSON
+    _RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in self._RESERVED:
+                payload[key] = value
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging():
+    """
+    Настраивает логирование из переменных окружения:
+    LOG_LEVEL (по умолчанию INFO) и LOG_FORMAT (text или json)
+    """
+    level = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    handler = logging.StreamHandler()
+    if os.environ.get('LOG_FORMAT', 'text').lower() == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+    # Библиотеки пишут каждый HTTP-запрос на уровне INFO
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+
+class Metrics:
+    """Счетчики и длительности операций в памяти процесса"""
+
+    def __init__(self):
+        self._counters: Dict[str, int] = {}
+        self._gauges: Dict[str, float] = {}
+        self._timings: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: int = 1):
+        """Увеличивает счетчик"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def gauge(self, name: str, value: float):
+        """Запоминает текущее значение и максимум за все время в <name>.max"""
+        with self._lock:
+            self._gauges[name] = value
+            max_name = f"{name}.max"
+            if value > self._gauges.get(max_name, value - 1):
+                self._gauges[max_name] = value
+
+    def observe(self, name: str, duration_ms: float):
+        """Записывает длительность операции: count, total, max"""
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                self._timings[name] = [1, duration_ms, duration_ms]
+            else:
+                timing[0] += 1
+                timing[1] += duration_ms
+                if duration_ms > timing[2]:
+                    timing[2] = duration_ms
+
+    @contextmanager
+    def timer(self, name: str):
+        """Замеряет длительность блока и пишет ее в <name>.duration_ms"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            self.observe(f"{name}.duration_ms", duration_ms)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s took %.2f ms", name, duration_ms,
+                             extra={'metric': f"{name}.duration_ms", 'value': round(duration_ms, 3)})
+
+    def timed(self, name: str):
+        """Декоратор для обычных и асинхронных функций"""
+        def decorator(func):
+            if inspect.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.timer(name):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущие значения всех метрик"""
+        with self._lock:
+            result: Dict[str, Any] = dict(self._counters)
+            result.update(self._gauges)
+            for name, (count, total, maximum) in self._timings.items():
+                result[name] = {
+                    'count': count,
+                    'avg': round(total / count, 3),
+                    'max': round(maximum, 3),
+                }
+            return result
+
+    def reset(self):
+        """Обнуляет все метрики"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+    def log_snapshot(self):
+        """Пишет сводку метрик в лог"""
+        snapshot = self.snapshot()
+        if snapshot:
+            logger.info("metrics snapshot: %s", json.dumps(snapshot, ensure_ascii=False), extra={'metrics': snapshot})
+
+
+# Глобальный реестр метрик
+metrics = Metrics()
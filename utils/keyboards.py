@@ -1,37 +1,50 @@
+from functools import lru_cache
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
-import random
+from utils.callback_data import encode_answer, encode_topic, topics_tag
 
 
-def create_quiz_keyboard(question, current_index, shuffled_options=None):
+# Кнопки неизменяемы, поэтому общие экземпляры можно вставлять в любые клавиатуры
+CANCEL_ROW = (InlineKeyboardButton("🚫 Отмена", callback_data="cancel_test"),)
+
+
+@lru_cache(maxsize=16)
+def quiz_keyboard_layout(option_count):
+    """
+    Раскладка кнопок ответов для заданного числа вариантов:
+    ряды по 2 кнопки, в каждой (номер варианта, подпись)
+    """
+    return tuple(
+        tuple((i, f"{i + 1}") for i in range(start, min(start + 2, option_count)))
+        for start in range(0, option_count, 2)
+    )
+
+
+def create_quiz_keyboard(question, current_index, shuffled_options=None, nonce=0):
     """
-    Создает клавиатуру для вопроса теста
+    Создает клавиатуру для вопроса теста.
+    nonce - метка сессии: кнопки прошлых тестов отбрасываются без поиска вопроса
     """
     # Используем перемешанные варианты если они есть, иначе оригинальные
-    options = shuffled_options if shuffled_options else question['options']
-
-    # Создаем inline-кнопки с группировкой по 2 в ряд
-    keyboard = []
-    for i in range(0, len(options), 2):
-        row = []
-        for j in range(2):
-            if i + j < len(options):
-                callback_data = f"answer_{current_index}_{i + j}"
-                row.append(InlineKeyboardButton(
-                    f"{i + j + 1}",
-                    callback_data=callback_data
-                ))
-        if row:
-            keyboard.append(row)
+    options = shuffled_options if shuffled_options else question.options
+
+    # Раскладка общая для всех вопросов с тем же числом вариантов, меняется только callback_data
+    keyboard = [
+        [InlineKeyboardButton(label, callback_data=encode_answer(nonce, current_index, option))
+         for option, label in row]
+        for row in quiz_keyboard_layout(len(options))
+    ]
 
     # Добавляем кнопку отмены в отдельный ряд
-    keyboard.append([InlineKeyboardButton("🚫 Отмена", callback_data="cancel_test")])
+    keyboard.append(CANCEL_ROW)
 
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=None)
 def create_main_menu_keyboard():
     """
-    Создает клавиатуру главного меню
+    Создает клавиатуру главного меню.
+    Статические клавиатуры создаются один раз и переиспользуются
     """
     keyboard = [
         [InlineKeyboardButton("🎯 Начать тест", callback_data="start_test_from_menu")],
@@ -41,6 +54,7 @@ def create_main_menu_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=None)
 def create_confirmation_keyboard():
     """
     Создает клавиатуру для подтверждения опасных действий
@@ -52,6 +66,7 @@ def create_confirmation_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=None)
 def create_restart_keyboard():
     """
     Создает клавиатуру после завершения теста
@@ -63,6 +78,7 @@ def create_restart_keyboard():
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=None)
 def create_level_selection_keyboard():
     """
     Создает клавиатуру для выбора уровня сложности
@@ -70,11 +86,28 @@ def create_level_selection_keyboard():
     keyboard = [
         [InlineKeyboardButton("🎓 Junior", callback_data="level_junior")],
         [InlineKeyboardButton("💪 Middle", callback_data="level_middle")],
+        [InlineKeyboardButton("📚 Тест по теме", callback_data="choose_topic")],
         [InlineKeyboardButton("📋 Главное меню", callback_data="main_menu")]
     ]
     return InlineKeyboardMarkup(keyboard)
 
 
+@lru_cache(maxsize=8)
+def create_topic_keyboard(topics, labels):
+    """
+    Создает клавиатуру выбора темы.
+    labels - подписи тем в порядке snapshot.topics; клавиатура строится один раз на версию банка
+    """
+    tag = topics_tag(topics)
+    keyboard = [
+        [InlineKeyboardButton(label, callback_data=encode_topic(tag, i))]
+        for i, label in enumerate(labels)
+    ]
+    keyboard.append([InlineKeyboardButton("⬅️ Назад", callback_data="start_test_from_menu")])
+    return InlineKeyboardMarkup(keyboard)
+
+
+@lru_cache(maxsize=None)
 def create_stats_keyboard():
     """
     Создает клавиатуру для страницы статистики